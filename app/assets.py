@@ -0,0 +1,144 @@
+# app/assets.py
+"""
+Статика: сборка с хэшем в имени + предсжатые .gz/.br, и раздача с immutable-кэшем.
+
+Сборка (в Dockerfile или руками после правки static/):
+    python -m app.assets
+
+Результат кладётся в static/dist/ вместе с manifest.json вида {"js/taxi.js": "js/taxi.3f2a9c1b7d.js"}.
+В шаблонах: {{ asset_url('js/taxi.js') }} — если сборки нет, отдаётся исходный файл.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+from .config import settings
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # без brotli просто не будет .br-вариантов
+    brotli = None
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST = DIST_DIR / "manifest.json"
+
+# что имеет смысл сжимать заранее (картинки и шрифты уже сжаты)
+_COMPRESSIBLE = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map", ".ico"}
+
+_manifest: dict[str, str] | None = None
+
+
+# ---------- Сборка ----------
+
+def _hashed_name(rel: Path, data: bytes) -> Path:
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return rel.with_name(f"{rel.stem}.{digest}{rel.suffix}")
+
+
+def build(static_dir: Path = STATIC_DIR) -> dict[str, str]:
+    dist = static_dir / "dist"
+    if dist.exists():
+        shutil.rmtree(dist)
+    dist.mkdir(parents=True)
+
+    manifest: dict[str, str] = {}
+    for src in sorted(static_dir.rglob("*")):
+        if not src.is_file() or dist in src.parents:
+            continue
+        rel = src.relative_to(static_dir)
+        data = src.read_bytes()
+        out_rel = _hashed_name(rel, data)
+        out = dist / out_rel
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_bytes(data)
+
+        if rel.suffix.lower() in _COMPRESSIBLE:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < len(data):
+                out.with_name(out.name + ".gz").write_bytes(gz)
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                if len(br) < len(data):
+                    out.with_name(out.name + ".br").write_bytes(br)
+
+        manifest[rel.as_posix()] = out_rel.as_posix()
+
+    (dist / "manifest.json").write_text(json.dumps(manifest, indent=2, ensure_ascii=False))
+    return manifest
+
+
+# ---------- Ссылки из шаблонов ----------
+
+def _load_manifest() -> dict[str, str]:
+    global _manifest
+    if _manifest is None or settings.DEBUG:
+        try:
+            _manifest = json.loads(MANIFEST.read_text())
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(name: str) -> str:
+    hashed = _load_manifest().get(name)
+    return f"/static/dist/{hashed}" if hashed else f"/static/{name}"
+
+
+# ---------- Раздача ----------
+
+def _accepts(headers: Headers, coding: str) -> bool:
+    for part in headers.get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, который:
+      - отдаёт file.br / file.gz, если клиент их принимает и они собраны;
+      - ставит immutable-кэш на файлы из dist/ (имя меняется вместе с содержимым).
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code != 200 or not isinstance(response, FileResponse):
+            return response
+
+        hashed = path.replace(os.sep, "/").startswith("dist/")
+        cache_control = (
+            f"public, max-age={settings.STATIC_MAX_AGE}, immutable" if hashed else "public, max-age=300"
+        )
+
+        req_headers = Headers(scope=scope)
+        for coding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if not hashed or not _accepts(req_headers, coding):
+                continue
+            full, stat = self.lookup_path(path + suffix)
+            if full and stat:
+                alt = FileResponse(full, stat_result=stat, media_type=response.media_type)
+                alt.headers["Content-Encoding"] = coding
+                alt.headers["Vary"] = "Accept-Encoding"
+                alt.headers["Cache-Control"] = cache_control
+                return alt
+
+        response.headers["Cache-Control"] = cache_control
+        if hashed:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+if __name__ == "__main__":
+    m = build()
+    print(f"built {len(m)} assets into {DIST_DIR}")
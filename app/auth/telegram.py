@@ -1,10 +1,35 @@
 # app/auth/telegram.py
+"""
+Проверка Telegram WebApp initData.
+
+secret_key от токена бота считается один раз на токен. Проверенные initData
+кладутся в LRU (ключ — хэш строки с secret_key, чтобы не хранить сами строки)
+до истечения auth_date + TG_INIT_DATA_MAX_AGE_SEC: повтор того же заголовка
+X-Tg-Init-Data (WebView без cookie шлёт его с каждым запросом) не парсится и не
+проверяется заново. Неудачные проверки не кэшируем.
+"""
 from __future__ import annotations
 import hmac
 import hashlib
+import json
+import time
 import urllib.parse
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
+from ..config import settings
+from ..resources import resources
+
+_verified = resources.cache("tg:init_data", maxsize=settings.TG_INIT_DATA_CACHE_SIZE)
+_NO_AGE_LIMIT_TTL = 60 * 60  # без ограничения возраста держим проверенную строку час
+
+
+@lru_cache(maxsize=8)
+def _secret_key(bot_token: str) -> bytes:
+    # secret_key = HMAC_SHA256(key="WebAppData", msg=bot_token) — постоянен для токена
+    return hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+
+
 def _data_check_string(params: Dict[str, str]) -> str:
     # сортируем по ключу и склеиваем "key=value" через \n, исключая hash
     parts = []
@@ -14,14 +39,45 @@ def _data_check_string(params: Dict[str, str]) -> str:
         parts.append(f"{k}={params[k]}")
     return "\n".join(parts)
 
-def verify_webapp_init_data(init_data: str, bot_token: str) -> Optional[Dict[str, Any]]:
+def verify_webapp_init_data(
+    init_data: str, bot_token: str, max_age: int | None = None
+) -> Optional[Dict[str, Any]]:
     """
     ВАЛИДАЦИЯ ДЛЯ TELEGRAM WEB APP:
     secret_key = HMAC_SHA256(key="WebAppData", msg=bot_token)  <-- ВАЖНО!
     hash = HMAC_SHA256(key=secret_key, msg=data_check_string)
+    max_age — сколько секунд initData действительна после auth_date (0 — без ограничения);
+    по умолчанию TG_INIT_DATA_MAX_AGE_SEC.
     """
     if not init_data or not bot_token:
         return None
+    if max_age is None:
+        max_age = settings.TG_INIT_DATA_MAX_AGE_SEC
+
+    secret_key = _secret_key(bot_token)
+    cache_key = (hashlib.blake2b(init_data.encode("utf-8"), key=secret_key, digest_size=20).digest(), max_age)
+    data = _verified.get(cache_key)
+    if data is not None:
+        return dict(data)
+
+    data = _verify(init_data, secret_key)
+    if data is None:
+        return None
+
+    ttl = _NO_AGE_LIMIT_TTL
+    if max_age:
+        try:
+            age = time.time() - int(data.get("auth_date") or 0)
+        except (TypeError, ValueError):
+            return None
+        if age > max_age:
+            return None
+        ttl = max_age - age
+    _verified.set(cache_key, data, ttl=ttl)
+    return dict(data)
+
+
+def _verify(init_data: str, secret_key: bytes) -> Optional[Dict[str, Any]]:
 
     # Разбираем query-string вида: query_id=...&user=%7B...%7D&auth_date=...&hash=...
     try:
@@ -34,10 +90,6 @@ def verify_webapp_init_data(init_data: str, bot_token: str) -> Optional[Dict[str
     if not recv_hash:
         return None
 
-    # ВНИМАНИЕ: для WEB APP secret отличается!
-    # secret_key = HMAC_SHA256(key="WebAppData", msg=bot_token)
-    secret_key = hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
-
     check_string = _data_check_string(params).encode("utf-8")
     calc_hash = hmac.new(secret_key, check_string, hashlib.sha256).hexdigest()
 
@@ -49,7 +101,6 @@ def verify_webapp_init_data(init_data: str, bot_token: str) -> Optional[Dict[str
     for k, v in params.items():
         if k == "user":
             try:
-                import json
                 data["user"] = json.loads(v)
             except Exception:
                 data["user"] = None
@@ -0,0 +1,51 @@
+# app/auth/tokens.py
+"""
+Короткий bearer-токен вместо cookie-сессии для API.
+
+/api/tg/session один раз проверяет initData и выдаёт подписанный JWT:
+sub — Telegram ID, role — роль, плюс имя/username для мягкого апдейта профиля.
+Дальше клиент шлёт "Authorization: Bearer <токен>", сервер проверяет только
+подпись и срок — без БД и без (де)сериализации сессии.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers
+
+from ..config import settings
+from ..utils.security import create_jwt, decode_jwt
+
+# claim -> поле tg_user (короткие имена: токен едет в каждом запросе)
+_PROFILE_CLAIMS = {"fn": "first_name", "ln": "last_name", "un": "username"}
+
+
+def issue_access_token(tg_user: dict, role: str) -> str:
+    claims: Dict[str, Any] = {"sub": str(tg_user["id"]), "role": role}
+    for claim, key in _PROFILE_CLAIMS.items():
+        if tg_user.get(key):
+            claims[claim] = tg_user[key]
+    return create_jwt(claims, ttl=settings.ACCESS_TOKEN_TTL_SEC)
+
+
+def read_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """tg_user (как в сессии, плюс role) или None, если подпись/срок не сошлись."""
+    claims = decode_jwt(token)
+    if not claims:
+        return None
+    try:
+        tg_id = int(claims["sub"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    tg_user: Dict[str, Any] = {"id": tg_id, "role": claims.get("role") or "user", "photo_url": None}
+    for claim, key in _PROFILE_CLAIMS.items():
+        tg_user[key] = claims.get(claim)
+    return tg_user
+
+
+def bearer_token(headers: Headers) -> Optional[str]:
+    auth = headers.get("authorization") or ""
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
@@ -30,12 +30,98 @@ class Settings(BaseSettings):
     COOKIE_SECURE: bool = False
     COOKIE_SAMESITE: str = "lax"
 
+    # Telegram initData: сколько секунд после auth_date она действительна (0 — без ограничения)
+    # и сколько проверенных строк помним, чтобы не считать HMAC на каждый запрос
+    TG_INIT_DATA_MAX_AGE_SEC: int = 60 * 60 * 24
+    TG_INIT_DATA_CACHE_SIZE: int = 4096
+
     # JWT
     JWT_TTL_SEC: int = 60 * 60 * 24 * 7
     JWT_ALG: str = "HS256"
+    # короткий bearer-токен, который /api/tg/session выдаёт в обмен на initData
+    ACCESS_TOKEN_TTL_SEC: int = 60 * 15
 
     # CORS
     ALLOWED_ORIGINS: str = "*"
 
+    # Режим разработки: автоперезагрузка шаблонов и т.п. В проде — False
+    DEBUG: bool = False
+    TEMPLATES_BYTECODE_CACHE_DIR: str | None = None  # None — системный tmp
+
+    # Общий HTTP-клиент (Telegram Bot API)
+    HTTP_TIMEOUT_SEC: float = 8.0
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE: int = 10
+
+    # Сжатие ответов и кэш статики
+    COMPRESS_MIN_SIZE: int = 1024                # байт; меньше — не сжимаем
+    STATIC_MAX_AGE: int = 60 * 60 * 24 * 365     # для файлов с хэшем в имени
+
+    # Чат: сколько последних сообщений держим в памяти
+    CHAT_BUFFER_SIZE: int = 500
+    # пакетная запись сообщений: окно сбора и максимум строк в одном INSERT
+    CHAT_BATCH_WINDOW_MS: float = 5.0
+    CHAT_BATCH_MAX: int = 200
+    # старше скольки дней сообщения уезжают в архив (0 — не архивировать) и как часто проверять
+    CHAT_RETENTION_DAYS: int = 30
+    CHAT_RETENTION_INTERVAL_SEC: int = 60 * 60
+
+    # Публичные ленты (объявления/новости/реклама) в памяти; TTL — страховка от записей в обход API
+    FEED_CACHE_TTL_SEC: int = 300
+
+    # Long-poll (когда SSE рвут прокси/WebView): сколько максимум держим запрос
+    LONG_POLL_TIMEOUT_SEC: float = 25.0
+
+    # Idempotency-Key: сколько помним первый ответ и сколько ключей держим в памяти
+    IDEMPOTENCY_TTL_SEC: int = 60 * 60
+    IDEMPOTENCY_MAX_KEYS: int = 10_000
+
+    # Лимиты запросов к /api на пользователя (или IP): в минуту и запас на всплеск; 0 — без лимита
+    RATE_READ_PER_MIN: int = 240
+    RATE_READ_BURST: int = 60
+    RATE_WRITE_PER_MIN: int = 60
+    RATE_WRITE_BURST: int = 20
+    RATE_POLL_PER_MIN: int = 60
+    RATE_POLL_BURST: int = 10
+    RATE_LOCATION_PER_MIN: int = 30
+    RATE_LOCATION_BURST: int = 6
+    RATE_MAX_BUCKETS: int = 50_000
+
+    # Метрики Prometheus (/metrics): отдаются только с заголовком Authorization: Bearer <METRICS_TOKEN>;
+    # пустой токен — эндпоинт выключен (запросы всё равно считаются)
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""
+
+    # Автоотмена заявок, которые никто не взял (минуты; 0 — не отменять)
+    TRIP_EXPIRY_MIN: int = 30
+    DELIVERY_EXPIRY_MIN: int = 60
+    EXPIRY_INTERVAL_SEC: int = 60
+    EXPIRY_BATCH: int = 500
+
+    # Подсказка цены: сколько последних цен маршрута учитываем и минимум для ответа
+    PRICE_WINDOW: int = 200
+    PRICE_MIN_SAMPLES: int = 3
+
+    # Автодополнение улиц: необязательный список улиц (UTF-8, по одной в строке)
+    STREETS_SEED_FILE: str | None = None
+
+    # Координаты водителей: размер ячейки сетки (~1 км), срок жизни точки, снимок в БД, кэш допуска
+    GEO_CELL_DEG: float = 0.01
+    LOCATION_TTL_SEC: int = 120
+    LOCATION_SNAPSHOT_SEC: int = 30
+    LOCATION_AUTH_TTL_SEC: int = 60
+    # лента водителя: поездки в этом радиусе — первыми по расстоянию, дальше радиуса — в конце
+    # (после поездок без точки подачи); поиск ближайших водителей
+    FEED_RADIUS_KM: float = 15.0
+    NEAREST_DRIVERS_RADIUS_KM: float = 10.0
+
+    # Автоподбор водителя: шаг матчера, сколько поездка ждёт подбора до ленты, таймаут предложения
+    DISPATCH_INTERVAL_SEC: float = 3.0
+    DISPATCH_WINDOW_SEC: int = 90
+    DISPATCH_OFFER_SEC: int = 20
+    DISPATCH_RADIUS_KM: float = 10.0
+    DISPATCH_BATCH: int = 200
+    DISPATCH_HUNGARIAN_MAX_CELLS: int = 2500   # больше — жадный подбор
+
 
 settings = Settings()
\ No newline at end of file
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from .db import get_db
 from .auth.telegram import verify_webapp_init_data
+from .auth.tokens import bearer_token, read_access_token
 from .config import settings
 from .models.user import User
 from .services.users import ensure_user_from_tg as _ensure_user_from_tg
@@ -33,13 +34,20 @@ def get_current_tg_user(
     request: Request,
     x_tg_init_data: Optional[str] = Header(None, alias="X-Tg-Init-Data"),
 ) -> dict:
-    # 1) уже есть в сессии
+    # 1) уже есть в сессии (для /api с bearer-токеном её собрал BearerSessionMiddleware)
     sess = getattr(request, "session", None) or {}
     user = sess.get("tg_user")
     if user:
         return user
 
-    # 2) пришло initData — проверим подпись и сохраним
+    # 2) bearer-токен вне /api — проверяем здесь же, без сессии
+    token = bearer_token(request.headers)
+    if token:
+        user = read_access_token(token)
+        if user:
+            return user
+
+    # 3) пришло initData — проверим подпись и сохраним
     if x_tg_init_data:
         data = verify_webapp_init_data(x_tg_init_data, settings.BOT_TOKEN or "")
         if data and "user" in data:
@@ -74,13 +82,14 @@ def ensure_is_admin(
 ) -> User:
     """
     Пропускает, если:
-      - у пользователя user.is_admin == True, ИЛИ
+      - у пользователя user.is_admin == True или users.role == 'admin'
+        (как в app/admin/security.is_admin_user и /api/is_admin), ИЛИ
       - его telegram_id содержится в ADMIN_TG_IDS (из переменной окружения).
     Иначе — 403.
     """
     user: User = ensure_user_from_tg(db, tg_user)
 
-    is_admin_flag = bool(getattr(user, "is_admin", False))
+    is_admin_flag = bool(getattr(user, "is_admin", False)) or (getattr(user, "role", "") or "").lower() == "admin"
     in_whitelist = getattr(user, "telegram_id", None) in ADMIN_TG_IDS
 
     if is_admin_flag or in_whitelist:
@@ -0,0 +1,147 @@
+# app/idempotency.py
+"""
+Idempotency-Key для POST-запросов, которые что-то создают (поездка, заказ, ставка,
+объявление, сообщение чата). Мобильная сеть рвётся, клиент повторяет запрос —
+повтор с тем же ключом получает сохранённый первый ответ: без обращения к БД
+и без повторной рассылки уведомлений.
+
+Ключ действует в пределах пользователя (initData, иначе tg id из сессии или IP)
+и маршрута. Ответы хранятся в ограниченном TTL-кэше; пока первый запрос ещё
+выполняется, повтор ждёт его и получает тот же ответ. Тот же ключ с другим телом — 409.
+Запоминаем только 2xx и ошибки, зависящие лишь от тела запроса (400, 422): 403, 409 и т.п.
+могут измениться (водителя одобрили, конфликт разрешился), 5xx — сбой; повтор выполнится заново.
+Стоит внутри SessionMiddleware — ему нужна scope["session"].
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .resources import resources
+
+IDEMPOTENT_ROUTES = (
+    re.compile(r"^/api/taxi/trips$"),
+    re.compile(r"^/api/taxi/trips/\d+/bids$"),
+    re.compile(r"^/api/delivery/orders$"),
+    re.compile(r"^/api/delivery/orders/\d+/bids$"),
+    re.compile(r"^/api/board/listings$"),
+    re.compile(r"^/api/chat/messages$"),
+)
+
+_STORED_ERRORS = {400, 422}
+_MAX_KEY_LEN = 255
+
+
+def _owner(scope: Scope, headers: Headers) -> str:
+    # initData — первым: первый запрос мог прийти ещё без сессии, а повтор уже с ней
+    init_data = headers.get("x-tg-init-data")
+    if init_data:
+        return "init:" + hashlib.blake2b(init_data.encode(), digest_size=12).hexdigest()
+    session = scope.get("session") or {}
+    tg_id = (session.get("tg_user") or {}).get("id")
+    if tg_id:
+        return f"tg:{tg_id}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else '-'}"
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp, ttl: float = 3600, maxsize: int = 10_000, routes=IDEMPOTENT_ROUTES) -> None:
+        self.app = app
+        self.routes = routes
+        self._store = resources.cache("idempotency", maxsize=maxsize, ttl=ttl)
+        # ключ -> событие «первый запрос закончился» (всё в одном цикле событий, без блокировок)
+        self._inflight: dict[tuple, asyncio.Event] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not any(r.match(scope["path"]) for r in self.routes)
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > _MAX_KEY_LEN:
+            await JSONResponse({"detail": "Слишком длинный Idempotency-Key"}, status_code=400)(scope, receive, send)
+            return
+
+        # тело читаем целиком: по нему отличаем повтор от другого запроса с тем же ключом
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        fingerprint = hashlib.blake2b(body, digest_size=16).digest()
+        store_key = (_owner(scope, headers), scope["path"], key)
+
+        while True:
+            entry = self._store.get(store_key)
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    await JSONResponse(
+                        {"detail": "Idempotency-Key уже использован для другого запроса"}, status_code=409
+                    )(scope, receive, send)
+                    return
+                await self._replay(entry, send)
+                return
+            waiter = self._inflight.get(store_key)
+            if waiter is None:
+                break
+            # первый запрос ещё выполняется — ждём его ответ; не сохранился — выполняем сами
+            await waiter.wait()
+            if self._store.get(store_key) is None:
+                continue
+
+        done = self._inflight[store_key] = asyncio.Event()
+        start: Message | None = None
+        parts: list[bytes] = []
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def capture_send(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                parts.append(message.get("body", b""))
+                if not message.get("more_body", False) and start is not None:
+                    status = start["status"]
+                    if 200 <= status < 300 or status in _STORED_ERRORS:
+                        self._store.set(store_key, (fingerprint, status, list(start["headers"]), b"".join(parts)))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            self._inflight.pop(store_key, None)
+            done.set()
+
+    @staticmethod
+    async def _replay(entry: tuple, send: Send) -> None:
+        _, status, headers, body = entry
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": body})
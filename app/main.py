@@ -1,12 +1,25 @@
 # app/main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.sessions import SessionMiddleware
 
+from .assets import PrecompressedStaticFiles
+from .compression import CompressionMiddleware
 from .config import settings
+from .idempotency import IdempotencyMiddleware
+from .metrics import MetricsMiddleware
+from .ratelimit import RateLimitMiddleware
+from .sessions import BearerSessionMiddleware
 from .db import engine
 from .models.base import Base
+from .resources import resources
+from .schema import ensure_schema
+from .scheduler import scheduler
+from .services.chat import writer as chat_writer
+from .services import expiry  # noqa: F401 — регистрирует задачу автоотмены
+from .services.geo import driver_locations
 
 # Роутеры (существующие файлы)
 from .routers import (
@@ -35,14 +48,81 @@ from .routers.admin_couriers import router as admin_couriers_router
 from .routers import board as board_router
 
 from .routers import admin_board as admin_board_router
+from .routers import admin_moderation as admin_moderation_router
+from .routers import streets as streets_router
+from .routers import metrics as metrics_router
+
+
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # --- Инициализация БД ---
+    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+    try:
+        driver_locations.restore()
+    except Exception as e:
+        print(f"[WARN] driver locations restore: {e}")
+    if settings.METRICS_ENABLED and not settings.METRICS_TOKEN:
+        print("[WARN] METRICS_TOKEN не задан — /metrics отключён (задайте токен для Prometheus)")
+    # --- Общие ресурсы (HTTP-пул, кэши) ---
+    await resources.startup()
+    # --- Фоновые задачи: пакетная запись чата, периодические джобы ---
+    await chat_writer.start()
+    await scheduler.start()
+    try:
+        yield
+    finally:
+        await scheduler.stop()
+        try:
+            driver_locations.flush()
+        except Exception as e:
+            print(f"[WARN] driver locations snapshot: {e}")
+        await chat_writer.stop()
+        await resources.shutdown()
+
+
+app = FastAPI(title="Village WebApp", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# --- Повторы POST с Idempotency-Key (внутри сессий: ключ привязан к пользователю) ---
+app.add_middleware(
+    IdempotencyMiddleware,
+    ttl=settings.IDEMPOTENCY_TTL_SEC,
+    maxsize=settings.IDEMPOTENCY_MAX_KEYS,
+)
 
+# --- Лимит частоты запросов к /api (внутри сессий: корзина на пользователя, иначе на IP) ---
+app.add_middleware(
+    RateLimitMiddleware,
+    limits={
+        "read": (settings.RATE_READ_PER_MIN, settings.RATE_READ_BURST),
+        "write": (settings.RATE_WRITE_PER_MIN, settings.RATE_WRITE_BURST),
+        "poll": (settings.RATE_POLL_PER_MIN, settings.RATE_POLL_BURST),
+        "location": (settings.RATE_LOCATION_PER_MIN, settings.RATE_LOCATION_BURST),
+    },
+    max_buckets=settings.RATE_MAX_BUCKETS,
+)
 
+# --- Сессии (cookie; запросы к /api с bearer-токеном идут мимо cookie) ---
+app.add_middleware(
+    BearerSessionMiddleware,
+    secret_key=settings.SECRET_KEY,
+    session_cookie=getattr(settings, "COOKIE_NAME", "__Host-village"),
+    same_site=(settings.COOKIE_SAMESITE or "none"),
+    https_only=True,
+)
 
+# --- Сжатие JSON/HTML (br/gzip) ---
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESS_MIN_SIZE)
 
+# --- Метрики (снаружи всех, кроме CORS: считаем и отбитые лимитом, и время сжатия) ---
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
-app = FastAPI(title="Village WebApp")
-
-# --- CORS ---
+# --- CORS (добавляется последним = самый внешний: заголовки Access-Control-*
+#     получают и ответы лимита 429, и повторы/422 Idempotency-Key) ---
 allowed_origins = (
     [o.strip() for o in settings.ALLOWED_ORIGINS.split(",")]
     if getattr(settings, "ALLOWED_ORIGINS", None)
@@ -56,17 +136,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Сессии ---
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=settings.SECRET_KEY,
-    session_cookie=getattr(settings, "COOKIE_NAME", "__Host-village"),
-    same_site=(settings.COOKIE_SAMESITE or "none"),
-    https_only=True,
-)
-
-# --- Статика ---
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# --- Статика: предсжатые .br/.gz и immutable-кэш для static/dist ---
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # --- Подключение роутеров ---
 app.include_router(ui_router.router)
@@ -93,8 +164,6 @@ app.include_router(admin_couriers_router)     # админка курьеров
 
 app.include_router(board_router.router)        # /board, /api/board/...
 app.include_router(admin_board_router.router)
-
-# --- Инициализация БД ---
-@app.on_event("startup")
-def on_startup():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+app.include_router(admin_moderation_router.router)   # очереди модерации: /api/admin/moderation/...
+app.include_router(streets_router.router)            # автодополнение улиц: /api/streets/suggest
+app.include_router(metrics_router.router)            # /metrics для Prometheus
@@ -0,0 +1,223 @@
+# app/metrics.py
+"""
+Метрики в текстовом формате Prometheus (без prometheus_client).
+
+MetricsMiddleware считает запросы по (метод, шаблон маршрута, статус) и время
+до начала ответа — гистограмма по (метод, шаблон маршрута). Время до начала ответа,
+а не до конца: SSE и long-poll иначе растягивали бы гистограмму на минуты.
+Маршрут — шаблон пути ("/api/taxi/trips/{trip_id}"), а не сам путь: число рядов
+не растёт от id в URL; всё, что не совпало с маршрутами, — "other".
+
+Запись идёт только из цикла событий (ASGI-middleware), поэтому без блокировок:
+пара словарей и инкременты. Gauges (хаб, очереди, пул БД, пул потоков) не копятся,
+а снимаются в момент запроса /metrics.
+"""
+from __future__ import annotations
+
+import bisect
+import time
+from typing import Callable, Iterable
+
+import anyio.to_thread
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .db import engine
+from .realtime import hub
+from .services.chat import writer as chat_writer
+from .services.orders import delivery_orders, taxi_orders
+
+# верхние границы корзин гистограммы, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = tuple[dict, float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Registry:
+    def __init__(self) -> None:
+        self.requests: dict[tuple[str, str, int], int] = {}
+        # (метод, маршрут) -> [счётчики по корзинам (последняя — +Inf), сумма секунд]
+        self.latency: dict[tuple[str, str], list] = {}
+        self._gauges: list[tuple[str, str, Callable[[], Iterable[Sample]]]] = []
+        self._routes: dict | None = None
+
+    # ---------- запросы ----------
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        h = self.latency.get((method, route))
+        if h is None:
+            h = self.latency[(method, route)] = [[0] * (len(BUCKETS) + 1), 0.0]
+        h[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        h[1] += seconds
+
+    def route_of(self, scope: Scope) -> str:
+        """Шаблон пути для уже обработанного запроса (роутер кладёт endpoint в scope)."""
+        endpoint = scope.get("endpoint")
+        app = scope.get("app")
+        if endpoint is None or app is None:
+            return "other"
+        if self._routes is None:
+            self._routes = {}
+            for r in getattr(app, "routes", ()):
+                e = getattr(r, "endpoint", None)
+                if e is not None and getattr(r, "path", None):
+                    self._routes.setdefault(e, []).append(r)
+        routes = self._routes.get(endpoint)
+        if not routes:
+            return "other"
+        if len(routes) == 1:
+            return routes[0].path
+        # одна функция на нескольких путях — выбираем совпавший
+        for r in routes:
+            if r.matches(scope)[0] == Match.FULL:
+                return r.path
+        return routes[0].path
+
+    # ---------- gauges ----------
+
+    def gauge(self, name: str, help: str) -> Callable:
+        """Декоратор: fn() -> [(метки, значение)], вызывается при каждом /metrics."""
+        def register(fn: Callable[[], Iterable[Sample]]) -> Callable:
+            self._gauges.append((name, help, fn))
+            return fn
+        return register
+
+    # ---------- вывод ----------
+
+    def render(self) -> str:
+        out: list[str] = []
+
+        out.append("# HELP village_http_requests_total HTTP requests by route and status")
+        out.append("# TYPE village_http_requests_total counter")
+        for (method, route, status), n in list(self.requests.items()):
+            out.append(f"village_http_requests_total{_labels({'method': method, 'route': route, 'status': status})} {n}")
+
+        name = "village_http_request_duration_seconds"
+        out.append(f"# HELP {name} Time to response start by route")
+        out.append(f"# TYPE {name} histogram")
+        for (method, route), (counts, total) in list(self.latency.items()):
+            counts = list(counts)
+            acc = 0
+            for le, c in zip((*map(_num, BUCKETS), "+Inf"), counts):
+                acc += c
+                out.append(f"{name}_bucket{_labels({'method': method, 'route': route, 'le': le})} {acc}")
+            labels = _labels({"method": method, "route": route})
+            out.append(f"{name}_sum{labels} {total!r}")
+            out.append(f"{name}_count{labels} {acc}")
+
+        for gname, ghelp, fn in self._gauges:
+            try:
+                samples = list(fn())
+            except Exception as e:
+                print(f"[WARN] metrics gauge {gname} failed: {e}")
+                continue
+            out.append(f"# HELP {gname} {ghelp}")
+            out.append(f"# TYPE {gname} gauge")
+            for labels, value in samples:
+                out.append(f"{gname}{_labels(labels)} {_num(value)}")
+
+        return "\n".join(out) + "\n"
+
+
+metrics = _Registry()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: _Registry = metrics) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 0
+        elapsed = 0.0
+
+        async def timed_send(message: Message) -> None:
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if not status:  # упали до начала ответа
+                status, elapsed = 500, time.perf_counter() - start
+            self.registry.observe(scope["method"], self.registry.route_of(scope), status, elapsed)
+
+
+# ---------- состояние процесса ----------
+
+@metrics.gauge("village_threadpool_busy", "Busy worker threads in the anyio threadpool (sync endpoints, DB)")
+def _threadpool_busy():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return [({}, limiter.borrowed_tokens)]
+
+
+@metrics.gauge("village_threadpool_limit", "Size of the anyio threadpool")
+def _threadpool_limit():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return [({}, limiter.total_tokens)]
+
+
+def _hub_by_topic() -> dict[str, list[int]]:
+    # личные топики "user:<tg_id>" сводим в один ряд "user" — иначе ряд на каждого пользователя
+    out: dict[str, list[int]] = {}
+    for topic, (subs, queued) in hub.stats().items():
+        row = out.setdefault(topic.split(":", 1)[0], [0, 0])
+        row[0] += subs
+        row[1] += queued
+    return out
+
+
+@metrics.gauge("village_hub_subscribers", "Open SSE subscribers per hub topic")
+def _hub_subscribers():
+    return [({"topic": t}, subs) for t, (subs, _) in _hub_by_topic().items()]
+
+
+@metrics.gauge("village_hub_queued_messages", "Messages waiting in subscriber queues per hub topic")
+def _hub_queued():
+    return [({"topic": t}, queued) for t, (_, queued) in _hub_by_topic().items()]
+
+
+@metrics.gauge("village_chat_write_queue", "Chat messages waiting for the batch writer")
+def _chat_queue():
+    return [({}, chat_writer.backlog())]
+
+
+@metrics.gauge("village_notifications_pending", "Telegram notifications not yet sent, by order kind")
+def _notifications():
+    return [({"kind": e.kind.name}, e.notify_backlog) for e in (taxi_orders, delivery_orders)]
+
+
+@metrics.gauge("village_db_pool_connections", "DB connection pool usage")
+def _db_pool():
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return []
+    return [
+        ({"state": "checked_out"}, pool.checkedout()),
+        ({"state": "idle"}, pool.checkedin()),
+        ({"state": "overflow"}, max(0, pool.overflow())),
+        ({"state": "size"}, pool.size()),
+    ]
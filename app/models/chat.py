@@ -4,9 +4,23 @@ from .base import Base
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    # SQLite без AUTOINCREMENT после архивации всей таблицы начал бы id заново с 1:
+    # коллизия в chat_messages_archive и старые ответы по id в кэшах/курсорах after_id
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True)
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     author_tg_id = Column(BigInteger, index=True, nullable=False)  # <-- BIGINT
     author_name = Column(String(200))
     text = Column(String(2000), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ChatMessageArchive(Base):
+    """Старые сообщения чата: переносятся сюда задачей архивации (app/services/chat.py)."""
+    __tablename__ = "chat_messages_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)  # id из chat_messages
+    author_id = Column(Integer, nullable=False)
+    author_tg_id = Column(BigInteger, index=True, nullable=False)
+    author_name = Column(String(200))
+    text = Column(String(2000), nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,5 +1,5 @@
 # app/models/driver.py
-from sqlalchemy import Column, Integer, Boolean, String, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, Date, DateTime, Float, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -26,4 +26,15 @@ class DriverProfile(Base):
     __table_args__ = (
         # на уровне БД запрещаем дубликаты на одного пользователя
         UniqueConstraint("user_id", name="uniq_driver_profile_per_user"),
-    )
\ No newline at end of file
+    )
+
+
+class DriverLocation(Base):
+    """Последняя известная точка водителя — снимок индекса в памяти (app/services/geo.py)."""
+    __tablename__ = "driver_locations"
+
+    driver_id = Column(Integer, ForeignKey("users.id"), primary_key=True, autoincrement=False)
+    driver_tg_id = Column(BigInteger, nullable=False)
+    lat = Column(Float, nullable=False)
+    lon = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,6 +1,6 @@
 # app/models/taxi.py
 from sqlalchemy import (
-    Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, Enum, Index
+    Column, Integer, BigInteger, String, DateTime, Boolean, Float, ForeignKey, Enum, Index
 )
 from sqlalchemy.sql import func
 import enum
@@ -9,6 +9,7 @@ from .base import Base
 class PriceMode(str, enum.Enum):
     CLIENT_SETS = "client_sets"   # клиент указывает цену
     DRIVER_BIDS = "driver_bids"   # водители делают ставки
+    AUTO_DISPATCH = "auto_dispatch"  # цена клиента, водителя подбирает матчер (app/services/dispatch.py)
 
 class TripStatus(str, enum.Enum):
     NEW         = "new"
@@ -45,6 +46,9 @@ class TaxiTrip(Base):
     from_street = Column(String(160), nullable=False)
     from_house  = Column(String(40), nullable=True)
     from_comment = Column(String(200), nullable=True)
+    # точка подачи (необязательно; для ленты по расстоянию)
+    from_lat = Column(Float, nullable=True)
+    from_lon = Column(Float, nullable=True)
 
     to_street = Column(String(160), nullable=False)
     to_house  = Column(String(40), nullable=True)
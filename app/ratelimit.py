@@ -0,0 +1,90 @@
+# app/ratelimit.py
+"""
+Ограничение частоты запросов к /api: token bucket в памяти процесса.
+
+Корзина — на пару (пользователь, группа маршрутов): пользователь — tg id из сессии
+(cookie подписана, подделать нельзя), без сессии — IP. Группы: координаты водителя,
+long-poll/SSE, чтение (GET), запись (остальные методы); лимиты — в Settings
+(RATE_<ГРУППА>_PER_MIN и RATE_<ГРУППА>_BURST).
+
+Проверка идёт до роутинга, поэтому лишний запрос отбивается 429 с Retry-After,
+не занимая threadpool и не трогая БД. Число корзин ограничено (LRU): вытесненная
+корзина просто начинается заново полной.
+"""
+from __future__ import annotations
+
+import math
+import re
+import time
+from collections import OrderedDict
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+_LOCATION = re.compile(r"^/api/taxi/driver/location$")
+_POLL = re.compile(r"^/api/(?:[\w-]+/)*(?:poll|stream)$")
+
+
+def route_group(method: str, path: str) -> str | None:
+    if not path.startswith("/api/"):
+        return None
+    if _LOCATION.match(path):
+        return "location"
+    if _POLL.match(path):
+        return "poll"
+    return "read" if method in ("GET", "HEAD", "OPTIONS") else "write"
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, limits: dict[str, tuple[int, int]], max_buckets: int = 50_000) -> None:
+        """limits: группа -> (запросов в минуту, запас на всплеск); 0 в минуту — без ограничения."""
+        self.app = app
+        self.limits = {g: (per_min / 60.0, float(burst)) for g, (per_min, burst) in limits.items() if per_min > 0}
+        self.max_buckets = max_buckets
+        # (кто, группа) -> [токены, время последнего пополнения]; всё в цикле событий, без блокировок
+        self._buckets: "OrderedDict[tuple[str, str], list[float]]" = OrderedDict()
+
+    def _client(self, scope: Scope) -> str:
+        session = scope.get("session") or {}
+        tg_id = (session.get("tg_user") or {}).get("id")
+        if tg_id:
+            return f"tg:{tg_id}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else '-'}"
+
+    def _take(self, key: tuple[str, str], rate: float, burst: float) -> float:
+        """0 — токен выдан, иначе через сколько секунд появится."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        return (1.0 - bucket[0]) / rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        group = route_group(scope["method"], scope["path"])
+        limit = self.limits.get(group) if group else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        wait = self._take((self._client(scope), group), *limit)
+        if wait:
+            response = JSONResponse(
+                {"detail": "Слишком много запросов, попробуйте позже"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -1,27 +1,206 @@
 # app/realtime.py
 import asyncio
 import json
+import time
+from collections import deque
 from typing import AsyncIterator
 
+from .config import settings
+
 class _Hub:
-    def __init__(self) -> None:
-        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+    """
+    Простой in-memory pub/sub по топикам ("taxi", "delivery", "chat", ...).
+    У каждого подписчика своя ограниченная очередь — событие получают все,
+    а медленный клиент теряет самые старые сообщения, а не тормозит остальных.
+    """
+
+    def __init__(self, max_queue: int = 256, log_size: int = 256, idle_ttl: float = 120.0) -> None:
+        self.max_queue = max_queue
+        self.log_size = log_size
+        # личный топик ("user:<tg_id>") без подписчиков и long-poll, молчащий дольше idle_ttl,
+        # забываем целиком (журнал и версию) — иначе их копилось бы без конца. Общие топики
+        # (taxi, delivery, chat, ...) не трогаем: их версия — часть ETag и ключей кэша,
+        # назад она идти не должна
+        self.idle_ttl = idle_ttl
+        self._active: dict[str, float] = {}    # топик -> time.monotonic() последней активности
+        self._polling: dict[str, int] = {}     # топик -> сколько long-poll ждут сейчас
+        self._pruned_at = time.monotonic()
+        # наибольшая выданная версия: заново созданный топик продолжает с неё, поэтому
+        # клиент со старой версией получит reset, а не «дыру» в событиях
+        self._seq = 0
+        self._floor: dict[str, int] = {}       # топик -> версия, с которой он (заново) создан
+        self._subs: dict[str, set["asyncio.Queue[str]"]] = {}
+        # последние события по топикам (для long-poll): (версия, событие, данные)
+        self._log: dict[str, deque] = {}
+        # запросы long-poll, ждущие следующего события топика
+        self._waiters: dict[str, asyncio.Event] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # счётчик событий по топикам — дешёвая версия данных для ETag
+        self._versions: dict[str, int] = {}
+        # после рестарта счётчики обнуляются — метка запуска не даст совпасть старым ETag
+        self.boot_id = format(int(time.time() * 1000), "x")
+
+    def version(self, topic: str) -> int:
+        return self._versions.get(topic, 0)
+
+    def touch(self, topic: str) -> int:
+        v = self._versions.get(topic)
+        if v is None:
+            v = self._floor[topic] = self._seq
+        v = self._versions[topic] = v + 1
+        if v > self._seq:
+            self._seq = v
+        return v
+
+    def _seen(self, topic: str, now: float) -> None:
+        if ":" in topic:  # забывать можно только личные топики
+            self._active[topic] = now
+
+    def _prune(self, now: float) -> None:
+        self._pruned_at = now
+        for topic, seen in list(self._active.items()):
+            if (
+                now - seen > self.idle_ttl
+                and topic not in self._subs
+                and not self._polling.get(topic)
+            ):
+                del self._active[topic]
+                self._log.pop(topic, None)
+                self._versions.pop(topic, None)
+                self._floor.pop(topic, None)
+                self._waiters.pop(topic, None)
+
+    def subscribers(self, topic: str) -> int:
+        return len(self._subs.get(topic, ()))
+
+    def stats(self) -> dict[str, tuple[int, int]]:
+        """Для /metrics: топик -> (подписчиков, сообщений в их очередях)."""
+        return {t: (len(qs), sum(q.qsize() for q in qs)) for t, qs in list(self._subs.items())}
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Цикл событий приложения — для публикации из потоков (sync-эндпоинты, хуки сессии)."""
+        self._loop = loop
+
+    def _publish(self, event: str, payload: dict, topic: str) -> None:
+        now = time.monotonic()
+        if now - self._pruned_at > self.idle_ttl:
+            self._prune(now)
+        self._seen(topic, now)
+        v = self.touch(topic)
+        log = self._log.get(topic)
+        if log is None:
+            log = self._log[topic] = deque(maxlen=self.log_size)
+        log.append((v, event, payload))
+        waiter = self._waiters.pop(topic, None)
+        if waiter is not None:
+            waiter.set()
 
-    async def publish(self, event: str, payload: dict) -> None:
-        """
-        Положить событие в очередь SSE.
-        """
         data = json.dumps(payload, ensure_ascii=False)
         # формат SSE: event: <name>\ndata: <json>\n\n
         msg = f"event: {event}\ndata: {data}\n\n"
-        await self._queue.put(msg)
+        for q in list(self._subs.get(topic, ())):
+            if q.full():
+                try:
+                    q.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait(msg)
+
+    async def publish(self, event: str, payload: dict, topic: str = "default") -> None:
+        """
+        Разослать событие всем подписчикам топика.
+        """
+        self._publish(event, payload, topic)
+
+    def publish_threadsafe(self, event: str, payload: dict, topic: str = "default") -> None:
+        """То же из любого потока: событие передаётся в цикл приложения."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish(event, payload, topic)
+        else:
+            loop.call_soon_threadsafe(self._publish, event, payload, topic)
 
-    async def subscribe(self) -> AsyncIterator[str]:
+    async def subscribe(self, *topics: str) -> AsyncIterator[str]:
         """
-        Асинхронный генератор сообщений SSE.
+        Асинхронный генератор сообщений SSE по одному или нескольким топикам.
+        Отписка — при закрытии генератора (клиент отвалился).
         """
-        while True:
-            msg = await self._queue.get()
-            yield msg
+        topics = topics or ("default",)
+        q: "asyncio.Queue[str]" = asyncio.Queue(maxsize=self.max_queue)
+        for t in topics:
+            self._subs.setdefault(t, set()).add(q)
+        try:
+            while True:
+                yield await q.get()
+        finally:
+            now = time.monotonic()
+            for t in topics:
+                subs = self._subs.get(t)
+                if subs is not None:
+                    subs.discard(q)
+                    if not subs:
+                        self._subs.pop(t, None)
+                        self._seen(t, now)
+
+    def events_since(self, topic: str, since: int) -> list[dict] | None:
+        """События топика с версией > since; None — часть уже вытеснена из журнала."""
+        if since >= self.version(topic):
+            return []
+        if since == 0:
+            # версию 0 клиент получил, пока топика не было: всё, что в нём есть, для него новое
+            since = self._floor.get(topic, 0)
+        log = self._log.get(topic)
+        if not log or log[0][0] > since + 1:
+            return None
+        return [{"v": v, "event": e, "data": d} for v, e, d in log if v > since]
+
+    async def wait(self, topic: str, since: int, boot: str | None, timeout: float) -> dict:
+        """
+        Long-poll: ждём событие топика новее since (не дольше timeout) и отдаём дельту.
+        reset=True — клиенту нужно перечитать данные целиком (рестарт процесса или
+        пропущено больше, чем помнит журнал). Без boot — просто текущая версия.
+        """
+        out = {"ok": True, "boot": self.boot_id, "version": self.version(topic), "reset": False, "events": []}
+        if not boot:
+            return out
+        if boot != self.boot_id or since > out["version"]:
+            out["reset"] = True
+            return out
+
+        events = self.events_since(topic, since)
+        if events == []:
+            waiter = self._waiters.get(topic)
+            if waiter is None:
+                waiter = self._waiters[topic] = asyncio.Event()
+            self._polling[topic] = self._polling.get(topic, 0) + 1
+            try:
+                await asyncio.wait_for(waiter.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                left = self._polling[topic] - 1
+                if left:
+                    self._polling[topic] = left
+                else:
+                    del self._polling[topic]
+                    # никто больше не ждёт — событие-ожидание не держим
+                    if self._waiters.get(topic) is waiter:
+                        del self._waiters[topic]
+                    self._seen(topic, time.monotonic())
+            events = self.events_since(topic, since)
+
+        out["version"] = self.version(topic)
+        if events is None:
+            out["reset"] = True
+        else:
+            out["events"] = events
+        return out
 
-hub = _Hub()
\ No newline at end of file
+# окно простоя — с запасом больше long-poll: между двумя опросами клиента топик не теряется
+hub = _Hub(idle_ttl=max(120.0, settings.LONG_POLL_TIMEOUT_SEC * 4))
@@ -0,0 +1,110 @@
+# app/resources.py
+"""
+Общие ресурсы приложения: окружение шаблонов, HTTP-клиент, хаб событий и кэши.
+Создаются один раз и живут весь процесс; открываются/закрываются в lifespan (app/main.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from pathlib import Path
+
+import httpx
+import jinja2
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+
+from .assets import asset_url
+from .config import settings
+from .realtime import hub
+from .utils.cache import TTLCache
+from .utils.http_cache import etag_matches, not_modified, etag_headers
+
+# Абсолютный путь к templates/, чтобы не зависеть от текущей директории
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+
+def _make_templates() -> Jinja2Templates:
+    # В проде шаблоны не перечитываются с диска, байткод кладём в кэш —
+    # после рестарта не нужно компилировать заново
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=True,
+        auto_reload=settings.DEBUG,
+        bytecode_cache=jinja2.FileSystemBytecodeCache(settings.TEMPLATES_BYTECODE_CACHE_DIR),
+    )
+    env.globals["asset_url"] = asset_url
+    return Jinja2Templates(env=env)
+
+
+class _Resources:
+    def __init__(self) -> None:
+        self.templates = _make_templates()
+        self.hub = hub
+        self.caches: dict[str, TTLCache] = {}
+        self._http: httpx.AsyncClient | None = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """
+        Общий пул соединений (keep-alive к api.telegram.org).
+        Создаётся лениво на случай вызова до startup.
+        """
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=settings.HTTP_TIMEOUT_SEC,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+                ),
+            )
+        return self._http
+
+    def _templates_stamp(self) -> float:
+        # только в DEBUG: шаблоны могут меняться на лету
+        if not settings.DEBUG:
+            return 0.0
+        return max((p.stat().st_mtime for p in TEMPLATES_DIR.rglob("*.html")), default=0.0)
+
+    def render_shell(self, request: Request, name: str, **context) -> Response:
+        """
+        Страница-оболочка Mini App: данные грузятся из JS, HTML одинаков для всех.
+        Рендерим один раз (в DEBUG — при изменении шаблонов) и дальше отдаём готовые байты с ETag.
+        """
+        pages = self.cache("pages", maxsize=64)
+        key = (name, repr(sorted(context.items())))
+        stamp = self._templates_stamp()
+        entry = pages.get(key)
+        if entry is None or entry[2] != stamp:
+            body = self.templates.get_template(name).render({"request": request, **context}).encode("utf-8")
+            etag = '"' + hashlib.blake2b(body, digest_size=10).hexdigest() + '"'
+            entry = (body, etag, stamp)
+            pages.set(key, entry)
+
+        body, etag, _ = entry
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return Response(content=body, media_type="text/html", headers=etag_headers(etag))
+
+    def cache(self, name: str, maxsize: int = 1024, ttl: float | None = None) -> TTLCache:
+        """Именованный кэш; при повторном вызове возвращается тот же объект."""
+        c = self.caches.get(name)
+        if c is None:
+            c = self.caches[name] = TTLCache(maxsize=maxsize, ttl=ttl)
+        return c
+
+    async def startup(self) -> None:
+        self.hub.bind_loop(asyncio.get_running_loop())
+        _ = self.http
+
+    async def shutdown(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        for c in self.caches.values():
+            c.clear()
+
+
+resources = _Resources()
+templates = resources.templates
@@ -1,7 +1,5 @@
-from pathlib import Path
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
@@ -11,13 +9,11 @@ from ..models.trip import Trip
 from ..models.delivery import DeliveryOrder
 from ..models.ad import Ad
 from ..admin.security import require_admin
+from ..resources import templates
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-TEMPLATES_DIR = Path(__file__).resolve().parents[1].parent / "templates"
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
-
 @router.get("", response_class=HTMLResponse)
 def admin_home(request: Request, _: bool = Depends(require_admin)):
     return templates.TemplateResponse("admin/home.html", {"request": request})
@@ -6,14 +6,21 @@ from sqlalchemy import select
 
 from ..db import get_db
 from ..models.classifieds import Listing  # <-- фикс: используем Listing
+from ..resources import templates
+from ..serializers import listing_to_public, json_response
+from ..services import feeds
+from ..services.moderation import parse_bulk_payload, bulk_set, bulk_results, announce_bulk
 
 router = APIRouter(tags=["board-admin"])
 
+BOARD_ACTIONS = {
+    "approve": {"approved": True, "rejected": False},
+    "reject": {"approved": False, "rejected": True},
+}
+
 # ---------- HTML (без проверки админа, как просил) ----------
 @router.get("/board/moderation")
 def board_moderation_page(request: Request):
-    from fastapi.templating import Jinja2Templates
-    templates = Jinja2Templates(directory="templates")
     return templates.TemplateResponse("admin_board.html", {"request": request, "back_href": "/dashboard"})
 
 # ---------- API (без ensure_is_admin) ----------
@@ -22,18 +29,7 @@ def api_board_pending(db: Session = Depends(get_db), limit: int = 200):
     rows = db.execute(
         select(Listing).where(Listing.approved.is_(False), Listing.rejected.is_(False)).order_by(Listing.id.asc()).limit(limit)
     ).scalars().all()
-    items = []
-    for it in rows:
-        items.append({
-            "id": it.id,
-            "title": it.title,
-            "description": it.description,
-            "price": it.price,
-            "photo_url": it.photo_url,
-            "phone": it.phone,
-            "created_at": (it.created_at.isoformat() if it.created_at else None),
-        })
-    return {"ok": True, "items": items}
+    return json_response({"ok": True, "items": [listing_to_public(it) for it in rows]})
 
 @router.post("/api/board/moderation/{listing_id}/approve")
 def api_board_approve(listing_id: int, db: Session = Depends(get_db)):
@@ -43,6 +39,7 @@ def api_board_approve(listing_id: int, db: Session = Depends(get_db)):
     it.approved = True
     it.rejected = False
     db.commit()
+    feeds.invalidate(feeds.BOARD)
     return {"ok": True, "id": it.id, "approved": True}
 
 @router.post("/api/board/moderation/{listing_id}/reject")
@@ -53,4 +50,20 @@ def api_board_reject(listing_id: int, db: Session = Depends(get_db)):
     it.approved = False
     it.rejected = True
     db.commit()
-    return {"ok": True, "id": it.id, "rejected": True}
\ No newline at end of file
+    feeds.invalidate(feeds.BOARD)
+    return {"ok": True, "id": it.id, "rejected": True}
+
+# ---------- Массовая модерация ----------
+@router.post("/api/board/moderation/bulk")
+def api_board_bulk(payload: dict, db: Session = Depends(get_db)):
+    try:
+        ids, action = parse_bulk_payload(payload, BOARD_ACTIONS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    done = bulk_set(db, Listing, Listing.id, ids, BOARD_ACTIONS[action])
+    db.commit()
+    if done:
+        feeds.invalidate(feeds.BOARD)
+    announce_bulk("board", action, done, ["board"])
+    return {"ok": True, "action": action, "updated": len(done), "results": bulk_results(ids, done)}
@@ -1,10 +1,14 @@
 # app/routers/admin_couriers.py
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
 from ..db import get_db
+from ..models.courier import CourierProfile
+from ..resources import templates
+from ..serializers import courier_profile_to_admin
+from ..services.moderation import parse_bulk_payload, bulk_set, bulk_results, announce_bulk
 # без ensure_is_admin, как у водителей, чтобы исключить 403
 from ..services.courier import (
     admin_list_pending_couriers,
@@ -17,8 +21,6 @@ router = APIRouter(tags=["admin-couriers"])
 # ---------- HTML ----------
 @router.get("/admin/couriers")
 def admin_couriers_page(request: Request):
-    from fastapi.templating import Jinja2Templates
-    templates = Jinja2Templates(directory="templates")
     return templates.TemplateResponse("admin_couriers.html", {
         "request": request,
         "back_href": "/dashboard",
@@ -28,18 +30,7 @@ def admin_couriers_page(request: Request):
 @router.get("/api/admin/couriers/pending")
 def api_admin_couriers_pending(db: Session = Depends(get_db)):
     rows = admin_list_pending_couriers(db)
-    # нормализуем в JSON
-    profiles = []
-    for p in rows:
-        profiles.append({
-            "user_id": getattr(p, "user_id", None),
-            "full_name": getattr(p, "full_name", None),
-            "phone": getattr(p, "phone", None),
-            "notes": getattr(p, "notes", None),
-            "approved": bool(getattr(p, "approved", False)),
-            "rejected": bool(getattr(p, "rejected", False)),
-            "active": bool(getattr(p, "active", False)),
-        })
+    profiles = [courier_profile_to_admin(p) for p in rows]
     # только реально на модерации (safety)
     profiles = [x for x in profiles if x["user_id"] and not x["approved"] and not x["rejected"]]
     return {"ok": True, "profiles": profiles}
@@ -52,4 +43,23 @@ def api_admin_courier_approve(user_id: int, db: Session = Depends(get_db)):
 @router.post("/api/admin/couriers/{user_id}/reject")
 def api_admin_courier_reject(user_id: int, db: Session = Depends(get_db)):
     p = admin_reject_courier(db, user_id)
-    return {"ok": True, "user_id": user_id, "rejected": bool(getattr(p, "rejected", False))}
\ No newline at end of file
+    return {"ok": True, "user_id": user_id, "rejected": bool(getattr(p, "rejected", False))}
+
+
+# ---------- Массовая модерация (ids — это user_id курьеров) ----------
+COURIER_ACTIONS = {
+    "approve": {"approved": True, "rejected": False},
+    "reject": {"approved": False, "rejected": True, "active": False},
+}
+
+@router.post("/api/admin/couriers/bulk")
+def api_admin_couriers_bulk(payload: dict, db: Session = Depends(get_db)):
+    try:
+        ids, action = parse_bulk_payload(payload, COURIER_ACTIONS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    done = bulk_set(db, CourierProfile, CourierProfile.user_id, ids, COURIER_ACTIONS[action])
+    db.commit()
+    announce_bulk("couriers", action, done, ["couriers"])
+    return {"ok": True, "action": action, "updated": len(done), "results": bulk_results(ids, done)}
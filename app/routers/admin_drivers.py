@@ -5,6 +5,11 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
 from ..db import get_db
+from ..models.driver import DriverProfile
+from ..models.taxi import TaxiVehicle
+from ..resources import templates
+from ..serializers import driver_profile_to_admin, vehicle_to_admin
+from ..services.moderation import parse_bulk_payload, bulk_set, bulk_results, announce_bulk
 from ..services.driver import (
     admin_list_pending,
     admin_approve_profile,
@@ -18,38 +23,14 @@ router = APIRouter(tags=["admin-drivers"])
 # ---------- HTML-страница ----------
 @router.get("/admin/drivers")
 def admin_drivers_page(request: Request):
-    from fastapi.templating import Jinja2Templates
-    templates = Jinja2Templates(directory="templates")
     return templates.TemplateResponse("admin_drivers.html", {"request": request, "back_href": "/dashboard"})
 
 # ---------- API ----------
 @router.get("/api/admin/drivers/pending")
 def api_admin_pending(db: Session = Depends(get_db)):
     data = admin_list_pending(db)
-    # Преобразуем в сериализуемый вид
-    profiles = [{
-        "user_id": p.user_id,
-        "full_name": p.full_name,
-        "phone": p.phone,
-        "license_number": p.license_number,
-        "license_valid_to": (p.license_valid_to.isoformat() if p.license_valid_to else None),
-        "notes": p.notes,
-        "approved": p.approved,
-        "rejected": p.rejected,
-        "active": p.active,
-    } for p in data["profiles"]]
-
-    vehicles = [{
-        "driver_id": v.driver_id,
-        "make": v.make,
-        "model": v.model,
-        "color": v.color,
-        "plate": v.plate,
-        "seats": v.seats,
-        "photo_url": v.photo_url,
-        "verified": v.verified,
-    } for v in data["vehicles"]]
-
+    profiles = [driver_profile_to_admin(p) for p in data["profiles"]]
+    vehicles = [vehicle_to_admin(v) for v in data["vehicles"]]
     return {"ok": True, "profiles": profiles, "vehicles": vehicles}
 
 @router.post("/api/admin/drivers/{user_id}/approve_profile")
@@ -85,6 +66,43 @@ def api_admin_approve_all(user_id: int, db: Session = Depends(get_db)):
         vehicle_verified = False
     return {"ok": True, "user_id": user_id, "profile_approved": p.approved, "vehicle_verified": vehicle_verified}
 
+# ---------- Массовая модерация (ids — это user_id водителей) ----------
+DRIVER_ACTIONS = ("approve_profile", "reject_profile", "verify_vehicle", "unverify_vehicle", "approve_all")
+
+@router.post("/api/admin/drivers/bulk")
+def api_admin_drivers_bulk(payload: dict, db: Session = Depends(get_db)):
+    try:
+        ids, action = parse_bulk_payload(payload, DRIVER_ACTIONS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if action == "approve_profile":
+        done = bulk_set(db, DriverProfile, DriverProfile.user_id, ids, {"approved": True, "rejected": False})
+    elif action == "reject_profile":
+        done = bulk_set(db, DriverProfile, DriverProfile.user_id, ids, {"approved": False, "rejected": True, "active": False})
+    elif action == "verify_vehicle":
+        done = bulk_set(db, TaxiVehicle, TaxiVehicle.driver_id, ids, {"verified": True})
+    elif action == "unverify_vehicle":
+        done = bulk_set(db, TaxiVehicle, TaxiVehicle.driver_id, ids, {"verified": False})
+    else:
+        # как approve_all: профиль обязателен, авто — если есть
+        done = bulk_set(db, DriverProfile, DriverProfile.user_id, ids, {"approved": True, "rejected": False})
+        verified = bulk_set(db, TaxiVehicle, TaxiVehicle.driver_id, sorted(done), {"verified": True})
+    db.commit()
+
+    results = bulk_results(ids, done)
+    if action == "approve_all":
+        for r in results:
+            if r["ok"]:
+                r["vehicle_verified"] = r["id"] in verified
+    queues = {
+        "approve_profile": ["drivers"], "reject_profile": ["drivers"],
+        "verify_vehicle": ["vehicles"], "unverify_vehicle": ["vehicles"],
+        "approve_all": ["drivers", "vehicles"],
+    }[action]
+    announce_bulk("drivers", action, done, queues)
+    return {"ok": True, "action": action, "updated": len(done), "results": results}
+
 # ---------- Совместимость со старыми URL (если фронт их использует) ----------
 @router.get("/api/admin/pending")
 def api_admin_pending_compat(db: Session = Depends(get_db)):
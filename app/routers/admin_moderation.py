@@ -0,0 +1,49 @@
+# app/routers/admin_moderation.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..deps import ensure_is_admin
+from ..realtime import hub
+from ..serializers import json_response
+from ..services.moderation import QUEUES, TOPIC, counters, queue_page
+
+# только для админов: в очередях — телефоны и данные прав заявителей
+router = APIRouter(
+    prefix="/api/admin/moderation",
+    tags=["admin-moderation"],
+    dependencies=[Depends(ensure_is_admin)],
+)
+
+
+@router.get("/counts")
+def api_moderation_counts(db: Session = Depends(get_db)):
+    # из памяти; в БД идём только за очередями, которые менялись с прошлого раза
+    return {"ok": True, "counts": counters.get(db)}
+
+
+# ---------- Real-time stream (SSE) ----------
+@router.get("/stream")
+def api_moderation_stream():
+    async def gen():
+        yield ": ok\n\n"
+        async for msg in hub.subscribe(TOPIC):
+            yield msg
+    return StreamingResponse(gen(), media_type="text/event-stream")
+
+
+@router.get("/{queue}")
+def api_moderation_queue(
+    queue: str,
+    cursor: int | None = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    if queue not in QUEUES:
+        raise HTTPException(status_code=404, detail="Неизвестная очередь")
+    rows, next_cursor = queue_page(db, queue, cursor, limit)
+    serialize = QUEUES[queue].serialize
+    return json_response({"ok": True, "items": [serialize(r) for r in rows], "next_cursor": next_cursor})
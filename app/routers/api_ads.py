@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from ..db import get_db
 from ..deps import get_current_tg_user
 from ..models.ad import Ad
 from ..models.user import User
+from ..serializers import ad_to_public
+from ..services import feeds
 
 router = APIRouter(prefix="/api/ads", tags=["ads"])
 
@@ -21,11 +23,12 @@ def create_ad(payload: dict, tg_user=Depends(get_current_tg_user), db: Session =
         db.add(u); db.flush()
     ad = Ad(author_id=u.id, title=title, description=payload.get("description"), image_url=payload.get("image_url"), category=payload.get("category"))
     db.add(ad); db.commit(); db.refresh(ad)
+    feeds.invalidate(feeds.ADS)
     return {"ok": True, "ad_id": ad.id}
 
 @router.get("")
-def list_ads(db: Session = Depends(get_db)):
-    rows = db.execute(select(Ad).order_by(Ad.id.desc())).scalars().all()
-    return {"ok": True, "items": [
-        {"id": x.id, "title": x.title, "desc": x.description, "img": x.image_url, "cat": x.category} for x in rows
-    ]}
\ No newline at end of file
+def list_ads(request: Request, db: Session = Depends(get_db)):
+    def build():
+        rows = db.execute(select(Ad).order_by(Ad.id.desc())).scalars().all()
+        return {"ok": True, "items": [ad_to_public(x) for x in rows]}
+    return feeds.serve(request, feeds.ADS, build)
\ No newline at end of file
@@ -1,42 +1,134 @@
 # app/routers/api_chat.py
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import select
-from ..db import get_db
+from ..config import settings
+from ..db import get_db, SessionLocal
 from ..deps import get_current_tg_user
-from ..models.chat import ChatMessage
+from ..models.chat import ChatMessage, ChatMessageArchive
 from ..models.user import User
+from ..realtime import hub
+from ..serializers import chat_to_public, chat_to_dict, json_response
+from ..services.chat import recent, writer, resolve_author
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 @router.get("/messages")
 def list_messages(
     after_id: int | None = Query(None),
+    before_id: int | None = Query(None),
     limit: int = Query(50, le=200),
     db: Session = Depends(get_db)
 ):
+    recent.warm(db)
+
     if after_id:
-        q = select(ChatMessage).where(ChatMessage.id > after_id).order_by(ChatMessage.id.asc()).limit(limit)
-        rows = db.execute(q).scalars().all()
-        return {"ok": True, "items": [
-            {"id": m.id, "name": m.author_name, "text": m.text, "created_at": m.created_at.isoformat()} for m in rows
-        ]}
+        # горячий путь: новые сообщения из памяти; старше буфера — из БД
+        items = recent.after(after_id, limit)
+        if items is None:
+            items = _history_after(db, after_id, limit)
+        return json_response({"ok": True, "items": items})
+    if before_id is None:
+        return json_response({"ok": True, "items": _latest_page(db, limit)})
+    return json_response({"ok": True, "items": _page_before(db, before_id, limit)})
+
+def _latest_page(db: Session, limit: int) -> list:
+    """Последняя страница чата (первая загрузка): из памяти, если буфер её покрывает."""
+    items = recent.latest(limit)
+    if items is not None:
+        return items
+    return _page_before(db, None, limit)
+
+def _page_before(db: Session, before_id: int | None, limit: int) -> list:
+    # холодная история — из БД
     q = select(ChatMessage).order_by(ChatMessage.id.desc()).limit(limit)
-    rows = list(reversed(db.execute(q).scalars().all()))
-    return {"ok": True, "items": [
-        {"id": m.id, "name": m.author_name, "text": m.text, "created_at": m.created_at.isoformat()} for m in rows
-    ]}
+    if before_id:
+        q = q.where(ChatMessage.id < before_id)
+    rows = db.execute(q).scalars().all()
+    if len(rows) < limit:
+        # ещё глубже — архив
+        aq = select(ChatMessageArchive).order_by(ChatMessageArchive.id.desc()).limit(limit - len(rows))
+        edge = rows[-1].id if rows else before_id
+        if edge:
+            aq = aq.where(ChatMessageArchive.id < edge)
+        rows = list(rows) + list(db.execute(aq).scalars().all())
+    return [chat_to_public(m) for m in reversed(rows)]
+
+def _history_after(db: Session, after_id: int, limit: int) -> list:
+    q = select(ChatMessage).where(ChatMessage.id > after_id).order_by(ChatMessage.id.asc()).limit(limit)
+    return [chat_to_public(m) for m in db.execute(q).scalars().all()]
+
+# для async-эндпоинтов: своя короткая сессия в пуле потоков, а не на всё время ожидания
+def _warm_recent() -> None:
+    db = SessionLocal()
+    try:
+        recent.warm(db)
+    finally:
+        db.close()
+
+def _history_after_fresh(after_id: int, limit: int) -> list:
+    db = SessionLocal()
+    try:
+        return _history_after(db, after_id, limit)
+    finally:
+        db.close()
+
+def _latest_page_fresh(limit: int) -> list:
+    db = SessionLocal()
+    try:
+        return _latest_page(db, limit)
+    finally:
+        db.close()
 
 @router.post("/messages")
-def send_message(payload: dict, tg_user=Depends(get_current_tg_user), db: Session = Depends(get_db)):
+async def send_message(
+    payload: dict,
+    tg_user=Depends(get_current_tg_user),
+):
     text = (payload.get("text") or "").strip()
     if not text:
         raise HTTPException(400, "text required")
 
-    from ..services.users import ensure_user_from_tg
-    u = ensure_user_from_tg(db, tg_user)
-    display_name = u.display_name
+    # пользователь из кэша; запись — пакетом вместе с соседними сообщениями
+    author_id, display_name = await resolve_author(tg_user)
+    item = await writer.submit(author_id, int(tg_user["id"]), display_name, text)
+    return {"ok": True, "id": item["id"]}
+
+# ---------- Real-time stream (SSE) ----------
+@router.get("/stream")
+def chat_stream():
+    async def gen():
+        yield ": ok\n\n"
+        async for msg in hub.subscribe("chat"):
+            yield msg
+    return StreamingResponse(gen(), media_type="text/event-stream")
+
+# ---------- Long-poll (если SSE не держится) ----------
+@router.get("/poll")
+async def chat_poll(
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(50, le=200),
+    timeout: float = Query(settings.LONG_POLL_TIMEOUT_SEC, gt=0),
+):
+    """
+    Ждём сообщений новее after_id (не дольше timeout) и отдаём их.
+    Без курсора (after_id=0) — та же последняя страница, что и GET /messages;
+    чат пуст — ждём первое сообщение, как обычно.
+    """
+    if not recent.ready:
+        await run_in_threadpool(_warm_recent)
+    if not after_id:
+        items = await run_in_threadpool(_latest_page_fresh, limit)
+        if items:
+            return json_response({"ok": True, "items": items})
 
-    msg = ChatMessage(author_id=u.id, author_tg_id=tg_user["id"], author_name=display_name, text=text)
-    db.add(msg); db.commit(); db.refresh(msg)
-    return {"ok": True, "id": msg.id}
\ No newline at end of file
+    since = hub.version("chat")
+    items = recent.after(after_id, limit)
+    if items == []:
+        await hub.wait("chat", since, hub.boot_id, min(timeout, settings.LONG_POLL_TIMEOUT_SEC))
+        items = recent.after(after_id, limit)
+    if items is None:
+        items = await run_in_threadpool(_history_after_fresh, after_id, limit)
+    return json_response({"ok": True, "items": items})
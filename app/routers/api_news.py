@@ -1,23 +1,20 @@
 # app/routers/api_news.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from ..db import get_db
 from ..deps import get_current_tg_user
 from ..models.news import NewsPost
 from ..models.user import User
+from ..serializers import news_to_public
+from ..services import feeds
+from ..services.news import list_feed
 
 router = APIRouter(prefix="/api/news", tags=["news"])
 
 @router.get("")
-def list_news(db: Session = Depends(get_db)):
-    rows = db.execute(
-        select(NewsPost).order_by(NewsPost.pinned.desc(), NewsPost.id.desc()).limit(100)
-    ).scalars().all()
-    return {"ok": True, "items": [
-        {"id": n.id, "title": n.title, "body": n.body, "img": n.image_url, "pinned": n.pinned,
-         "author": n.author_name, "created_at": n.created_at.isoformat()} for n in rows
-    ]}
+def list_news(request: Request, db: Session = Depends(get_db)):
+    return feeds.serve(request, feeds.NEWS, lambda: {"ok": True, "items": [news_to_public(n) for n in list_feed(db)]})
 
 @router.post("")
 def add_news(payload: dict, tg_user=Depends(get_current_tg_user), db: Session = Depends(get_db)):
@@ -49,4 +46,5 @@ def add_news(payload: dict, tg_user=Depends(get_current_tg_user), db: Session =
         pinned=bool(payload.get("pinned", False)),
     )
     db.add(post); db.commit(); db.refresh(post)
+    feeds.invalidate(feeds.NEWS)
     return {"ok": True, "id": post.id}
\ No newline at end of file
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
@@ -8,15 +8,17 @@ from ..db import get_db
 from ..deps import get_current_tg_user
 from ..models.user import User
 from ..models.classifieds import Listing  # <-- фикс: используем Listing
+from ..resources import resources
+from ..services import feeds
+from ..services.classifieds import search_listings
+from ..serializers import listing_to_public, listing_to_owner, forget_listing, json_response
 
 router = APIRouter(tags=["board"])
 
 # ---------- HTML ----------
 @router.get("/board")
 def board_page(request: Request):
-    from fastapi.templating import Jinja2Templates
-    templates = Jinja2Templates(directory="templates")
-    return templates.TemplateResponse("board.html", {"request": request, "back_href": "/dashboard"})
+    return resources.render_shell(request, "board.html", back_href="/dashboard")
 
 # ---------- helpers ----------
 def ensure_user_from_tg(db: Session, tg_user: dict) -> User:
@@ -34,22 +36,30 @@ def ensure_user_from_tg(db: Session, tg_user: dict) -> User:
 
 # ---------- API ----------
 @router.get("/api/board/listings")
-def api_board_public(db: Session = Depends(get_db), limit: int = 100):
-    rows = db.execute(
-        select(Listing).where(Listing.approved.is_(True), Listing.rejected.is_(False)).order_by(Listing.id.desc()).limit(limit)
-    ).scalars().all()
-    items = []
-    for it in rows:
-        items.append({
-            "id": it.id,
-            "title": it.title,
-            "description": it.description,
-            "price": it.price,
-            "photo_url": it.photo_url,
-            "phone": it.phone,
-            "created_at": (it.created_at.isoformat() if it.created_at else None)
-        })
-    return {"ok": True, "items": items}
+def api_board_public(request: Request, db: Session = Depends(get_db), limit: int = 100):
+    # лента одинакова для всех — из памяти; сбрасывается при создании/удалении/модерации
+    def build():
+        rows = db.execute(
+            select(Listing).where(Listing.approved.is_(True), Listing.rejected.is_(False))
+            .order_by(Listing.id.desc()).limit(limit)
+        ).scalars().all()
+        return {"ok": True, "items": [listing_to_public(it) for it in rows]}
+    return feeds.serve(request, feeds.BOARD, build, key=limit)
+
+@router.get("/api/board/search")
+def api_board_search(
+    q: str | None = Query(None, max_length=200),
+    price_min: int | None = Query(None, ge=0),
+    price_max: int | None = Query(None, ge=0),
+    cursor: str | None = Query(None, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    try:
+        items, next_cursor = search_listings(db, q, price_min, price_max, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return json_response({"ok": True, "items": [listing_to_public(it) for it in items], "next_cursor": next_cursor})
 
 @router.get("/api/board/my")
 def api_board_my(tg_user=Depends(get_current_tg_user), db: Session = Depends(get_db)):
@@ -57,19 +67,7 @@ def api_board_my(tg_user=Depends(get_current_tg_user), db: Session = Depends(get
     rows = db.execute(
         select(Listing).where(Listing.user_id == u.id).order_by(Listing.id.desc())
     ).scalars().all()
-    items = []
-    for it in rows:
-        items.append({
-            "id": it.id,
-            "title": it.title,
-            "description": it.description,
-            "price": it.price,
-            "photo_url": it.photo_url,
-            "phone": it.phone,
-            "approved": it.approved,
-            "rejected": it.rejected,
-        })
-    return {"ok": True, "items": items}
+    return json_response({"ok": True, "items": [listing_to_owner(it) for it in rows]})
 
 @router.post("/api/board/listings")
 def api_board_create(
@@ -102,6 +100,7 @@ def api_board_create(
     db.add(it)
     db.commit()
     db.refresh(it)
+    feeds.invalidate(feeds.BOARD)
     return {"ok": True, "id": it.id}
 
 @router.delete("/api/board/listings/{listing_id}")
@@ -119,4 +118,6 @@ def api_board_delete(
 
     db.delete(it)
     db.commit()
+    forget_listing(listing_id)
+    feeds.invalidate(feeds.BOARD)
     return {"ok": True, "deleted": listing_id}
\ No newline at end of file
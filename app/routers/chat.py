@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from ..resources import resources
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 @router.get("/chat", response_class=HTMLResponse)
 def chat_page(request: Request):
-    return templates.TemplateResponse("chat.html", {"request": request, "back_href": "/dashboard"})
\ No newline at end of file
+    return resources.render_shell(request, "chat.html", back_href="/dashboard")
\ No newline at end of file
@@ -4,29 +4,24 @@ import datetime as dt
 from typing import Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, BackgroundTasks
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_
-from ..db import Base
+
 from ..db import get_db
 from ..deps import get_current_tg_user
 from ..realtime import hub
+from ..resources import resources
+from ..serializers import order_to_public, json_response
+from ..utils.http_cache import etag_matches, not_modified, etag_headers
 
-from ..models.user import User
-from ..models.delivery import (
-    DeliveryOrder, DeliveryBid, DeliveryStatus, DeliveryPriceMode, DeliveryBidStatus
-)
+from ..models.delivery import DeliveryOrder, DeliveryPriceMode
+from ..services.orders import delivery_orders, http_errors
+from ..services.streets import streets
 from ..services.courier import (
     ensure_user_from_tg,
     get_or_create_profile, submit_profile, set_active, ensure_courier_allowed
 )
 
-import httpx
-from sqlalchemy import select
-
 from ..config import settings
-from ..models.user import User
-from ..models.courier import CourierProfile
 
 router = APIRouter(tags=["delivery"])
 
@@ -34,9 +29,7 @@ router = APIRouter(tags=["delivery"])
 # ---------- UI ----------
 @router.get("/delivery")
 def delivery_page(request: Request):
-    from fastapi.templating import Jinja2Templates
-    templates = Jinja2Templates(directory="templates")
-    return templates.TemplateResponse("delivery.html", {"request": request, "back_href": "/dashboard"})
+    return resources.render_shell(request, "delivery.html", back_href="/dashboard")
 
 
 # ---------- Courier Onboarding API ----------
@@ -71,7 +64,7 @@ def api_courier_profile(
 ):
     try:
         p = submit_profile(db, tg_user, payload)
-        background_tasks.add_task(hub.publish, "courier_profile_updated", {"user_id": p.user_id})
+        background_tasks.add_task(hub.publish, "courier_profile_updated", {"user_id": p.user_id}, topic="delivery")
         return {"ok": True, "profile_id": p.id, "approved": p.approved}
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
@@ -89,7 +82,7 @@ def api_courier_active(
     try:
         value = bool(payload.get("active"))
         p = set_active(db, tg_user, value)
-        background_tasks.add_task(hub.publish, "courier_active_changed", {"user_id": p.user_id, "active": p.active})
+        background_tasks.add_task(hub.publish, "courier_active_changed", {"user_id": p.user_id, "active": p.active}, topic="delivery")
         return {"ok": True, "active": p.active}
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
@@ -99,51 +92,19 @@ def api_courier_active(
 
 # ---------- Orders / Bids API ----------
 
-def _order_to_public(o: DeliveryOrder, courier: User | None = None):
-    def _dt(x):
-        if isinstance(x, (dt.date, dt.datetime)):
-            return x.isoformat()
-        return x
+def _new_order_text(o: DeliveryOrder) -> str:
+    is_fixed = (o.price_mode == DeliveryPriceMode.CLIENT_SETS)
+    price_part = f" • {o.client_price} ₽" if (is_fixed and o.client_price) else ""
+    to_line = ""
+    if o.to_street or o.to_house:
+        to_line = f"\nДоставить: {(o.to_street or '')} {(o.to_house or '')}".strip()
+    return (
+        "📦 Новый заказ (доставка)\n"
+        f"{o.title}{price_part}"
+        f"{to_line}\n"
+        "Открой Mini App, чтобы посмотреть детали."
+    )
 
-    out = {
-        "id": o.id,
-        "status": (o.status.value if isinstance(o.status, DeliveryStatus) else str(o.status)).lower(),
-        "price_mode": (o.price_mode.value if isinstance(o.price_mode, DeliveryPriceMode) else str(o.price_mode)).lower(),
-        "client_price": o.client_price,
-        "final_price": o.final_price,
-        "title": o.title,
-        "details": o.details,
-        "from_place": o.from_place,
-        "to": {"street": o.to_street, "house": o.to_house, "comment": o.to_comment},
-        "created_at": _dt(o.created_at),
-        "updated_at": _dt(o.updated_at),
-    }
-    if o.assigned_courier_id:
-        out["courier"] = {
-            "id": o.assigned_courier_id,
-            "tg_id": o.assigned_courier_tg_id,
-        }
-    return out
-
-
-async def notify_delivery_new_order(tg_ids: list[int], text: str) -> None:
-    """
-    Шлёт текстовое уведомление всем chat_id в tg_ids.
-    Безопасно молчит, если нет токена или список пустой.
-    """
-    token = settings.BOT_TOKEN
-    if not token or not tg_ids:
-        if not token:
-            print("[WARN] Не указан BOT_TOKEN — уведомления о доставке не отправлены")
-        return
-
-    api_url = f"https://api.telegram.org/bot{token}/sendMessage"
-    async with httpx.AsyncClient(timeout=8.0) as client:
-        for chat_id in tg_ids:
-            try:
-                await client.post(api_url, json={"chat_id": chat_id, "text": text})
-            except Exception as e:
-                print(f"[WARN] sendMessage(delivery) failed for {chat_id}: {e}")
 
 @router.post("/api/delivery/orders")
 def api_create_order(
@@ -158,15 +119,13 @@ def api_create_order(
     if not title:
         raise HTTPException(status_code=400, detail="Укажите короткое описание заказа (title).")
 
-    mode_raw = (payload.get("price_mode") or "client_sets").lower()
-    mode = DeliveryPriceMode.CLIENT_SETS if mode_raw == "client_sets" else DeliveryPriceMode.COURIER_BIDS
-
-    client_price = payload.get("client_price")
-    client_price = int(client_price) if (client_price not in (None, "")) else None
-    if mode == DeliveryPriceMode.CLIENT_SETS and (client_price is None or client_price <= 0):
-        raise HTTPException(status_code=400, detail="Укажите корректную цену для фиксированного заказа.")
+    with http_errors():
+        mode = delivery_orders.parse_mode(payload.get("price_mode"))
+        client_price = delivery_orders.parse_price(payload.get("client_price"))
+        if mode == DeliveryPriceMode.CLIENT_SETS and (client_price is None or client_price <= 0):
+            raise ValueError("Укажите корректную цену для фиксированного заказа.")
 
-    o = DeliveryOrder(
+    o = delivery_orders.create(db, DeliveryOrder(
         customer_id=u.id,
         customer_tg_id=u.telegram_id,
         title=title,
@@ -177,90 +136,44 @@ def api_create_order(
         to_comment=(payload.get("to_comment") or None),
         price_mode=mode,
         client_price=client_price,
-        status=DeliveryStatus.NEW,
-    )
-    db.add(o)
-    db.commit()
-    db.refresh(o)
+    ), background_tasks)
+    streets.add(o.to_street)
 
-    # --- realtime событие для фронта ---
-    background_tasks.add_task(hub.publish, "delivery_order_created", {"order_id": o.id})
+    # фоновая отправка TG-уведомлений активным и одобренным курьерам, исключая автора
+    tg_ids = delivery_orders.staff_tg_ids(db, exclude_tg_id=u.telegram_id)
+    background_tasks.add_task(delivery_orders.notify, tg_ids, _new_order_text(o))
 
-    # --- подготовка Telegram-уведомления, как в такси ---
-    is_fixed = (o.price_mode == DeliveryPriceMode.CLIENT_SETS)
-    price_part = f" • {o.client_price} ₽" if (is_fixed and o.client_price) else ""
-    to_line = ""
-    if o.to_street or o.to_house:
-        to_line = f"\nДоставить: {(o.to_street or '')} {(o.to_house or '')}".strip()
-
-    text = (
-        "📦 Новый заказ (доставка)\n"
-        f"{o.title}{price_part}"
-        f"{to_line}\n"
-        "Открой Mini App, чтобы посмотреть детали."
-    )
-
-    # активные и одобренные курьеры, исключая автора (на случай совпадения)
-    tg_ids = db.execute(
-        select(User.telegram_id)
-        .join(CourierProfile, CourierProfile.user_id == User.id)
-        .where(CourierProfile.approved.is_(True))
-        .where(CourierProfile.active.is_(True))
-    ).scalars().all()
-    tg_ids = [int(tg) for tg in tg_ids if tg and int(tg) != int(u.telegram_id or 0)]
-
-    # фоновая отправка TG-уведомлений
-    background_tasks.add_task(notify_delivery_new_order, tg_ids, text)
-
-    return {"ok": True, "order": _order_to_public(o)}
+    return {"ok": True, "order": order_to_public(o)}
 
 
 @router.get("/api/delivery/orders")
 def api_list_orders(
+    request: Request,
     role: Literal["customer", "courier", "feed"] = Query("customer"),
     limit: int = Query(50, le=200),
     tg_user=Depends(get_current_tg_user),
     db: Session = Depends(get_db),
 ):
+    # версия данных — счётчик событий топика "delivery"
+    etag = delivery_orders.etag(tg_user.get("id"), role, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     u = ensure_user_from_tg(db, tg_user)
-    items = []
 
     try:
         if role == "customer":
-            rows = db.execute(
-                select(DeliveryOrder)
-                .where(DeliveryOrder.customer_id == u.id)
-                .order_by(DeliveryOrder.id.desc())
-                .limit(limit)
-            ).scalars().all()
-            for o in rows:
-                items.append(_order_to_public(o))
-
+            items = [order_to_public(o) for o in delivery_orders.rows(db, "owner", u.id, limit)]
         elif role == "courier":
             ensure_courier_allowed(db, tg_user, need_active=True)
-            rows = db.execute(
-                select(DeliveryOrder)
-                .where(DeliveryOrder.assigned_courier_id == u.id)
-                .order_by(DeliveryOrder.id.desc())
-                .limit(limit)
-            ).scalars().all()
-            for o in rows:
-                items.append(_order_to_public(o))
-
+            items = [order_to_public(o) for o in delivery_orders.rows(db, "assignee", u.id, limit)]
         else:  # feed
             ensure_courier_allowed(db, tg_user, need_active=True)
-            rows = db.execute(
-                select(DeliveryOrder)
-                .where(DeliveryOrder.status == DeliveryStatus.NEW)
-                .order_by(DeliveryOrder.id.desc())
-                .limit(limit)
-            ).scalars().all()
-            items = [_order_to_public(o) for o in rows]
-
+            items = delivery_orders.feed(db, limit, order_to_public)
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
 
-    return {"ok": True, "items": items}
+    return json_response({"ok": True, "items": items}, headers=etag_headers(etag))
 
 
 # Курьер делает ставку (для COURIER_BIDS)
@@ -274,39 +187,9 @@ def api_courier_bid(
 ):
     ensure_courier_allowed(db, tg_user, need_active=True)
     u = ensure_user_from_tg(db, tg_user)
-    o = db.get(DeliveryOrder, order_id)
-    if not o:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-    if o.price_mode != DeliveryPriceMode.COURIER_BIDS:
-        raise HTTPException(status_code=400, detail="Для этого заказа ставки не принимаются")
-    if o.status != DeliveryStatus.NEW:
-        raise HTTPException(status_code=400, detail="Ставки принимаются только для новых заказов")
-
-    price = payload.get("offered_price")
-    price = int(price) if price not in (None, "") else None
-    if not price or price <= 0:
-        raise HTTPException(status_code=400, detail="Укажите корректную цену")
-
-    existing = db.execute(select(DeliveryBid).where(
-        DeliveryBid.order_id == o.id,
-        DeliveryBid.driver_id == u.id,
-        DeliveryBid.status == DeliveryBidStatus.PENDING
-    )).scalar_one_or_none()
-
-    if existing:
-        existing.offered_price = price
-        db.commit()
-        bid = existing
-    else:
-        bid = DeliveryBid(
-            order_id=o.id, driver_id=u.id, driver_tg_id=u.telegram_id,
-            offered_price=price, status=DeliveryBidStatus.PENDING
-        )
-        db.add(bid)
-        db.commit()
-        db.refresh(bid)
-
-    background_tasks.add_task(hub.publish, "delivery_bid_created", {"order_id": o.id})
+    with http_errors():
+        o = delivery_orders.get(db, order_id)
+        bid, _ = delivery_orders.bid(db, o, u, payload.get("offered_price"), background_tasks)
     return {"ok": True, "bid_id": bid.id}
 
 
@@ -319,30 +202,8 @@ def api_customer_accept_bid(
     db: Session = Depends(get_db),
 ):
     u = ensure_user_from_tg(db, tg_user)
-    b = db.get(DeliveryBid, bid_id)
-    if not b:
-        raise HTTPException(status_code=404, detail="Ставка не найдена")
-    o = db.get(DeliveryOrder, b.order_id)
-    if not o or o.customer_id != u.id:
-        raise HTTPException(status_code=403, detail="Нет доступа")
-    if o.status != DeliveryStatus.NEW:
-        raise HTTPException(status_code=400, detail="Нельзя принять ставку: заказ не новый")
-
-    o.assigned_courier_id = b.driver_id
-    o.assigned_courier_tg_id = b.driver_tg_id
-    o.final_price = b.offered_price
-    o.status = DeliveryStatus.ASSIGNED
-
-    b.status = DeliveryBidStatus.ACCEPTED
-    db.execute(
-        DeliveryBid.__table__.update()
-        .where(and_(DeliveryBid.order_id == o.id, DeliveryBid.id != b.id, DeliveryBid.status == DeliveryBidStatus.PENDING))
-        .values(status=DeliveryBidStatus.REJECTED)
-    )
-    db.commit()
-    db.refresh(o)
-
-    background_tasks.add_task(hub.publish, "delivery_order_assigned", {"order_id": o.id, "courier_id": o.assigned_courier_id})
+    with http_errors():
+        o = delivery_orders.accept_bid(db, bid_id, u.id, background_tasks)
     return {"ok": True, "order_id": o.id, "status": o.status.value.lower(), "final_price": o.final_price}
 
 
@@ -357,24 +218,8 @@ def api_courier_accept_fixed(
 ):
     ensure_courier_allowed(db, tg_user, need_active=True)
     u = ensure_user_from_tg(db, tg_user)
-    o = db.get(DeliveryOrder, order_id)
-    if not o:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-    if o.status != DeliveryStatus.NEW:
-        raise HTTPException(status_code=400, detail="Заказ уже недоступен")
-    if o.price_mode != DeliveryPriceMode.CLIENT_SETS:
-        raise HTTPException(status_code=400, detail="Для этого заказа требуется ставка и одобрение клиента")
-    if not o.client_price or o.client_price <= 0:
-        raise HTTPException(status_code=400, detail="Фикс-цена не указана.")
-
-    o.assigned_courier_id = u.id
-    o.assigned_courier_tg_id = u.telegram_id
-    o.final_price = o.client_price
-    o.status = DeliveryStatus.ASSIGNED
-    db.commit()
-    db.refresh(o)
-
-    background_tasks.add_task(hub.publish, "delivery_order_assigned", {"order_id": o.id, "courier_id": o.assigned_courier_id})
+    with http_errors():
+        o = delivery_orders.accept_fixed(db, delivery_orders.get(db, order_id), u, background_tasks)
     return {"ok": True, "id": o.id, "status": o.status.value.lower()}
 
 
@@ -386,43 +231,13 @@ def api_cancel_delivery_order(
     tg_user = Depends(get_current_tg_user),
     db: Session = Depends(get_db),
 ):
-    # 1) Автор — из Telegram WebApp
     u = ensure_user_from_tg(db, tg_user)
-
-    # 2) Заказ существует?
-    o = db.get(DeliveryOrder, order_id)
-    if not o:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-
-    # 3) Это его заказ?
-    if o.customer_id != u.id:
-        raise HTTPException(status_code=403, detail="Можно отменять только свои заказы")
-
-    # 4) Уже завершён/отменён?
-    if o.status in (DeliveryStatus.COMPLETED, DeliveryStatus.CANCELLED):
-        raise HTTPException(status_code=400, detail="Заказ уже завершён")
-
-    # 5) Отменяем
-    o.status = DeliveryStatus.CANCELLED
-    db.commit()
-    db.refresh(o)
-
-    # 6) Событие в SSE, чтобы фронт и лента курьеров обновились
-    background_tasks.add_task(
-        hub.publish,
-        "delivery_order_updated",
-        {"order_id": o.id, "status": o.status.value.lower()},
-    )
-
+    with http_errors():
+        o = delivery_orders.cancel(db, delivery_orders.get(db, order_id), u.id, background_tasks)
     return {"ok": True, "id": o.id, "status": o.status.value.lower()}
 
 
-_ALLOWED_TRANSITIONS = {
-    DeliveryStatus.ASSIGNED: {DeliveryStatus.ON_WAY, DeliveryStatus.IN_PROGRESS, DeliveryStatus.CANCELLED},
-    DeliveryStatus.ON_WAY: {DeliveryStatus.IN_PROGRESS, DeliveryStatus.CANCELLED},
-    DeliveryStatus.IN_PROGRESS: {DeliveryStatus.COMPLETED, DeliveryStatus.CANCELLED},
-}
-
+# Курьер двигает заказ по статусам (переходы — в app/services/orders.py)
 @router.post("/api/delivery/orders/{order_id}/status")
 def api_move_status(
     order_id: int,
@@ -432,43 +247,21 @@ def api_move_status(
     db: Session = Depends(get_db),
 ):
     u = ensure_user_from_tg(db, tg_user)
-    o = db.get(DeliveryOrder, order_id)
-    if not o:
-        raise HTTPException(status_code=404, detail="Заказ не найден")
-    if o.assigned_courier_id != u.id:
-        raise HTTPException(status_code=403, detail="Можно менять статус только назначенного вам заказа")
-
-    raw = (payload.get("status") or "").lower().strip()
-    map_in = {
-        "on_way": DeliveryStatus.ON_WAY,
-        "in_progress": DeliveryStatus.IN_PROGRESS,
-        "completed": DeliveryStatus.COMPLETED,
-        "cancelled": DeliveryStatus.CANCELLED,
-    }
-    if raw not in map_in:
-        raise HTTPException(status_code=400, detail="Неизвестный статус")
-    to_status = map_in[raw]
-
-    allowed = _ALLOWED_TRANSITIONS.get(o.status, set())
-    if to_status not in allowed:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Недопустимый переход из {o.status.value.lower()} в {to_status.value.lower()}"
-        )
-
-    o.status = to_status
-    db.commit()
-    db.refresh(o)
-
-    background_tasks.add_task(hub.publish, "delivery_order_updated", {"order_id": o.id, "status": o.status.value.lower()})
+    with http_errors():
+        o = delivery_orders.move(db, delivery_orders.get(db, order_id), u.id, payload.get("status"), background_tasks)
     return {"ok": True, "id": o.id, "status": o.status.value.lower()}
 
 
 # ---------- Real-time stream (SSE) ----------
 @router.get("/api/delivery/stream")
 def delivery_stream():
-    async def gen():
-        yield ": ok\n\n"
-        async for msg in hub.subscribe():
-            yield msg
-    return StreamingResponse(gen(), media_type="text/event-stream")
\ No newline at end of file
+    return delivery_orders.stream()
+
+# ---------- Long-poll (если SSE не держится) ----------
+@router.get("/api/delivery/poll")
+async def delivery_poll(
+    since: int = Query(0, ge=0),
+    boot: str | None = Query(None),
+    timeout: float = Query(settings.LONG_POLL_TIMEOUT_SEC, gt=0),
+):
+    return await delivery_orders.poll(since, boot, timeout)
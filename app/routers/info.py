@@ -1,13 +1,12 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from ..resources import resources, templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 @router.get("/info", response_class=HTMLResponse)
 def info_page(request: Request):
-    return templates.TemplateResponse("info.html", {"request": request})
+    return resources.render_shell(request, "info.html")
 
 # taxi.py
 @router.get("/taxi", response_class=HTMLResponse)
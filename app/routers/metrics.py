@@ -0,0 +1,24 @@
+# app/routers/metrics.py
+import hmac
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from ..config import settings
+from ..metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """
+    Метрики для Prometheus. Async — gauge пула потоков читается из цикла событий.
+    Только с заголовком Authorization: Bearer <METRICS_TOKEN>; токен не задан — эндпоинта нет.
+    """
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    auth = request.headers.get("authorization") or ""
+    if not hmac.compare_digest(auth.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -6,33 +6,22 @@ from ..db import get_db
 from ..deps import get_current_tg_user
 from ..models.news import NewsPost
 from ..services.users import ensure_user_from_tg
+from ..resources import resources
+from ..serializers import news_to_public
+from ..services import feeds
+from ..services.news import list_feed
 
 router = APIRouter(prefix="/news", tags=["news"])
 
 @router.get("")
 def news_page(request: Request):
     # отдаём страницу с новостями (если у тебя есть шаблон news.html)
-    from fastapi.templating import Jinja2Templates
-    templates = Jinja2Templates(directory="templates")
-    return templates.TemplateResponse("news.html", {"request": request, "back_href": "/dashboard"})
+    return resources.render_shell(request, "news.html", back_href="/dashboard")
 
 # API: список новостей
 @router.get("/api")
-def list_news(db: Session = Depends(get_db)):
-    rows = db.execute(
-        select(NewsPost).order_by(NewsPost.pinned.desc(), NewsPost.id.desc()).limit(100)
-    ).scalars().all()
-    return {"ok": True, "items": [
-        {
-            "id": n.id,
-            "title": n.title,
-            "body": n.body,
-            "img": n.image_url,
-            "pinned": n.pinned,
-            "author": n.author_name,
-            "created_at": (n.created_at.isoformat() if n.created_at else None),
-        } for n in rows
-    ]}
+def list_news(request: Request, db: Session = Depends(get_db)):
+    return feeds.serve(request, feeds.NEWS, lambda: {"ok": True, "items": [news_to_public(n) for n in list_feed(db)]})
 
 # API: добавление новости
 @router.post("/api")
@@ -59,4 +48,5 @@ def add_news(payload: dict, tg_user=Depends(get_current_tg_user), db: Session =
     db.add(post)
     db.commit()
     db.refresh(post)
+    feeds.invalidate(feeds.NEWS)
     return {"ok": True, "id": post.id}
\ No newline at end of file
@@ -1,17 +1,16 @@
 from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
+from ..resources import resources
 
 router = APIRouter(tags=["pages"])
-templates = Jinja2Templates(directory="templates")
 
 @router.get("/delivery", include_in_schema=False)
 def delivery_page(request: Request):
-    return templates.TemplateResponse("delivery.html", {"request": request})
+    return resources.render_shell(request, "delivery.html")
 
 @router.get("/board")
 def board_page(request: Request):
-    return templates.TemplateResponse("board.html", {"request": request, "back_href": "/dashboard"})
+    return resources.render_shell(request, "board.html", back_href="/dashboard")
 
 @router.get("/news", include_in_schema=False)
 def news_page(request: Request):
-    return templates.TemplateResponse("news.html", {"request": request})
\ No newline at end of file
+    return resources.render_shell(request, "news.html")
\ No newline at end of file
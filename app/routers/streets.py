@@ -0,0 +1,20 @@
+# app/routers/streets.py
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..services.streets import streets
+
+router = APIRouter(prefix="/api/streets", tags=["streets"])
+
+
+@router.get("/suggest")
+def api_streets_suggest(
+    q: str = Query("", max_length=160),
+    limit: int = Query(10, ge=1, le=30),
+    db: Session = Depends(get_db),
+):
+    # из индекса в памяти; БД нужна только для первого прогрева
+    return {"ok": True, "items": streets.suggest(db, q, limit)}
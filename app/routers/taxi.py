@@ -5,29 +5,38 @@ import datetime as dt
 from typing import Literal
 
 from fastapi import (
-    APIRouter, Depends, HTTPException, Query, Request, status, BackgroundTasks
+    APIRouter, Depends, HTTPException, Query, Request, status, BackgroundTasks,
+    WebSocket, WebSocketDisconnect
 )
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_
+from sqlalchemy import select
 
 from ..db import get_db
 from ..deps import get_current_tg_user
 from ..realtime import hub
+from ..resources import resources
+from ..serializers import trip_to_public, json_response
+from ..utils.http_cache import etag_matches, not_modified, etag_headers
 
 from ..models.user import User
 from ..models.taxi import (
     TaxiTrip, TaxiVehicle, TripStatus, PriceMode,
     TaxiBid, TaxiBidStatus
 )
+from ..services.pricing import prices
+from ..services.dispatch import dispatcher
+from ..services.bids import bid_book, user_topic
+from ..services.orders import taxi_orders, http_errors
+from ..services.streets import streets
+from ..services.geo import (
+    driver_locations, open_trips, parse_point, authorize_driver, forget_driver, cached_driver_id
+)
 from ..services.driver import (
     ensure_user_from_tg,
     get_or_create_profile, submit_profile, upsert_vehicle, set_active, ensure_driver_allowed
 )
 
-import httpx
 from ..config import settings
-from ..models.driver import DriverProfile 
 
 router = APIRouter(tags=["taxi"])
 
@@ -35,9 +44,7 @@ router = APIRouter(tags=["taxi"])
 # ---------- UI ----------
 @router.get("/taxi")
 def taxi_page(request: Request):
-    from fastapi.templating import Jinja2Templates
-    templates = Jinja2Templates(directory="templates")
-    return templates.TemplateResponse("taxi.html", {"request": request, "back_href": "/dashboard"})
+    return resources.render_shell(request, "taxi.html", back_href="/dashboard")
 
 
 # ---------- Driver Onboarding API ----------
@@ -91,7 +98,7 @@ def api_driver_profile(
     try:
         p = submit_profile(db, tg_user, payload)
         # уведомим всех водителей (их ленту это не затронет, но личные экраны освежатся)
-        background_tasks.add_task(hub.publish, "driver_profile_updated", {"user_id": p.user_id})
+        background_tasks.add_task(hub.publish, "driver_profile_updated", {"user_id": p.user_id}, topic="taxi")
         return {"ok": True, "profile_id": p.id, "approved": p.approved}
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
@@ -108,7 +115,7 @@ def api_driver_vehicle(
 ):
     try:
         v = upsert_vehicle(db, tg_user, payload)
-        background_tasks.add_task(hub.publish, "driver_vehicle_updated", {"user_id": v.driver_id})
+        background_tasks.add_task(hub.publish, "driver_vehicle_updated", {"user_id": v.driver_id}, topic="taxi")
         return {"ok": True, "vehicle_id": v.id}
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
@@ -129,7 +136,8 @@ def api_driver_active(
     try:
         value = bool(payload.get("active"))
         p = set_active(db, tg_user, value)
-        background_tasks.add_task(hub.publish, "driver_active_changed", {"user_id": p.user_id, "active": p.active})
+        forget_driver(tg_user["id"], None if p.active else p.user_id)
+        background_tasks.add_task(hub.publish, "driver_active_changed", {"user_id": p.user_id, "active": p.active}, topic="taxi")
         return {"ok": True, "active": p.active}
     except PermissionError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
@@ -137,42 +145,62 @@ def api_driver_active(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-# ---------- Trips / Bids API ----------
+# ---------- Driver location ----------
+@router.post("/api/taxi/driver/location")
+async def api_driver_location(payload: dict, tg_user=Depends(get_current_tg_user)):
+    """Пинг координат водителя: только в память (app/services/geo.py), БД не трогаем."""
+    try:
+        driver_id = await authorize_driver(tg_user)
+        lat, lon = parse_point(payload)
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    driver_locations.update(driver_id, int(tg_user["id"]), lat, lon)
+    return {"ok": True}
 
-def _trip_to_public(tr: TaxiTrip, driver: User | None = None, vehicle: TaxiVehicle | None = None):
-    def _dt(x):
-        if isinstance(x, (dt.date, dt.datetime)):
-            return x.isoformat()
-        return x
 
-    out = {
-        "id": tr.id,
-        "status": (tr.status.value if isinstance(tr.status, TripStatus) else str(tr.status)).lower(),
-        "price_mode": (tr.price_mode.value if isinstance(tr.price_mode, PriceMode) else str(tr.price_mode)).lower(),
-        "client_price": tr.client_price,
-        "final_price": tr.final_price,
-        "from": {"street": tr.from_street, "house": tr.from_house, "comment": tr.from_comment},
-        "to": {"street": tr.to_street, "house": tr.to_house, "comment": tr.to_comment},
-        "created_at": _dt(tr.created_at),
-        "updated_at": _dt(tr.updated_at),
-    }
-    if tr.assigned_driver_id:
-        out["driver"] = {
-            "id": tr.assigned_driver_id,
-            "tg_id": tr.assigned_driver_tg_id,
-            "name": (
-                driver.name if driver and getattr(driver, "name", None)
-                else (driver.username if driver else None)
-            ),
-            "username": (driver.username if driver else None),
-            "photo_url": (driver.photo_url if (driver and getattr(driver, "photo_url", None)) else None),
-        }
-    if vehicle:
-        out["vehicle"] = {
-            "make": vehicle.make, "model": vehicle.model, "color": vehicle.color,
-            "plate": vehicle.plate, "seats": vehicle.seats, "photo_url": vehicle.photo_url
-        }
-    return out
+@router.websocket("/api/taxi/driver/ws")
+async def ws_driver_location(ws: WebSocket):
+    """
+    Тот же пинг через WebSocket: клиент шлёт {"lat": .., "lon": ..}, ответ — только на ошибки.
+    Авторизация — по сессии (как у HTTP-запросов WebApp).
+    """
+    tg_user = (ws.session or {}).get("tg_user") if "session" in ws.scope else None
+    await ws.accept()
+    if not tg_user:
+        await ws.close(code=4401)
+        return
+    try:
+        while True:
+            msg = await ws.receive_json()
+            try:
+                driver_id = await authorize_driver(tg_user)
+                lat, lon = parse_point(msg if isinstance(msg, dict) else {})
+            except PermissionError as e:
+                await ws.send_json({"ok": False, "error": str(e)})
+                await ws.close(code=4403)
+                return
+            except ValueError as e:
+                await ws.send_json({"ok": False, "error": str(e)})
+                continue
+            driver_locations.update(driver_id, int(tg_user["id"]), lat, lon)
+    except (WebSocketDisconnect, ValueError):
+        # ValueError — пришёл не JSON
+        return
+
+
+# ---------- Trips / Bids API ----------
+
+@router.get("/api/taxi/price/suggest")
+def api_price_suggest(
+    from_street: str = Query(..., min_length=1, max_length=160),
+    to_street: str = Query(..., min_length=1, max_length=160),
+    tg_user=Depends(get_current_tg_user),
+    db: Session = Depends(get_db),
+):
+    """Подсказка цены по завершённым поездкам того же маршрута; suggestion=None — истории мало."""
+    return {"ok": True, "suggestion": prices.suggest(db, from_street, to_street)}
 
 
 @router.post("/api/taxi/trips")
@@ -189,14 +217,7 @@ def api_create_trip(
     - Ограничение: у клиента не более 1 активной поездки (NEW/ASSIGNED/ON_WAY/IN_PROGRESS).
     """
     u = ensure_user_from_tg(db, tg_user)
-
-    active = db.execute(
-        select(TaxiTrip.id).where(
-            TaxiTrip.passenger_id == u.id,
-            TaxiTrip.status.in_((TripStatus.NEW, TripStatus.ASSIGNED, TripStatus.ON_WAY, TripStatus.IN_PROGRESS))
-        ).limit(1)
-    ).scalar_one_or_none()
-    if active:
+    if taxi_orders.has_active(db, u.id):
         raise HTTPException(status_code=409, detail="У вас уже есть активная поездка.")
 
     from_street = (payload.get("from_street") or "").strip()
@@ -204,128 +225,142 @@ def api_create_trip(
     if not from_street or not to_street:
         raise HTTPException(status_code=400, detail="Укажите улицы отправления и назначения.")
 
-    mode_raw = (payload.get("price_mode") or "client_sets").lower()
-    mode = PriceMode.CLIENT_SETS if mode_raw == "client_sets" else PriceMode.DRIVER_BIDS
-
-    client_price = payload.get("client_price")
-    client_price = int(client_price) if (client_price not in (None, "")) else None
-
-    if mode == PriceMode.CLIENT_SETS and (client_price is None or client_price <= 0):
-        raise HTTPException(status_code=400, detail="Укажите корректную цену для фиксированного заказа.")
-
-    trip = TaxiTrip(
+    with http_errors():
+        mode = taxi_orders.parse_mode(payload.get("price_mode"))
+        client_price = taxi_orders.parse_price(payload.get("client_price"))
+        if mode != PriceMode.DRIVER_BIDS and (client_price is None or client_price <= 0):
+            raise ValueError("Укажите корректную цену для фиксированного заказа.")
+        # точка подачи — необязательна
+        from_lat = from_lon = None
+        if payload.get("from_lat") not in (None, "") or payload.get("from_lon") not in (None, ""):
+            from_lat, from_lon = parse_point({"lat": payload.get("from_lat"), "lon": payload.get("from_lon")})
+
+    trip = taxi_orders.create(db, TaxiTrip(
         passenger_id=u.id,
         passenger_tg_id=u.telegram_id,
         from_street=from_street,
         from_house=(payload.get("from_house") or None),
         from_comment=(payload.get("from_comment") or None),
+        from_lat=from_lat,
+        from_lon=from_lon,
         to_street=to_street,
         to_house=(payload.get("to_house") or None),
         to_comment=(payload.get("to_comment") or None),
         price_mode=mode,
         client_price=client_price,
-        status=TripStatus.NEW,
-    )
-    db.add(trip)
-    db.commit()
-    db.refresh(trip)
+    ), background_tasks)
+    streets.add(trip.from_street, trip.to_street)
 
-    # соберём список активных водителей (одобрен + активен)
-    try:
-        active_driver_tg_ids = db.execute(
-            select(User.telegram_id)
-            .join(DriverProfile, DriverProfile.user_id == User.id)
-            .where(DriverProfile.approved.is_(True))
-            .where(DriverProfile.active.is_(True))
-        ).scalars().all()
-        active_driver_tg_ids = [int(x) for x in active_driver_tg_ids if x]
-    except Exception as e:
-        print(f"[WARN] get active drivers failed: {e}")
-        active_driver_tg_ids = []
-
-    # ре-тайм в браузеры
-    background_tasks.add_task(hub.publish, "trip_created", {"trip_id": trip.id})
-    # уведомления в Telegram
-    background_tasks.add_task(_notify_drivers_about_new_trip, active_driver_tg_ids, trip)
-
-    return {"ok": True, "trip": _trip_to_public(trip)}
+    # автоподбор: водителя предложит матчер, в ленту поездка попадёт, только если никто не взял
+    if mode == PriceMode.AUTO_DISPATCH and from_lat is not None:
+        dispatcher.hold(trip.id)
+    else:
+        # уведомления в Telegram активным водителям (одобрен + активен)
+        background_tasks.add_task(taxi_orders.notify, taxi_orders.staff_tg_ids(db), _new_trip_text(trip))
 
+    return {"ok": True, "trip": trip_to_public(trip)}
 
-async def _notify_drivers_about_new_trip(tg_ids: list[int], trip: TaxiTrip):
-    token = settings.BOT_TOKEN
-    if not token:
-        print("[WARN] Не указан BOT_TOKEN — уведомления не отправлены")
-        return
-    if not tg_ids:
-        return
 
-    text = (
+def _new_trip_text(trip: TaxiTrip) -> str:
+    return (
         "🚕 Новый заказ\n"
         f"От: {trip.from_street or ''} {trip.from_house or ''}\n"
         f"До: {trip.to_street or ''} {trip.to_house or ''}\n"
-        f"Режим: {'фикс' if str(trip.price_mode).endswith('CLIENT_SETS') else 'ставки'}"
+        f"Режим: {'ставки' if trip.price_mode == PriceMode.DRIVER_BIDS else 'фикс'}"
         f"{f' • {trip.client_price} ₽' if trip.client_price else ''}\n"
         "Открой Mini App, чтобы посмотреть детали."
     ).strip()
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    async with httpx.AsyncClient(timeout=8.0) as client:
-        for chat_id in tg_ids:
-            try:
-                await client.post(url, json={"chat_id": chat_id, "text": text})
-            except Exception as e:
-                print(f"[WARN] sendMessage failed for {chat_id}: {e}")
-
 
 @router.get("/api/taxi/trips")
 def api_list_trips(
+    request: Request,
     role: Literal["client", "driver", "feed"] = Query("client"),
     limit: int = Query(50, le=200),
     tg_user=Depends(get_current_tg_user),
     db: Session = Depends(get_db),
 ):
+    # любое изменение поездок проходит через hub.publish(topic="taxi") —
+    # если счётчик не сдвинулся, отвечаем 304 без запросов в БД
+    # лента зависит ещё и от того, где водитель (с точностью ~100 м)
+    here = None
+    if role == "feed":
+        driver_id = cached_driver_id(tg_user.get("id"))
+        p = driver_locations.get(driver_id) if driver_id else None
+        here = (round(p.lat, 3), round(p.lon, 3)) if p else None
+    etag = taxi_orders.etag(tg_user.get("id"), role, limit, here)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     u = ensure_user_from_tg(db, tg_user)
     items = []
 
     try:
         if role == "client":
-            rows = db.execute(
-                select(TaxiTrip)
-                .where(TaxiTrip.passenger_id == u.id)
-                .order_by(TaxiTrip.id.desc())
-                .limit(limit)
-            ).scalars().all()
-            for t in rows:
+            for t in taxi_orders.rows(db, "owner", u.id, limit):
                 drv = db.get(User, t.assigned_driver_id) if t.assigned_driver_id else None
                 veh = db.get(TaxiVehicle, t.assigned_vehicle_id) if t.assigned_vehicle_id else None
-                items.append(_trip_to_public(t, drv, veh))
+                items.append(trip_to_public(t, drv, veh))
 
         elif role == "driver":
             ensure_driver_allowed(db, tg_user, need_active=True)
-            rows = db.execute(
-                select(TaxiTrip)
-                .where(TaxiTrip.assigned_driver_id == u.id)
-                .order_by(TaxiTrip.id.desc())
-                .limit(limit)
-            ).scalars().all()
-            for t in rows:
+            for t in taxi_orders.rows(db, "assignee", u.id, limit):
                 veh = db.get(TaxiVehicle, t.assigned_vehicle_id) if t.assigned_vehicle_id else None
-                items.append(_trip_to_public(t, driver=u, vehicle=veh))
+                items.append(trip_to_public(t, driver=u, vehicle=veh))
 
         else:  # feed
             ensure_driver_allowed(db, tg_user, need_active=True)
-            rows = db.execute(
-                select(TaxiTrip)
-                .where(TaxiTrip.status == TripStatus.NEW)
-                .order_by(TaxiTrip.id.desc())
-                .limit(limit)
-            ).scalars().all()
-            items = [_trip_to_public(t) for t in rows]
+            p = driver_locations.get(u.id)
+            if p is None:
+                # координат водителя нет — общая лента по свежести (одна сборка на версию топика)
+                items = [t for t in taxi_orders.feed(db, limit, trip_to_public) if not dispatcher.holds(t["id"])]
+            else:
+                # поездки по расстоянию — из индекса, из БД только они сами; порядок ленты:
+                # в радиусе FEED_RADIUS_KM (ближние первыми), без точки подачи (по свежести),
+                # дальше радиуса (дальние последними)
+                dist = dict(open_trips.nearest(db, p.lat, p.lon, limit, None))
+                rows = db.execute(
+                    select(TaxiTrip).where(TaxiTrip.id.in_(dist), TaxiTrip.status == TripStatus.NEW)
+                ).scalars().all() if dist else []
+                rows = [t for t in rows if not dispatcher.holds(t.id)]
+                rows.sort(key=lambda t: dist[t.id])
+                near = [dict(trip_to_public(t), distance_km=dist[t.id]) for t in rows if dist[t.id] <= settings.FEED_RADIUS_KM]
+                far = [dict(trip_to_public(t), distance_km=dist[t.id]) for t in rows if dist[t.id] > settings.FEED_RADIUS_KM]
+                items = near
+                if len(items) < limit:
+                    rest = db.execute(
+                        select(TaxiTrip)
+                        .where(TaxiTrip.status == TripStatus.NEW, TaxiTrip.from_lat.is_(None))
+                        .order_by(TaxiTrip.id.desc())
+                        .limit(limit - len(items))
+                    ).scalars().all()
+                    items += [trip_to_public(t) for t in rest if not dispatcher.holds(t.id)]
+                items += far[:max(0, limit - len(items))]
 
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
 
-    return {"ok": True, "items": items}
+    return json_response({"ok": True, "items": items}, headers=etag_headers(etag))
+
+
+@router.get("/api/taxi/trips/{trip_id}/drivers/nearest")
+def api_trip_nearest_drivers(
+    trip_id: int,
+    k: int = Query(5, ge=1, le=50),
+    tg_user=Depends(get_current_tg_user),
+    db: Session = Depends(get_db),
+):
+    """Ближайшие к точке подачи активные водители (по последним координатам в памяти)."""
+    u = ensure_user_from_tg(db, tg_user)
+    t = db.get(TaxiTrip, trip_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="Поездка не найдена")
+    if t.passenger_id != u.id:
+        raise HTTPException(status_code=403, detail="Доступ только для владельца поездки")
+    if t.from_lat is None or t.from_lon is None:
+        raise HTTPException(status_code=400, detail="У поездки не указана точка подачи")
+    found = driver_locations.nearest(t.from_lat, t.from_lon, k, settings.NEAREST_DRIVERS_RADIUS_KM)
+    return {"ok": True, "items": [{"driver_id": p.driver_id, "distance_km": d} for p, d in found]}
 
 
 # Водитель делает ставку (для driver_bids)
@@ -338,41 +373,47 @@ def api_driver_bid(
     db: Session = Depends(get_db),
 ):
     ensure_driver_allowed(db, tg_user, need_active=True)
+    u = ensure_user_from_tg(db, tg_user)
+    with http_errors():
+        t = taxi_orders.get(db, trip_id)
+        # книга ставок (хук движка) сама разошлёт изменение владельцу поездки и другим водителям
+        bid, _ = taxi_orders.bid(db, t, u, payload.get("offered_price"), background_tasks)
+    return {"ok": True, "bid_id": bid.id, **bid_book.standing(db, t, u.id)}
+
+
+# Водитель: насколько его ставка конкурентна
+@router.get("/api/taxi/trips/{trip_id}/bids/mine")
+def api_my_bid_standing(
+    trip_id: int,
+    tg_user=Depends(get_current_tg_user),
+    db: Session = Depends(get_db),
+):
     u = ensure_user_from_tg(db, tg_user)
     t = db.get(TaxiTrip, trip_id)
     if not t:
         raise HTTPException(status_code=404, detail="Поездка не найдена")
-    if t.price_mode != PriceMode.DRIVER_BIDS:
-        raise HTTPException(status_code=400, detail="Для этой поездки ставки не принимаются")
-    if t.status != TripStatus.NEW:
-        raise HTTPException(status_code=400, detail="Ставки принимаются только для новых заявок")
-
-    price = payload.get("offered_price")
-    price = int(price) if price not in (None, "") else None
-    if not price or price <= 0:
-        raise HTTPException(status_code=400, detail="Укажите корректную цену")
-
-    existing = db.execute(select(TaxiBid).where(
-        TaxiBid.trip_id == t.id,
+    return {"ok": True, "trip_id": t.id, **bid_book.standing(db, t, u.id)}
+
+
+# Водитель отзывает свою ставку
+@router.delete("/api/taxi/trips/{trip_id}/bids/mine")
+def api_withdraw_bid(
+    trip_id: int,
+    tg_user=Depends(get_current_tg_user),
+    db: Session = Depends(get_db),
+):
+    u = ensure_user_from_tg(db, tg_user)
+    bid = db.execute(select(TaxiBid).where(
+        TaxiBid.trip_id == trip_id,
         TaxiBid.driver_id == u.id,
         TaxiBid.status == TaxiBidStatus.PENDING
     )).scalar_one_or_none()
-
-    if existing:
-        existing.offered_price = price
-        db.commit()
-        bid = existing
-    else:
-        bid = TaxiBid(
-            trip_id=t.id, driver_id=u.id, driver_tg_id=u.telegram_id,
-            offered_price=price, status=TaxiBidStatus.PENDING
-        )
-        db.add(bid)
-        db.commit()
-        db.refresh(bid)
-
-    background_tasks.add_task(hub.publish, "bid_created", {"trip_id": t.id})
-    return {"ok": True, "bid_id": bid.id}
+    if not bid:
+        raise HTTPException(status_code=404, detail="Ставка не найдена")
+    bid.status = TaxiBidStatus.WITHDRAWN
+    db.commit()
+    bid_book.remove(trip_id, u.id)
+    return {"ok": True}
 
 
 # Клиент видит ставки по своей поездке
@@ -389,23 +430,8 @@ def api_list_bids_for_trip(
     if t.passenger_id != u.id:
         raise HTTPException(status_code=403, detail="Доступ запрещён")
 
-    rows = db.execute(select(TaxiBid, User).join(User, User.id == TaxiBid.driver_id).where(
-        TaxiBid.trip_id == t.id, TaxiBid.status == TaxiBidStatus.PENDING
-    ).order_by(TaxiBid.id.desc())).all()
-
-    items = []
-    for b, drv in rows:
-        items.append({
-            "bid_id": b.id,
-            "price": b.offered_price,
-            "driver": {
-                "id": drv.id,
-                "name": drv.name or drv.username or (f"TG {drv.telegram_id}"),
-                "username": drv.username,
-                "photo_url": getattr(drv, "photo_url", None),
-            }
-        })
-    return {"ok": True, "items": items}
+    # из книги ставок в памяти, по возрастанию цены
+    return {"ok": True, "items": bid_book.list(db, t)}
 
 
 # Клиент принимает ставку (назначение водителя)
@@ -417,32 +443,8 @@ def api_passenger_accept_bid(
     db: Session = Depends(get_db),
 ):
     u = ensure_user_from_tg(db, tg_user)
-    b = db.get(TaxiBid, bid_id)
-    if not b:
-        raise HTTPException(status_code=404, detail="Ставка не найдена")
-    t = db.get(TaxiTrip, b.trip_id)
-    if not t or t.passenger_id != u.id:
-        raise HTTPException(status_code=403, detail="Нет доступа")
-    if t.status != TripStatus.NEW:
-        raise HTTPException(status_code=400, detail="Нельзя принять ставку: поездка не новая")
-
-    t.assigned_driver_id = b.driver_id
-    t.assigned_driver_tg_id = b.driver_tg_id
-    veh = db.execute(select(TaxiVehicle).where(TaxiVehicle.driver_id == b.driver_id)).scalar_one_or_none()
-    t.assigned_vehicle_id = veh.id if veh else None
-    t.final_price = b.offered_price
-    t.status = TripStatus.ASSIGNED
-
-    b.status = TaxiBidStatus.ACCEPTED
-    db.execute(
-        TaxiBid.__table__.update()
-        .where(and_(TaxiBid.trip_id == t.id, TaxiBid.id != b.id, TaxiBid.status == TaxiBidStatus.PENDING))
-        .values(status=TaxiBidStatus.REJECTED)
-    )
-    db.commit()
-    db.refresh(t)
-
-    background_tasks.add_task(hub.publish, "trip_assigned", {"trip_id": t.id, "driver_id": t.assigned_driver_id})
+    with http_errors():
+        t = taxi_orders.accept_bid(db, bid_id, u.id, background_tasks)
     return {"ok": True, "trip_id": t.id, "status": t.status.value.lower(), "final_price": t.final_price}
 
 
@@ -457,29 +459,51 @@ def api_driver_accept_fixed(
 ):
     ensure_driver_allowed(db, tg_user, need_active=True)
     u = ensure_user_from_tg(db, tg_user)
-    t = db.get(TaxiTrip, trip_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Поездка не найдена")
-    if t.status != TripStatus.NEW:
-        raise HTTPException(status_code=400, detail="Заказ уже недоступен")
-    if t.price_mode != PriceMode.CLIENT_SETS:
-        raise HTTPException(status_code=400, detail="Для этого заказа требуется ставка и одобрение клиента")
-    if not t.client_price or t.client_price <= 0:
-        raise HTTPException(status_code=400, detail="Фикс-цена не указана. Нельзя взять без цены — только через ставки.")
-
-    t.assigned_driver_id = u.id
-    t.assigned_driver_tg_id = u.telegram_id
-    veh = db.execute(select(TaxiVehicle).where(TaxiVehicle.driver_id == u.id)).scalar_one_or_none()
-    t.assigned_vehicle_id = veh.id if veh else None
-    t.final_price = t.client_price
-    t.status = TripStatus.ASSIGNED
-    db.commit()
-    db.refresh(t)
+    with http_errors():
+        t = taxi_orders.get(db, trip_id)
+        if dispatcher.holds(t.id):
+            raise ValueError("Водитель для заказа подбирается автоматически")
+        t = taxi_orders.accept_fixed(db, t, u, background_tasks)
+    return {"ok": True, "id": t.id, "status": t.status.value.lower()}
+
 
-    background_tasks.add_task(hub.publish, "trip_assigned", {"trip_id": t.id, "driver_id": t.assigned_driver_id})
+# ---------- Автоподбор: предложения водителю ----------
+@router.get("/api/taxi/driver/offer")
+def api_driver_offer(tg_user=Depends(get_current_tg_user), db: Session = Depends(get_db)):
+    u = ensure_user_from_tg(db, tg_user)
+    offer = dispatcher.offer_for(u.id)
+    if offer is None:
+        return {"ok": True, "offer": None}
+    t = db.get(TaxiTrip, offer.trip_id)
+    return {"ok": True, "offer": dict(offer.to_public(), trip=trip_to_public(t) if t else None)}
+
+
+@router.post("/api/taxi/offers/{trip_id}/accept")
+def api_driver_accept_offer(
+    trip_id: int,
+    background_tasks: BackgroundTasks,
+    tg_user=Depends(get_current_tg_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        ensure_driver_allowed(db, tg_user, need_active=True)
+        u = ensure_user_from_tg(db, tg_user)
+        dispatcher.take(trip_id, u.id)
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    with http_errors():
+        t = taxi_orders.get(db, trip_id)
+        t = taxi_orders.assign(db, t, u.id, u.telegram_id, t.client_price, None, background_tasks)
     return {"ok": True, "id": t.id, "status": t.status.value.lower()}
 
 
+@router.post("/api/taxi/offers/{trip_id}/decline")
+def api_driver_decline_offer(trip_id: int, tg_user=Depends(get_current_tg_user), db: Session = Depends(get_db)):
+    u = ensure_user_from_tg(db, tg_user)
+    # поездку получит следующий водитель на ближайшем шаге матчера
+    return {"ok": dispatcher.decline(trip_id, u.id)}
+
+
 # Отмена клиентом
 @router.post("/api/taxi/trips/{trip_id}/cancel")
 def api_cancel_trip(
@@ -489,28 +513,12 @@ def api_cancel_trip(
     db: Session = Depends(get_db),
 ):
     u = ensure_user_from_tg(db, tg_user)
-    t = db.get(TaxiTrip, trip_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Поездка не найдена")
-    if t.passenger_id != u.id:
-        raise HTTPException(status_code=403, detail="Можно отменять только свои поездки")
-    if t.status in (TripStatus.COMPLETED, TripStatus.CANCELLED):
-        raise HTTPException(status_code=400, detail="Поездка уже завершена")
-    t.status = TripStatus.CANCELLED
-    db.commit()
-    db.refresh(t)
-
-    background_tasks.add_task(hub.publish, "trip_updated", {"trip_id": t.id, "status": t.status.value.lower()})
+    with http_errors():
+        t = taxi_orders.cancel(db, taxi_orders.get(db, trip_id), u.id, background_tasks)
     return {"ok": True, "id": t.id, "status": t.status.value.lower()}
 
 
-# Разрешённые переходы статусов
-_ALLOWED_TRANSITIONS = {
-    TripStatus.ASSIGNED: {TripStatus.ON_WAY, TripStatus.IN_PROGRESS, TripStatus.CANCELLED},
-    TripStatus.ON_WAY: {TripStatus.IN_PROGRESS, TripStatus.CANCELLED},
-    TripStatus.IN_PROGRESS: {TripStatus.COMPLETED, TripStatus.CANCELLED},
-}
-
+# Водитель двигает поездку по статусам (переходы — в app/services/orders.py)
 @router.post("/api/taxi/trips/{trip_id}/status")
 def api_move_status(
     trip_id: int,
@@ -520,35 +528,8 @@ def api_move_status(
     db: Session = Depends(get_db),
 ):
     u = ensure_user_from_tg(db, tg_user)
-    t = db.get(TaxiTrip, trip_id)
-    if not t:
-        raise HTTPException(status_code=404, detail="Поездка не найдена")
-    if t.assigned_driver_id != u.id:
-        raise HTTPException(status_code=403, detail="Можно менять статус только назначенной вам поездки")
-
-    raw = (payload.get("status") or "").lower().strip()
-    map_in = {
-        "on_way": TripStatus.ON_WAY,
-        "in_progress": TripStatus.IN_PROGRESS,
-        "completed": TripStatus.COMPLETED,
-        "cancelled": TripStatus.CANCELLED,
-    }
-    if raw not in map_in:
-        raise HTTPException(status_code=400, detail="Неизвестный статус")
-    to_status = map_in[raw]
-
-    allowed = _ALLOWED_TRANSITIONS.get(t.status, set())
-    if to_status not in allowed:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Недопустимый переход из {t.status.value.lower()} в {to_status.value.lower()}"
-        )
-
-    t.status = to_status
-    db.commit()
-    db.refresh(t)
-
-    background_tasks.add_task(hub.publish, "trip_updated", {"trip_id": t.id, "status": t.status.value.lower()})
+    with http_errors():
+        t = taxi_orders.move(db, taxi_orders.get(db, trip_id), u.id, payload.get("status"), background_tasks)
     return {"ok": True, "id": t.id, "status": t.status.value.lower()}
 
 
@@ -593,12 +574,32 @@ def api_trip_driver_info(
 
 
 # ---------- Real-time stream (SSE) ----------
+def _session_topics(request: Request) -> list[str]:
+    # личный канал пользователя (ставки по его поездкам / его ставкам), если он уже вошёл
+    tg_user = request.session.get("tg_user") if "session" in request.scope else None
+    return [user_topic(tg_user["id"])] if tg_user and tg_user.get("id") else []
+
+
 @router.get("/api/taxi/stream")
-def taxi_stream():
-    async def gen():
-        # первый «комментарий» держит канал открытым даже за Cloudflare/прокси
-        yield ": ok\n\n"
-        async for msg in hub.subscribe():
-            # msg уже в формате "event:xxx\ndata: {...}\n\n"
-            yield msg
-    return StreamingResponse(gen(), media_type="text/event-stream")
\ No newline at end of file
+def taxi_stream(request: Request):
+    return taxi_orders.stream(*_session_topics(request))
+
+# ---------- Long-poll (если SSE не держится) ----------
+@router.get("/api/taxi/poll")
+async def taxi_poll(
+    since: int = Query(0, ge=0),
+    boot: str | None = Query(None),
+    timeout: float = Query(settings.LONG_POLL_TIMEOUT_SEC, gt=0),
+):
+    return await taxi_orders.poll(since, boot, timeout)
+
+
+# личный канал: события ставок для тех, у кого не держится SSE
+@router.get("/api/taxi/me/poll")
+async def taxi_me_poll(
+    since: int = Query(0, ge=0),
+    boot: str | None = Query(None),
+    timeout: float = Query(settings.LONG_POLL_TIMEOUT_SEC, gt=0),
+    tg_user=Depends(get_current_tg_user),
+):
+    return await taxi_orders.poll(since, boot, timeout, topic=user_topic(tg_user["id"]))
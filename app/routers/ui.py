@@ -1,14 +1,10 @@
 # app/routers/ui.py
-from pathlib import Path
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 
-router = APIRouter()
+from ..resources import resources, templates
 
-# Надёжно укажем абсолютный путь к templates/, чтобы не ловить TemplateNotFound
-TEMPLATES_DIR = Path(__file__).resolve().parents[1].parent / "templates"
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+router = APIRouter()
 
 @router.get("/", include_in_schema=False)
 def index():
@@ -23,7 +19,7 @@ def dashboard(request: Request):
         {"icon": "📢", "title": "Объявления", "desc": "Куплю / Продам / Услуги", "href": "/ads"},
         {"icon": "ℹ️", "title": "Инфо", "desc": "Экстренные номера, автобусы, режимы", "href": "/info"},
     ]
-    return templates.TemplateResponse("dashboard.html", {"request": request, "blocks": blocks})
+    return resources.render_shell(request, "dashboard.html", blocks=blocks)
 
 @router.get("/profile", response_class=HTMLResponse)
 def profile(request: Request):
@@ -1,30 +1,45 @@
 # app/routers/webapp.py
-from fastapi import APIRouter, Request, Form, HTTPException
+from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from ..admin.security import is_admin_user
 from ..auth.telegram import verify_webapp_init_data
+from ..auth.tokens import issue_access_token
 from ..config import settings
+from ..db import get_db
+from ..services.users import ensure_user_from_tg
 
 router = APIRouter(tags=["webapp"])
 
 @router.post("/api/tg/session")
-def tg_session(request: Request, init_data: str = Form(...)):
+def tg_session(request: Request, init_data: str = Form(...), db: Session = Depends(get_db)):
     """
     Принимает Telegram.WebApp.initData, проверяет подпись и сохраняет профиль в сессию.
+    Заодно выдаёт короткий bearer-токен для API (Authorization: Bearer ...).
     """
     data = verify_webapp_init_data(init_data, settings.BOT_TOKEN or "")
     if not data or "user" not in data:
         raise HTTPException(status_code=400, detail="invalid initData")
 
     u = data["user"] or {}
-    request.session["tg_user"] = {
+    tg_user = {
         "id": u.get("id"),
         "first_name": u.get("first_name"),
         "last_name": u.get("last_name"),
         "username": u.get("username"),
         "photo_url": u.get("photo_url"),
     }
+    request.session["tg_user"] = tg_user
+
+    user = ensure_user_from_tg(db, tg_user)
+    role = "admin" if is_admin_user(user) else (user.role or "user")
     # важно: ответ без кэша
-    resp = JSONResponse({"ok": True})
+    resp = JSONResponse({
+        "ok": True,
+        "token": issue_access_token(tg_user, role),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_TTL_SEC,
+    })
     resp.headers["Cache-Control"] = "no-store"
     return resp
 
@@ -0,0 +1,76 @@
+# app/scheduler.py
+"""
+Периодические фоновые задачи внутри процесса (архивация чата и т.п.).
+Задачи регистрируются при импорте модулей, запускаются и останавливаются в lifespan.
+Синхронные функции (работа с БД) выполняются в пуле потоков, чтобы не держать event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+
+@dataclass
+class _Job:
+    name: str
+    interval: float
+    func: Callable[[], Any]
+    initial_delay: float = 0.0
+
+
+class _Scheduler:
+    def __init__(self) -> None:
+        self._jobs: dict[str, _Job] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._running = False
+
+    def every(self, seconds: float, func: Callable[[], Any], *, name: str | None = None,
+              initial_delay: float | None = None) -> None:
+        """Запускать func каждые seconds секунд. interval <= 0 — задача выключена."""
+        name = name or func.__name__
+        if seconds <= 0:
+            self._jobs.pop(name, None)
+            return
+        self._jobs[name] = _Job(name, seconds, func, seconds if initial_delay is None else initial_delay)
+        if self._running:  # уже запущены — подхватываем на лету
+            self._start_job(self._jobs[name])
+
+    async def _run(self, job: _Job) -> None:
+        await asyncio.sleep(job.initial_delay)
+        while True:
+            try:
+                if inspect.iscoroutinefunction(job.func):
+                    await job.func()
+                else:
+                    await run_in_threadpool(job.func)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[WARN] scheduler job {job.name} failed: {e}")
+            await asyncio.sleep(job.interval)
+
+    def _start_job(self, job: _Job) -> None:
+        old = self._tasks.pop(job.name, None)
+        if old is not None:
+            old.cancel()
+        self._tasks[job.name] = asyncio.create_task(self._run(job), name=f"job:{job.name}")
+
+    async def start(self) -> None:
+        self._running = True
+        for job in self._jobs.values():
+            self._start_job(job)
+
+    async def stop(self) -> None:
+        self._running = False
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+scheduler = _Scheduler()
@@ -0,0 +1,133 @@
+# app/schema.py
+"""
+Дополнительная схема поверх create_all: новые колонки и значения enum, индексы по выражениям, FTS-таблицы, триггеры.
+create_all такого не умеет, а миграций в проекте нет — поэтому идемпотентный DDL
+(IF NOT EXISTS) выполняется при старте, с учётом диалекта (PostgreSQL / SQLite).
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+# Какие возможности реально доступны в текущей БД (заполняется в ensure_schema)
+features: dict[str, bool] = {"board_fts": False}
+
+# Текст объявления для полнотекстового поиска (PostgreSQL). Это же выражение
+# используется в запросах (app/services/classifieds.py) — иначе GIN-индекс не подхватится.
+PG_LISTING_TSV = "to_tsvector('russian', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+
+def _pg_board_search(conn: Connection) -> None:
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_listings_fts ON listings USING GIN ({PG_LISTING_TSV})"))
+    # публичная лента и фильтр по цене — только одобренные объявления
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_listings_public_id ON listings (id) "
+        "WHERE approved AND NOT rejected"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_listings_public_price ON listings (price, id) "
+        "WHERE approved AND NOT rejected"
+    ))
+    features["board_fts"] = True
+
+
+def _sqlite_board_search(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_listings_public_id ON listings (id) "
+        "WHERE approved = 1 AND rejected = 0"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_listings_public_price ON listings (price, id) "
+        "WHERE approved = 1 AND rejected = 0"
+    ))
+
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'listings_fts'"
+    )).first()
+    if not exists:
+        try:
+            # external content: текст хранится в listings, в FTS — только индекс
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE listings_fts USING fts5("
+                "title, description, content='listings', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+        except Exception as e:
+            print(f"[WARN] SQLite без FTS5, поиск по объявлениям будет через LIKE: {e}")
+            return
+
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN "
+        "INSERT INTO listings_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN "
+        "INSERT INTO listings_fts(listings_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE OF title, description ON listings BEGIN "
+        "INSERT INTO listings_fts(listings_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO listings_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END"
+    ))
+    if not exists:
+        # таблица только что создана — проиндексировать уже существующие объявления
+        conn.execute(text("INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')"))
+    features["board_fts"] = True
+
+
+# Колонки, добавленные в модели после первого релиза: create_all не меняет существующие таблицы
+ADDED_COLUMNS: dict[str, dict[str, str]] = {
+    "taxi_trips": {"from_lat": "FLOAT", "from_lon": "FLOAT"},
+}
+
+
+# Новые значения PG-перечислений (create_all не меняет существующий тип).
+# SQLAlchemy хранит в enum имена членов, а тип называется по имени класса в нижнем регистре.
+ADDED_ENUM_VALUES: dict[str, tuple[str, ...]] = {
+    "pricemode": ("AUTO_DISPATCH",),
+}
+
+
+def _pg_enum_values(conn: Connection) -> None:
+    for type_name, values in ADDED_ENUM_VALUES.items():
+        exists = conn.execute(text("SELECT 1 FROM pg_type WHERE typname = :n"), {"n": type_name}).first()
+        if not exists:
+            continue
+        for value in values:
+            conn.execute(text(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS '{value}'"))
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    insp = inspect(conn)
+    for table, columns in ADDED_COLUMNS.items():
+        if not insp.has_table(table):
+            continue
+        have = {c["name"] for c in insp.get_columns(table)}
+        for name, ddl in columns.items():
+            if name not in have:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def ensure_schema(engine: Engine) -> None:
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            _add_missing_columns(conn)
+            if dialect == "postgresql":
+                _pg_enum_values(conn)
+    except Exception as e:
+        print(f"[WARN] ensure_schema columns: {e}")
+    try:
+        with engine.begin() as conn:
+            if dialect == "postgresql":
+                _pg_board_search(conn)
+            elif dialect == "sqlite":
+                _sqlite_board_search(conn)
+    except Exception as e:
+        features["board_fts"] = False
+        print(f"[WARN] ensure_schema: {e}")
@@ -0,0 +1,215 @@
+# app/serializers.py
+"""
+Сериализация ORM-строк для API.
+Ответы собираются сразу в байты через orjson (datetime/enum он понимает сам),
+минуя jsonable_encoder. Неизменяемые строки (новости, сообщения чата, объявления)
+кэшируются уже сериализованными фрагментами.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+
+from .models.user import User
+from .models.taxi import TaxiTrip, TaxiVehicle
+from .models.delivery import DeliveryOrder
+from .models.classifieds import Listing
+from .models.news import NewsPost
+from .models.chat import ChatMessage
+from .models.ad import Ad
+from .models.driver import DriverProfile
+from .models.courier import CourierProfile
+from .resources import resources
+
+_news_fragments = resources.cache("json:news", maxsize=2048)
+_chat_fragments = resources.cache("json:chat", maxsize=4096)
+_listing_fragments = resources.cache("json:listing", maxsize=4096)
+
+
+def json_response(payload: Any, status_code: int = 200, headers: dict | None = None) -> Response:
+    """Готовый JSON-ответ без повторного обхода jsonable_encoder."""
+    return Response(
+        content=orjson.dumps(payload),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def _enum_str(v) -> str | None:
+    if v is None:
+        return None
+    return (v.value if hasattr(v, "value") else str(v)).lower()
+
+
+def _fragment(cache, key, build) -> orjson.Fragment:
+    frag = cache.get(key)
+    if frag is None:
+        frag = orjson.Fragment(orjson.dumps(build()))
+        cache.set(key, frag)
+    return frag
+
+
+# ---------- Такси ----------
+
+def trip_to_public(tr: TaxiTrip, driver: User | None = None, vehicle: TaxiVehicle | None = None) -> dict:
+    out = {
+        "id": tr.id,
+        "status": _enum_str(tr.status),
+        "price_mode": _enum_str(tr.price_mode),
+        "client_price": tr.client_price,
+        "final_price": tr.final_price,
+        "from": {"street": tr.from_street, "house": tr.from_house, "comment": tr.from_comment,
+                 "lat": tr.from_lat, "lon": tr.from_lon},
+        "to": {"street": tr.to_street, "house": tr.to_house, "comment": tr.to_comment},
+        "created_at": tr.created_at,
+        "updated_at": tr.updated_at,
+    }
+    if tr.assigned_driver_id:
+        out["driver"] = {
+            "id": tr.assigned_driver_id,
+            "tg_id": tr.assigned_driver_tg_id,
+            "name": (
+                driver.name if driver and getattr(driver, "name", None)
+                else (driver.username if driver else None)
+            ),
+            "username": (driver.username if driver else None),
+            "photo_url": getattr(driver, "photo_url", None) if driver else None,
+        }
+    if vehicle:
+        out["vehicle"] = {
+            "make": vehicle.make, "model": vehicle.model, "color": vehicle.color,
+            "plate": vehicle.plate, "seats": vehicle.seats, "photo_url": vehicle.photo_url
+        }
+    return out
+
+
+# ---------- Доставка ----------
+
+def order_to_public(o: DeliveryOrder, courier: User | None = None) -> dict:
+    out = {
+        "id": o.id,
+        "status": _enum_str(o.status),
+        "price_mode": _enum_str(o.price_mode),
+        "client_price": o.client_price,
+        "final_price": o.final_price,
+        "title": o.title,
+        "details": o.details,
+        "from_place": o.from_place,
+        "to": {"street": o.to_street, "house": o.to_house, "comment": o.to_comment},
+        "created_at": o.created_at,
+        "updated_at": o.updated_at,
+    }
+    if o.assigned_courier_id:
+        out["courier"] = {
+            "id": o.assigned_courier_id,
+            "tg_id": o.assigned_courier_tg_id,
+        }
+    return out
+
+
+# ---------- Объявления ----------
+
+def listing_to_public(it: Listing) -> orjson.Fragment:
+    # публичные поля объявления после создания не меняются — кэшируем байты
+    return _fragment(_listing_fragments, it.id, lambda: {
+        "id": it.id,
+        "title": it.title,
+        "description": it.description,
+        "price": it.price,
+        "photo_url": it.photo_url,
+        "phone": it.phone,
+        "created_at": it.created_at,
+    })
+
+
+def listing_to_owner(it: Listing) -> dict:
+    return {
+        "id": it.id,
+        "title": it.title,
+        "description": it.description,
+        "price": it.price,
+        "photo_url": it.photo_url,
+        "phone": it.phone,
+        "approved": it.approved,
+        "rejected": it.rejected,
+    }
+
+
+def forget_listing(listing_id: int) -> None:
+    _listing_fragments.pop(listing_id)
+
+
+# ---------- Модерация ----------
+
+def driver_profile_to_admin(p: DriverProfile) -> dict:
+    return {
+        "user_id": p.user_id,
+        "full_name": p.full_name,
+        "phone": p.phone,
+        "license_number": p.license_number,
+        "license_valid_to": (p.license_valid_to.isoformat() if p.license_valid_to else None),
+        "notes": p.notes,
+        "approved": p.approved,
+        "rejected": p.rejected,
+        "active": p.active,
+    }
+
+
+def vehicle_to_admin(v: TaxiVehicle) -> dict:
+    return {
+        "driver_id": v.driver_id,
+        "make": v.make,
+        "model": v.model,
+        "color": v.color,
+        "plate": v.plate,
+        "seats": v.seats,
+        "photo_url": v.photo_url,
+        "verified": v.verified,
+    }
+
+
+def courier_profile_to_admin(p: CourierProfile) -> dict:
+    return {
+        "user_id": p.user_id,
+        "full_name": p.full_name,
+        "phone": p.phone,
+        "notes": p.notes,
+        "approved": bool(p.approved),
+        "rejected": bool(p.rejected),
+        "active": bool(p.active),
+    }
+
+
+# ---------- Новости / чат / старые объявления ----------
+
+def news_to_public(n: NewsPost) -> orjson.Fragment:
+    return _fragment(_news_fragments, n.id, lambda: {
+        "id": n.id,
+        "title": n.title,
+        "body": n.body,
+        "img": n.image_url,
+        "pinned": n.pinned,
+        "author": n.author_name,
+        "created_at": n.created_at,
+    })
+
+
+def chat_to_dict(m: ChatMessage) -> dict:
+    # created_at строкой: dict уходит ещё и в SSE через json.dumps
+    return {
+        "id": m.id,
+        "name": m.author_name,
+        "text": m.text,
+        "created_at": m.created_at.isoformat() if m.created_at else None,
+    }
+
+
+def chat_to_public(m: ChatMessage) -> orjson.Fragment:
+    return _fragment(_chat_fragments, m.id, lambda: chat_to_dict(m))
+
+
+def ad_to_public(x: Ad) -> dict:
+    return {"id": x.id, "title": x.title, "desc": x.description, "img": x.image_url, "cat": x.category}
@@ -0,0 +1,164 @@
+# app/services/bids.py
+"""
+Книга ставок по поездкам (режим DRIVER_BIDS) в памяти.
+
+Для каждой NEW-поездки держим её ожидающие ставки: водитель -> ставка
+(с готовой карточкой водителя) и отсортированный по цене список — из него
+отдаются список ставок пассажиру (без JOIN с users), лучшая цена и место водителя.
+Книга поездки загружается из БД при первом обращении, дальше ведётся эндпоинтами:
+ставка/её изменение/отзыв, принятие, отмена, автоотмена.
+
+Изменения уходят в личные каналы (топик "user:<tg_id>"): владельцу поездки —
+bid_added / bid_updated / bid_removed / bids_closed, сделавшим ставки водителям —
+bid_best (лучшая цена и число ставок), когда они меняются.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.taxi import TaxiBid, TaxiBidStatus, TaxiTrip, TripStatus
+from ..models.user import User
+from ..realtime import hub
+
+
+def user_topic(tg_id: int) -> str:
+    return f"user:{int(tg_id)}"
+
+
+def driver_card(u: User) -> dict:
+    return {
+        "id": u.id,
+        "name": u.name or u.username or f"TG {u.telegram_id}",
+        "username": u.username,
+        "photo_url": getattr(u, "photo_url", None),
+    }
+
+
+@dataclass
+class _Book:
+    owner_tg_id: int
+    passenger_id: int
+    bids: dict[int, dict] = field(default_factory=dict)            # driver_id -> ставка
+    tg_ids: dict[int, int] = field(default_factory=dict)           # driver_id -> tg_id (для bid_best)
+    order: list[tuple[int, int]] = field(default_factory=list)     # (цена, bid_id): при равной цене — кто раньше
+
+    def best(self) -> dict:
+        return {"best_price": self.order[0][0] if self.order else None, "count": len(self.order)}
+
+    def items(self) -> list[dict]:
+        by_id = {b["bid_id"]: b for b in self.bids.values()}
+        return [by_id[bid_id] for _, bid_id in self.order]
+
+
+class BidBook:
+    def __init__(self) -> None:
+        self._books: dict[int, _Book] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, trip: TaxiTrip) -> _Book | None:
+        if trip.status != TripStatus.NEW:
+            return None
+        book = self._books.get(trip.id)
+        if book is not None:
+            return book
+        rows = db.execute(
+            select(TaxiBid, User).join(User, User.id == TaxiBid.driver_id)
+            .where(TaxiBid.trip_id == trip.id, TaxiBid.status == TaxiBidStatus.PENDING)
+        ).all()
+        with self._lock:
+            book = self._books.get(trip.id)
+            if book is None:
+                book = _Book(owner_tg_id=int(trip.passenger_tg_id), passenger_id=trip.passenger_id)
+                for b, drv in rows:
+                    self._put(book, b, drv)
+                self._books[trip.id] = book
+        return book
+
+    @staticmethod
+    def _put(book: _Book, bid: TaxiBid, driver: User) -> None:
+        old = book.bids.get(bid.driver_id)
+        if old is not None:
+            del book.order[bisect.bisect_left(book.order, (old["price"], old["bid_id"]))]
+        item = {"bid_id": bid.id, "price": bid.offered_price, "driver": driver_card(driver)}
+        book.bids[bid.driver_id] = item
+        book.tg_ids[bid.driver_id] = int(driver.telegram_id)
+        bisect.insort(book.order, (item["price"], bid.id))
+
+    def _announce_best(self, trip_id: int, book: _Book, before: dict) -> None:
+        after = book.best()
+        if after != before:
+            payload = dict(after, trip_id=trip_id)
+            for tg_id in book.tg_ids.values():
+                hub.publish_threadsafe("bid_best", payload, topic=user_topic(tg_id))
+
+    # ---------- чтение ----------
+
+    def list(self, db: Session, trip: TaxiTrip) -> list[dict]:
+        book = self._load(db, trip)
+        if book is None:
+            return []
+        with self._lock:
+            return book.items()
+
+    def standing(self, db: Session, trip: TaxiTrip, driver_id: int) -> dict:
+        """Место ставки водителя: своя цена, место (1 — лучшая), лучшая цена, сколько всего."""
+        book = self._load(db, trip)
+        if book is None:
+            return {"best_price": None, "count": 0, "my_price": None, "rank": None}
+        with self._lock:
+            mine = book.bids.get(driver_id)
+            rank = None
+            if mine is not None:
+                rank = bisect.bisect_left(book.order, (mine["price"], mine["bid_id"])) + 1
+            return dict(book.best(), my_price=mine["price"] if mine else None, rank=rank)
+
+    # ---------- изменения (вызывать после коммита) ----------
+
+    def upsert(self, db: Session, trip: TaxiTrip, bid: TaxiBid, driver: User, updated: bool) -> None:
+        """updated — водитель поменял цену уже сделанной ставки."""
+        book = self._load(db, trip)
+        if book is None:
+            return
+        with self._lock:
+            before = book.best()
+            current = book.bids.get(bid.driver_id)
+            # книга могла только что загрузиться из БД — тогда ставка в ней уже есть
+            if current is None or current["bid_id"] != bid.id or current["price"] != bid.offered_price:
+                self._put(book, bid, driver)
+            item = book.bids[bid.driver_id]
+            self._announce_best(trip.id, book, before)
+        event = "bid_updated" if updated else "bid_added"
+        hub.publish_threadsafe(event, {"trip_id": trip.id, "bid": item}, topic=user_topic(book.owner_tg_id))
+
+    def remove(self, trip_id: int, driver_id: int) -> None:
+        with self._lock:
+            book = self._books.get(trip_id)
+            if book is None or driver_id not in book.bids:
+                return
+            before = book.best()
+            item = book.bids.pop(driver_id)
+            del book.order[bisect.bisect_left(book.order, (item["price"], item["bid_id"]))]
+            self._announce_best(trip_id, book, before)
+            book.tg_ids.pop(driver_id, None)
+        hub.publish_threadsafe("bid_removed", {"trip_id": trip_id, "bid_ids": [item["bid_id"]]},
+                               topic=user_topic(book.owner_tg_id))
+
+    def close(self, *trip_ids: int) -> None:
+        """Поездка ушла из NEW (назначена, отменена, истекла): ставки больше не нужны."""
+        for trip_id in trip_ids:
+            with self._lock:
+                book = self._books.pop(trip_id, None)
+            if book is None:
+                continue
+            hub.publish_threadsafe("bids_closed", {"trip_id": trip_id}, topic=user_topic(book.owner_tg_id))
+            for tg_id in book.tg_ids.values():
+                hub.publish_threadsafe("bid_best", {"trip_id": trip_id, "best_price": None, "count": 0, "closed": True},
+                                       topic=user_topic(tg_id))
+
+
+bid_book = BidBook()
@@ -0,0 +1,288 @@
+# app/services/chat.py
+from __future__ import annotations
+
+import asyncio
+import bisect
+import datetime as dt
+import threading
+
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.chat import ChatMessage, ChatMessageArchive
+from ..realtime import hub
+from ..resources import resources
+from ..scheduler import scheduler
+from ..serializers import chat_to_dict
+from .users import ensure_user_from_tg
+
+
+class RecentMessages:
+    """
+    Кольцевой буфер последних N сообщений общего чата (по возрастанию id).
+    Опросы "что нового после after_id" и первая загрузка отдаются отсюда;
+    в БД идём только за историей старше буфера.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._ids: list[int] = []
+        self._items: list[dict] = []
+        self._lock = threading.Lock()
+        self._warm = False
+        # записанное, пока буфер ещё не прогрет (попадёт в него после warm)
+        self._pending: list[dict] = []
+        # True — в буфере вся таблица (сообщений меньше, чем size)
+        self._complete = False
+
+    @property
+    def ready(self) -> bool:
+        return self._warm
+
+    def warm(self, db: Session) -> None:
+        if self._warm:
+            return
+        rows = db.execute(
+            select(ChatMessage).order_by(ChatMessage.id.desc()).limit(self.size)
+        ).scalars().all()
+        with self._lock:
+            if self._warm:
+                return
+            for m in reversed(rows):
+                self._insert(chat_to_dict(m))
+            self._complete = len(rows) < self.size
+            # закоммиченное между SELECT и этой точкой; то, что SELECT уже видел, _insert пропустит
+            for item in self._pending:
+                self._insert(item)
+            self._pending = []
+            self._warm = True
+
+    def _insert(self, item: dict) -> None:
+        mid = item["id"]
+        if not self._ids or mid > self._ids[-1]:
+            self._ids.append(mid)
+            self._items.append(item)
+        else:
+            # параллельные коммиты могут прийти не по порядку
+            pos = bisect.bisect_left(self._ids, mid)
+            if pos < len(self._ids) and self._ids[pos] == mid:
+                return
+            self._ids.insert(pos, mid)
+            self._items.insert(pos, item)
+        if len(self._ids) > self.size:
+            del self._ids[: len(self._ids) - self.size]
+            del self._items[: len(self._items) - self.size]
+            self._complete = False
+
+    def append(self, item: dict) -> None:
+        with self._lock:
+            if self._warm:
+                self._insert(item)
+            else:
+                self._pending.append(item)
+                if len(self._pending) > self.size:
+                    del self._pending[0]
+
+    def after(self, after_id: int, limit: int) -> list[dict] | None:
+        """Сообщения с id > after_id; None — after_id старше буфера, нужна БД."""
+        with self._lock:
+            if not self._warm:
+                return None
+            if self._ids and after_id < self._ids[0] - 1 and not self._complete:
+                return None
+            pos = bisect.bisect_right(self._ids, after_id)
+            return self._items[pos:pos + limit]
+
+    def latest(self, limit: int) -> list[dict] | None:
+        with self._lock:
+            if not self._warm or (len(self._items) < limit and not self._complete):
+                return None
+            return self._items[-limit:] if limit else []
+
+
+recent = RecentMessages(settings.CHAT_BUFFER_SIZE)
+
+
+# ---------- Автор сообщения ----------
+
+# tg-профиль -> (users.id, отображаемое имя); ключ включает имя/username,
+# чтобы после смены профиля в Telegram пользователь обновился в БД
+_authors = resources.cache("chat:authors", maxsize=4096, ttl=600)
+
+
+def _author_key(tg_user: dict) -> tuple:
+    return (int(tg_user["id"]), tg_user.get("username"), tg_user.get("first_name"), tg_user.get("last_name"))
+
+
+def _resolve_author(tg_user: dict) -> tuple[int, str]:
+    db = SessionLocal()
+    try:
+        u = ensure_user_from_tg(db, tg_user)
+        return u.id, u.display_name
+    finally:
+        db.close()
+
+
+# один запрос к БД на пользователя, даже если он шлёт несколько сообщений подряд
+_resolving: dict[int, asyncio.Task] = {}
+
+
+async def resolve_author(tg_user: dict) -> tuple[int, str]:
+    key = _author_key(tg_user)
+    author = _authors.get(key)
+    if author is not None:
+        return author
+    task = _resolving.get(key[0])
+    if task is None:
+        task = _resolving[key[0]] = asyncio.ensure_future(run_in_threadpool(_resolve_author, tg_user))
+        task.add_done_callback(lambda _: _resolving.pop(key[0], None))
+    author = await asyncio.shield(task)
+    _authors.set(key, author)
+    return author
+
+
+# ---------- Пакетная запись ----------
+
+class ChatWriter:
+    """
+    Сообщения копятся несколько миллисекунд и пишутся одним INSERT ... RETURNING
+    в одной транзакции. Отправитель ждёт future со своим сообщением.
+    После записи сообщение попадает в буфер recent и в хаб (топик "chat").
+    """
+
+    def __init__(self, window_ms: float, max_batch: int) -> None:
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="chat-writer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        # дописываем то, что успели поставить в очередь
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            await self._flush(batch)
+
+    def backlog(self) -> int:
+        """Сообщений в очереди на запись (для /metrics)."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, author_id: int, author_tg_id: int, author_name: str, text: str) -> dict:
+        row = {"author_id": author_id, "author_tg_id": author_tg_id, "author_name": author_name, "text": text}
+        fut = asyncio.get_running_loop().create_future()
+        if self._task is None:  # писатель не запущен (скрипты, тесты без lifespan)
+            await self._flush([(row, fut)])
+        else:
+            self._queue.put_nowait((row, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: list) -> None:
+        try:
+            items = await run_in_threadpool(self._write, [row for row, _ in batch])
+        except Exception as e:
+            print(f"[WARN] chat batch write failed: {e}")
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for item, (_, fut) in zip(items, batch):
+            recent.append(item)
+            await hub.publish("chat_message", item, topic="chat")
+            if not fut.done():
+                fut.set_result(item)
+
+    @staticmethod
+    def _write(rows: list[dict]) -> list[dict]:
+        stmt = insert(ChatMessage).returning(
+            ChatMessage.id, ChatMessage.author_name, ChatMessage.text, ChatMessage.created_at,
+            sort_by_parameter_order=True,
+        )
+        db = SessionLocal()
+        try:
+            out = [chat_to_dict(r) for r in db.execute(stmt, rows)]
+            db.commit()
+            return out
+        finally:
+            db.close()
+
+
+writer = ChatWriter(settings.CHAT_BATCH_WINDOW_MS, settings.CHAT_BATCH_MAX)
+
+
+# ---------- Архивация ----------
+
+def archive_old_messages(batch_size: int = 5000) -> int:
+    """
+    Перенести сообщения старше CHAT_RETENTION_DAYS в chat_messages_archive.
+    Идём пачками по id (id растут вместе со временем), каждая пачка — одна транзакция.
+    Самое новое сообщение не переносим: в базах SQLite, созданных до sqlite_autoincrement,
+    id берётся как max(rowid) + 1 — пустая таблица начала бы id заново с 1.
+    """
+    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=settings.CHAT_RETENTION_DAYS)
+    cols = [ChatMessage.id, ChatMessage.author_id, ChatMessage.author_tg_id,
+            ChatMessage.author_name, ChatMessage.text, ChatMessage.created_at]
+    moved = 0
+    db = SessionLocal()
+    try:
+        newest = db.execute(select(func.max(ChatMessage.id))).scalar()
+        if newest is None:
+            return 0
+        while True:
+            ids = db.execute(
+                select(ChatMessage.id)
+                .where(ChatMessage.created_at < cutoff, ChatMessage.id < newest)
+                .order_by(ChatMessage.id.asc())
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            lo, hi = ids[0], ids[-1]
+            span = (ChatMessage.id >= lo) & (ChatMessage.id <= hi) & (ChatMessage.created_at < cutoff)
+            db.execute(
+                insert(ChatMessageArchive).from_select(
+                    ["id", "author_id", "author_tg_id", "author_name", "text", "created_at"],
+                    select(*cols).where(span),
+                )
+            )
+            db.execute(delete(ChatMessage).where(span).execution_options(synchronize_session=False))
+            db.commit()
+            moved += len(ids)
+            if len(ids) < batch_size:
+                break
+    finally:
+        db.close()
+    if moved:
+        print(f"[INFO] chat: archived {moved} messages older than {settings.CHAT_RETENTION_DAYS}d")
+    return moved
+
+
+if settings.CHAT_RETENTION_DAYS > 0:
+    scheduler.every(settings.CHAT_RETENTION_INTERVAL_SEC, archive_old_messages, name="chat_archive")
@@ -1,9 +1,14 @@
 from __future__ import annotations
-from typing import Dict, Any, List
-from sqlalchemy import select
+import base64
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import select, and_, or_, func, literal_column, table, column
 from sqlalchemy.orm import Session
 
 from ..models.classifieds import Listing
+from ..schema import features, PG_LISTING_TSV
 from ..models.user import User
 from ..services.users import ensure_user_from_tg
 
@@ -68,4 +73,102 @@ def admin_reject(db: Session, listing_id: int) -> Listing:
     if not l: raise LookupError("Объявление не найдено")
     l.approved, l.rejected = False, True
     db.commit(); db.refresh(l)
-    return l
\ No newline at end of file
+    return l
+
+# ---- Поиск ----
+_WORD = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_WORDS = 8
+
+
+def _encode_cursor(*parts) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(parts)).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Optional[list]:
+    try:
+        parts = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        return None
+    if not isinstance(parts, list) or not all(isinstance(p, (int, float)) for p in parts):
+        return None
+    return parts
+
+
+def _rank_and_filter(db: Session, words: List[str], q: str):
+    """
+    Условие поиска и выражение релевантности (больше — лучше) для текущей БД.
+    PostgreSQL: tsvector + GIN, SQLite: FTS5 (bm25), без FTS — LIKE без ранжирования.
+    """
+    dialect = db.get_bind().dialect.name
+    if features.get("board_fts") and dialect == "postgresql":
+        tsv = literal_column(PG_LISTING_TSV)
+        tsq = func.websearch_to_tsquery(literal_column("'russian'"), q)
+        return None, tsv.op("@@")(tsq), func.ts_rank(tsv, tsq)
+    if features.get("board_fts") and dialect == "sqlite":
+        fts = table("listings_fts", column("rowid"))
+        match = " ".join(f'"{w}"*' for w in words)  # префиксный поиск по каждому слову
+        return (
+            (fts, fts.c.rowid == Listing.id),
+            literal_column("listings_fts").op("MATCH")(match),
+            -func.bm25(literal_column("listings_fts")),
+        )
+    cond = and_(*[
+        or_(Listing.title.ilike(f"%{w}%"), Listing.description.ilike(f"%{w}%")) for w in words
+    ])
+    return None, cond, None
+
+
+def search_listings(
+    db: Session,
+    q: Optional[str] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> Tuple[List[Listing], Optional[str]]:
+    """
+    Поиск по одобренным объявлениям. С запросом — по релевантности, без — новые сверху.
+    Пагинация курсором (rank, id) / (id): страница не зависит от OFFSET и не «съезжает»
+    при появлении новых объявлений. ValueError — битый курсор.
+    """
+    stmt = select(Listing).where(Listing.approved.is_(True), Listing.rejected.is_(False))
+    if price_min is not None:
+        stmt = stmt.where(Listing.price >= price_min)
+    if price_max is not None:
+        stmt = stmt.where(Listing.price <= price_max)
+
+    cur = _decode_cursor(cursor) if cursor else None
+    if cursor and cur is None:
+        raise ValueError("bad cursor")
+
+    words = _WORD.findall(q or "")[:MAX_QUERY_WORDS]
+    rank = None
+    if words:
+        join, cond, rank = _rank_and_filter(db, words, q.strip())
+        if join is not None:
+            stmt = stmt.join(*join)
+        stmt = stmt.where(cond)
+
+    if rank is not None:
+        stmt = stmt.add_columns(rank.label("rank")).order_by(rank.desc(), Listing.id.desc())
+        if cur:
+            if len(cur) != 2:
+                raise ValueError("bad cursor")
+            stmt = stmt.where(or_(rank < cur[0], and_(rank == cur[0], Listing.id < cur[1])))
+    else:
+        stmt = stmt.order_by(Listing.id.desc())
+        if cur:
+            if len(cur) != 1:
+                raise ValueError("bad cursor")
+            stmt = stmt.where(Listing.id < cur[0])
+
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [r[0] for r in rows]
+
+    next_cursor = None
+    if more:
+        last = rows[-1]
+        next_cursor = _encode_cursor(last.rank, last[0].id) if rank is not None else _encode_cursor(last[0].id)
+    return items, next_cursor
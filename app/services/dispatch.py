@@ -0,0 +1,268 @@
+# app/services/dispatch.py
+"""
+Автоподбор водителя (PriceMode.AUTO_DISPATCH).
+
+Раз в DISPATCH_INTERVAL_SEC матчер берёт NEW-поездки этого режима с точкой подачи,
+созданные не раньше DISPATCH_WINDOW_SEC назад, и свободных водителей рядом
+(свежие координаты из app/services/geo.py, без активной поездки и без висящего предложения).
+Пары подбираются по расстоянию одной задачей на всю пачку: венгерский алгоритм,
+если матрица небольшая, иначе жадно от ближайших. Водителю уходит предложение
+с таймаутом DISPATCH_OFFER_SEC в личный топик; отказ или таймаут — поездка достаётся следующему.
+Когда окно вышло, поездка «отпускается» в обычную ленту и её может взять любой водитель.
+Состояние (предложения, отказы) — в памяти процесса.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import select
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.taxi import TaxiTrip, TripStatus, PriceMode
+from ..realtime import hub
+from ..scheduler import scheduler
+from .bids import user_topic
+from .geo import driver_locations, haversine_np
+
+_FAR = 1e9  # «нельзя»: дальше радиуса или водитель уже отказался
+
+
+@dataclass
+class Offer:
+    trip_id: int
+    driver_id: int
+    tg_id: int
+    distance_km: float
+    deadline: float  # time.monotonic()
+
+    def to_public(self) -> dict:
+        return {
+            "trip_id": self.trip_id,
+            "distance_km": round(self.distance_km, 2),
+            "expires_in": max(0, round(self.deadline - time.monotonic())),
+        }
+
+
+def _hungarian(cost: np.ndarray) -> list[tuple[int, int]]:
+    """Минимальное назначение для прямоугольной матрицы: [(строка, столбец)]."""
+    flip = cost.shape[0] > cost.shape[1]
+    if flip:
+        cost = cost.T
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)      # p[j] — строка, назначенная столбцу j (1-based, 0 — нет)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+            taken = np.nonzero(used)[0]
+            u[p[taken]] += delta
+            v[taken] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    pairs = [(int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j]]
+    return [(c, r) for r, c in pairs] if flip else pairs
+
+
+def _greedy(cost: np.ndarray) -> list[tuple[int, int]]:
+    order = np.argsort(cost, axis=None, kind="stable")
+    rows, cols = set(), set()
+    out = []
+    for flat in order:
+        r, c = divmod(int(flat), cost.shape[1])
+        if cost[r, c] >= _FAR:
+            break
+        if r in rows or c in cols:
+            continue
+        rows.add(r)
+        cols.add(c)
+        out.append((r, c))
+    return out
+
+
+def solve(cost: np.ndarray) -> list[tuple[int, int]]:
+    """Пары (поездка, водитель) с допустимой стоимостью."""
+    if cost.size == 0:
+        return []
+    if cost.size <= settings.DISPATCH_HUNGARIAN_MAX_CELLS:
+        pairs = _hungarian(cost)
+    else:
+        pairs = _greedy(cost)
+    return [(r, c) for r, c in pairs if cost[r, c] < _FAR]
+
+
+class Dispatcher:
+    def __init__(self) -> None:
+        self._offers: dict[int, Offer] = {}            # trip_id -> предложение
+        self._by_driver: dict[int, int] = {}           # driver_id -> trip_id
+        self._declined: dict[int, set[int]] = {}       # trip_id -> водители, которые отказались/не ответили
+        self._held: set[int] = set()                   # поездки в окне автоподбора (скрыты из ленты)
+        self._lock = threading.Lock()
+
+    # ---------- для роутера ----------
+
+    def hold(self, trip_id: int) -> None:
+        """Новая поездка с автоподбором: не показывать в ленте до конца окна."""
+        with self._lock:
+            self._held.add(trip_id)
+
+    def holds(self, trip_id: int) -> bool:
+        return trip_id in self._held
+
+    def offer_for(self, driver_id: int) -> Offer | None:
+        with self._lock:
+            trip_id = self._by_driver.get(driver_id)
+            offer = self._offers.get(trip_id) if trip_id is not None else None
+        if offer is None or offer.deadline <= time.monotonic():
+            return None
+        return offer
+
+    def take(self, trip_id: int, driver_id: int) -> Offer:
+        """Водитель принимает предложение; PermissionError — предложения нет или оно истекло."""
+        with self._lock:
+            offer = self._offers.get(trip_id)
+            if offer is None or offer.driver_id != driver_id or offer.deadline <= time.monotonic():
+                raise PermissionError("Предложение не найдено или истекло")
+            self._drop(offer)
+            self._held.discard(trip_id)
+            self._declined.pop(trip_id, None)
+        return offer
+
+    def decline(self, trip_id: int, driver_id: int) -> bool:
+        with self._lock:
+            offer = self._offers.get(trip_id)
+            if offer is None or offer.driver_id != driver_id:
+                return False
+            self._drop(offer)
+            self._declined.setdefault(trip_id, set()).add(driver_id)
+            return True
+
+    def _drop(self, offer: Offer) -> None:
+        self._offers.pop(offer.trip_id, None)
+        if self._by_driver.get(offer.driver_id) == offer.trip_id:
+            del self._by_driver[offer.driver_id]
+
+    # ---------- матчер ----------
+
+    def tick(self) -> int:
+        """Один проход матчера; возвращает число новых предложений."""
+        now = time.monotonic()
+        with self._lock:
+            for offer in [o for o in self._offers.values() if o.deadline <= now]:
+                self._drop(offer)
+                self._declined.setdefault(offer.trip_id, set()).add(offer.driver_id)
+
+            held_before = set(self._held)
+        cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=settings.DISPATCH_WINDOW_SEC)
+        db = SessionLocal()
+        try:
+            trips = db.execute(
+                select(TaxiTrip.id, TaxiTrip.from_lat, TaxiTrip.from_lon)
+                .where(
+                    TaxiTrip.status == TripStatus.NEW,
+                    TaxiTrip.price_mode == PriceMode.AUTO_DISPATCH,
+                    TaxiTrip.from_lat.is_not(None),
+                    TaxiTrip.from_lon.is_not(None),
+                    TaxiTrip.created_at >= cutoff,
+                )
+                .order_by(TaxiTrip.id.asc())
+                .limit(settings.DISPATCH_BATCH)
+            ).all()
+            in_window = {t.id for t in trips}
+
+            with self._lock:
+                # вышли из окна (или уже взяты/отменены) — отпускаем в ленту
+                released = sorted(held_before - in_window)
+                # hold() мог добавить поездки, пока шёл запрос, — их не трогаем
+                self._held = in_window | (self._held - held_before)
+                for trip_id in released:
+                    offer = self._offers.get(trip_id)
+                    if offer is not None:
+                        self._drop(offer)
+                    self._declined.pop(trip_id, None)
+                waiting = [t for t in trips if t.id not in self._offers]
+                busy_offers = set(self._by_driver)
+
+            # в общий топик — только когда меняется видимая лента
+            if released:
+                hub.publish_threadsafe("trips_released", {"ids": released}, topic="taxi")
+            if not waiting:
+                return 0
+
+            radius = settings.DISPATCH_RADIUS_KM
+            candidates = {}
+            for t in waiting:
+                for p in driver_locations.nearby(t.from_lat, t.from_lon, radius):
+                    if p.driver_id not in busy_offers:
+                        candidates[p.driver_id] = p
+            if not candidates:
+                return 0
+            busy = set(db.execute(
+                select(TaxiTrip.assigned_driver_id).where(
+                    TaxiTrip.assigned_driver_id.in_(candidates),
+                    TaxiTrip.status.in_((TripStatus.ASSIGNED, TripStatus.ON_WAY, TripStatus.IN_PROGRESS)),
+                )
+            ).scalars().all())
+            drivers = [p for d, p in candidates.items() if d not in busy]
+            if not drivers:
+                return 0
+        finally:
+            db.close()
+
+        lats = np.fromiter((p.lat for p in drivers), dtype=np.float64, count=len(drivers))
+        lons = np.fromiter((p.lon for p in drivers), dtype=np.float64, count=len(drivers))
+        cost = np.empty((len(waiting), len(drivers)))
+        for i, t in enumerate(waiting):
+            row = haversine_np(t.from_lat, t.from_lon, lats, lons)
+            row[row > radius] = _FAR
+            declined = self._declined.get(t.id)
+            if declined:
+                row[[j for j, p in enumerate(drivers) if p.driver_id in declined]] = _FAR
+            cost[i] = row
+
+        made = []
+        deadline = time.monotonic() + settings.DISPATCH_OFFER_SEC
+        with self._lock:
+            for i, j in solve(cost):
+                t, p = waiting[i], drivers[j]
+                # пока считали, поездку могли отпустить, а водителю — что-то предложить
+                if t.id not in self._held or t.id in self._offers or p.driver_id in self._by_driver:
+                    continue
+                offer = Offer(t.id, p.driver_id, p.tg_id, float(cost[i, j]), deadline)
+                self._offers[t.id] = offer
+                self._by_driver[p.driver_id] = t.id
+                made.append(offer)
+        # предложение — только водителю: общий топик "taxi" (и версия ленты) от него не меняется
+        for offer in made:
+            hub.publish_threadsafe("trip_offer", offer.to_public(), topic=user_topic(offer.tg_id))
+        return len(made)
+
+
+dispatcher = Dispatcher()
+
+scheduler.every(settings.DISPATCH_INTERVAL_SEC, dispatcher.tick, name="taxi_dispatch")
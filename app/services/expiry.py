@@ -0,0 +1,96 @@
+# app/services/expiry.py
+"""
+Автоотмена «зависших» заявок: поездки и заказы доставки, которые никто не взял
+за TRIP_EXPIRY_MIN / DELIVERY_EXPIRY_MIN минут, переводятся в CANCELLED,
+их ожидающие ставки — в REJECTED. Работаем пачками: одна пачка — одна транзакция,
+после коммита в хаб уходит одно событие со списком id.
+"""
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models.delivery import DeliveryOrder, DeliveryStatus, DeliveryBid, DeliveryBidStatus
+from ..models.taxi import TaxiTrip, TripStatus, TaxiBid, TaxiBidStatus
+from ..realtime import hub
+from ..scheduler import scheduler
+from .orders import taxi_orders, delivery_orders
+
+
+def _expire_batch(db: Session, order, new, cancelled, bid, bid_fk, pending, rejected,
+                  cutoff: dt.datetime, batch_size: int) -> tuple[int, list[int]]:
+    """Одна пачка: (сколько нашли, сколько реально отменили)."""
+    ids = db.execute(
+        select(order.id)
+        .where(order.status == new, order.created_at < cutoff)
+        .order_by(order.id.asc())
+        .limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0, []
+    # статус перепроверяем в самом UPDATE: заявку могли взять, пока шла выборка
+    done = db.execute(
+        update(order)
+        .where(order.id.in_(ids), order.status == new)
+        .values(status=cancelled, updated_at=func.now())
+        .returning(order.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if done:
+        db.execute(
+            update(bid)
+            .where(bid_fk.in_(done), bid.status == pending)
+            .values(status=rejected)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return len(ids), sorted(done)
+
+
+def _run(minutes: int, event: str, topic: str, batch_size: int, *args, on_done=None) -> int:
+    if minutes <= 0:
+        return 0
+    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=minutes)
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            found, done = _expire_batch(db, *args, cutoff, batch_size)
+            if done:
+                total += len(done)
+                if on_done is not None:
+                    on_done(done)
+                hub.publish_threadsafe(event, {"ids": done}, topic=topic)
+            if found < batch_size:
+                break
+    finally:
+        db.close()
+    return total
+
+
+def expire_stale(batch_size: int | None = None) -> dict[str, int]:
+    batch_size = batch_size or settings.EXPIRY_BATCH
+    out = {
+        "trips": _run(
+            settings.TRIP_EXPIRY_MIN, "trips_expired", "taxi", batch_size,
+            TaxiTrip, TripStatus.NEW, TripStatus.CANCELLED,
+            TaxiBid, TaxiBid.trip_id, TaxiBidStatus.PENDING, TaxiBidStatus.REJECTED,
+            on_done=taxi_orders.closed,  # массовый UPDATE идёт мимо движка заявок — индексы чистим сами
+        ),
+        "delivery_orders": _run(
+            settings.DELIVERY_EXPIRY_MIN, "delivery_orders_expired", "delivery", batch_size,
+            DeliveryOrder, DeliveryStatus.NEW, DeliveryStatus.CANCELLED,
+            DeliveryBid, DeliveryBid.order_id, DeliveryBidStatus.PENDING, DeliveryBidStatus.REJECTED,
+            on_done=delivery_orders.closed,
+        ),
+    }
+    if any(out.values()):
+        print(f"[INFO] expiry: cancelled {out['trips']} trips, {out['delivery_orders']} delivery orders")
+    return out
+
+
+scheduler.every(settings.EXPIRY_INTERVAL_SEC, expire_stale, name="order_expiry")
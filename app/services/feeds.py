@@ -0,0 +1,51 @@
+# app/services/feeds.py
+"""
+Общий кэш публичных лент (объявления, новости, реклама).
+Ответ одинаков для всех, поэтому храним готовые байты + ETag и отдаём из памяти.
+Запись в ленту вызывает invalidate(feed) — следующий запрос соберёт её заново.
+TTL страхует от изменений в обход API (админские скрипты, другой воркер).
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from typing import Any, Callable, Hashable
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+from ..config import settings
+from ..resources import resources
+from ..utils.http_cache import etag_matches, not_modified, etag_headers
+
+BOARD = "board"
+NEWS = "news"
+ADS = "ads"
+
+_cache = resources.cache("feeds", maxsize=64, ttl=settings.FEED_CACHE_TTL_SEC)
+# поколение ленты: сборка, начатая до инвалидации, не должна попасть в кэш после неё
+_generations: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def invalidate(*feeds: str) -> None:
+    with _lock:
+        for feed in feeds:
+            _generations[feed] = _generations.get(feed, 0) + 1
+
+
+def serve(request: Request, feed: str, build: Callable[[], Any], key: Hashable = None) -> Response:
+    """Ответ ленты из кэша; build() — payload из БД, вызывается только при промахе."""
+    gen = _generations.get(feed, 0)
+    entry = _cache.get((feed, key, gen))
+    if entry is None:
+        body = orjson.dumps(build())
+        entry = (body, 'W/"' + hashlib.blake2b(body, digest_size=10).hexdigest() + '"')
+        if _generations.get(feed, 0) == gen:
+            _cache.set((feed, key, gen), entry)
+
+    body, etag = entry
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers=etag_headers(etag))
@@ -0,0 +1,381 @@
+# app/services/geo.py
+"""
+Где сейчас водители.
+
+Пинги координат (HTTP или WebSocket) пишутся только в память — в равномерную сетку
+ячеек по GEO_CELL_DEG градусов. Точка старше LOCATION_TTL_SEC считается устаревшей:
+не отдаётся в поиске и удаляется периодической чисткой.
+Раз в LOCATION_SNAPSHOT_SEC изменившиеся точки одной пачкой (upsert) сохраняются
+в driver_locations; при старте свежие точки поднимаются оттуда обратно.
+Право слать координаты (одобренный активный водитель с проверенным авто)
+кэшируется на LOCATION_AUTH_TTL_SEC, поэтому пинг не ходит в БД.
+
+Рядом — индекс открытых (NEW) поездок с точкой подачи: лента водителя сортируется
+по расстоянию, а ближайшие водители к поездке ищутся по сетке. Расстояния до
+множества точек считаются векторно (NumPy).
+"""
+from __future__ import annotations
+
+import datetime as dt
+import math
+import threading
+import time
+from typing import Iterable, NamedTuple
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..db import SessionLocal, engine
+from ..models.driver import DriverLocation
+from ..models.taxi import TaxiTrip, TripStatus
+from ..resources import resources
+from ..scheduler import scheduler
+from .driver import ensure_driver_allowed
+
+EARTH_KM = 6371.0088
+
+
+class Point(NamedTuple):
+    driver_id: int      # users.id
+    tg_id: int
+    lat: float
+    lon: float
+    ts: float           # time.time() последнего пинга
+
+
+def parse_point(payload: dict) -> tuple[float, float]:
+    """lat/lon из тела запроса; ValueError — с текстом для ответа 400."""
+    try:
+        lat = float(payload.get("lat"))
+        lon = float(payload.get("lon", payload.get("lng")))
+    except (TypeError, ValueError):
+        raise ValueError("lat и lon — числа")
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0) or math.isnan(lat) or math.isnan(lon):
+        raise ValueError("Координаты вне диапазона")
+    return lat, lon
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_KM * math.asin(math.sqrt(a))
+
+
+def haversine_np(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Расстояния (км) от одной точки до массива точек."""
+    p1 = math.radians(lat)
+    p2 = np.radians(lats)
+    dp = p2 - p1
+    dl = np.radians(lons) - math.radians(lon)
+    a = np.sin(dp / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _k_nearest(lat: float, lon: float, ids: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+               k: int, radius_km: float | None) -> list[tuple[int, float]]:
+    if not len(ids):
+        return []
+    dist = haversine_np(lat, lon, lats, lons)
+    idx = np.arange(len(ids))
+    if radius_km is not None:
+        idx = idx[dist <= radius_km]
+    if len(idx) > k:
+        idx = idx[np.argpartition(dist[idx], k - 1)[:k]]
+    idx = idx[np.argsort(dist[idx], kind="stable")]
+    return [(int(ids[i]), round(float(dist[i]), 2)) for i in idx]
+
+
+class DriverLocations:
+    def __init__(self, cell_deg: float, ttl: float) -> None:
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self._points: dict[int, Point] = {}
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._dirty: dict[int, Point] = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def _put(self, p: Point) -> None:
+        old = self._points.get(p.driver_id)
+        cell = self._cell(p.lat, p.lon)
+        if old is not None:
+            old_cell = self._cell(old.lat, old.lon)
+            if old_cell != cell:
+                self._discard(old_cell, p.driver_id)
+        self._cells.setdefault(cell, set()).add(p.driver_id)
+        self._points[p.driver_id] = p
+
+    def _discard(self, cell: tuple[int, int], driver_id: int) -> None:
+        ids = self._cells.get(cell)
+        if ids is not None:
+            ids.discard(driver_id)
+            if not ids:
+                del self._cells[cell]
+
+    def update(self, driver_id: int, tg_id: int, lat: float, lon: float) -> None:
+        p = Point(driver_id, tg_id, lat, lon, time.time())
+        with self._lock:
+            self._put(p)
+            self._dirty[driver_id] = p
+
+    def remove(self, driver_id: int) -> None:
+        with self._lock:
+            p = self._points.pop(driver_id, None)
+            self._dirty.pop(driver_id, None)
+            if p is not None:
+                self._discard(self._cell(p.lat, p.lon), driver_id)
+
+    def get(self, driver_id: int) -> Point | None:
+        p = self._points.get(driver_id)
+        if p is None or p.ts < time.time() - self.ttl:
+            return None
+        return p
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def nearby(self, lat: float, lon: float, radius_km: float) -> list[Point]:
+        """Свежие точки в квадрате ячеек, покрывающем круг radius_km (без точной отсечки по кругу)."""
+        dlat = radius_km / 111.32
+        dlon = radius_km / max(111.32 * math.cos(math.radians(lat)), 1e-6)
+        r0, c0 = self._cell(lat - dlat, lon - dlon)
+        r1, c1 = self._cell(lat + dlat, lon + dlon)
+        cutoff = time.time() - self.ttl
+        out: list[Point] = []
+        with self._lock:
+            if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self._cells):
+                # окно шире, чем занятых ячеек, — дешевле пройти по всем точкам
+                cells = [ids for (r, c), ids in self._cells.items() if r0 <= r <= r1 and c0 <= c <= c1]
+            else:
+                cells = [self._cells[k] for k in
+                         ((r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)) if k in self._cells]
+            for ids in cells:
+                for driver_id in ids:
+                    p = self._points[driver_id]
+                    if p.ts >= cutoff:
+                        out.append(p)
+        return out
+
+    def nearest(self, lat: float, lon: float, k: int, radius_km: float) -> list[tuple[Point, float]]:
+        """k ближайших свежих водителей в радиусе: [(точка, км)] по возрастанию расстояния."""
+        by_id = {p.driver_id: p for p in self.nearby(lat, lon, radius_km)}
+        # id и координаты — из одного снимка, чтобы индексы массивов совпадали
+        points = list(by_id.values())
+        found = _k_nearest(
+            lat, lon,
+            np.fromiter((p.driver_id for p in points), dtype=np.int64, count=len(points)),
+            np.fromiter((p.lat for p in points), dtype=np.float64, count=len(points)),
+            np.fromiter((p.lon for p in points), dtype=np.float64, count=len(points)),
+            k, radius_km,
+        )
+        return [(by_id[i], d) for i, d in found]
+
+    def sweep(self) -> int:
+        """Удалить устаревшие точки."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            stale = [p for p in self._points.values() if p.ts < cutoff]
+            for p in stale:
+                del self._points[p.driver_id]
+                self._discard(self._cell(p.lat, p.lon), p.driver_id)
+        return len(stale)
+
+    # ---------- снимок в БД ----------
+
+    def flush(self, batch_size: int = 1000) -> int:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        rows = [
+            {"driver_id": p.driver_id, "driver_tg_id": p.tg_id, "lat": p.lat, "lon": p.lon,
+             "updated_at": dt.datetime.fromtimestamp(p.ts, tz=dt.timezone.utc)}
+            for p in dirty.values()
+        ]
+        dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(DriverLocation)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DriverLocation.driver_id],
+            set_={c: stmt.excluded[c] for c in ("driver_tg_id", "lat", "lon", "updated_at")},
+        )
+        db = SessionLocal()
+        try:
+            for i in range(0, len(rows), batch_size):
+                db.execute(stmt, rows[i:i + batch_size])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # не потерять точки: вернём их, если за это время не пришли свежее
+            with self._lock:
+                for driver_id, p in dirty.items():
+                    self._dirty.setdefault(driver_id, p)
+            raise
+        finally:
+            db.close()
+        return len(rows)
+
+    def restore(self) -> int:
+        """Поднять из снимка точки моложе TTL (после перезапуска)."""
+        cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=self.ttl)
+        db = SessionLocal()
+        try:
+            rows = db.execute(select(DriverLocation).where(DriverLocation.updated_at >= cutoff)).scalars().all()
+        finally:
+            db.close()
+        with self._lock:
+            for r in rows:
+                ts = r.updated_at.replace(tzinfo=r.updated_at.tzinfo or dt.timezone.utc).timestamp()
+                if r.driver_id not in self._points:
+                    self._put(Point(r.driver_id, int(r.driver_tg_id), r.lat, r.lon, ts))
+        return len(rows)
+
+
+driver_locations = DriverLocations(settings.GEO_CELL_DEG, settings.LOCATION_TTL_SEC)
+
+
+# ---------- открытые поездки ----------
+
+class OpenTrips:
+    """
+    NEW-поездки с точкой подачи: trip_id -> (lat, lon) + массивы NumPy для расчёта расстояний.
+    Массивы пересобираются лениво, после изменений. Наполняется из хука сессии
+    (создание / смена статуса) и прогревается из БД при первом запросе.
+    """
+
+    def __init__(self) -> None:
+        self._points: dict[int, tuple[float, float]] = {}
+        self._arrays: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+        self._lock = threading.Lock()
+        self._warm = False
+        self._pending: list[tuple[int, tuple[float, float] | None]] = []
+
+    def _apply(self, trip_id: int, point: tuple[float, float] | None) -> None:
+        if point is None:
+            if self._points.pop(trip_id, None) is not None:
+                self._arrays = None
+        elif self._points.get(trip_id) != point:
+            self._points[trip_id] = point
+            self._arrays = None
+
+    def apply(self, changes: Iterable[tuple[int, tuple[float, float] | None]]) -> None:
+        """(trip_id, точка) — поездка открыта; (trip_id, None) — ушла из ленты."""
+        with self._lock:
+            for trip_id, point in changes:
+                if self._warm:
+                    self._apply(trip_id, point)
+                else:
+                    self._pending.append((trip_id, point))
+
+    def remove(self, trip_ids: Iterable[int]) -> None:
+        self.apply((i, None) for i in trip_ids)
+
+    def warm(self, db: Session) -> None:
+        if self._warm:
+            return
+        rows = db.execute(
+            select(TaxiTrip.id, TaxiTrip.from_lat, TaxiTrip.from_lon)
+            .where(TaxiTrip.status == TripStatus.NEW, TaxiTrip.from_lat.is_not(None), TaxiTrip.from_lon.is_not(None))
+        ).all()
+        with self._lock:
+            if self._warm:
+                return
+            for trip_id, lat, lon in rows:
+                self._apply(trip_id, (lat, lon))
+            for trip_id, point in self._pending:
+                self._apply(trip_id, point)
+            self._pending = []
+            self._warm = True
+
+    def nearest(self, db: Session, lat: float, lon: float, k: int, radius_km: float | None) -> list[tuple[int, float]]:
+        """k ближайших открытых поездок: [(trip_id, км)] по возрастанию расстояния."""
+        self.warm(db)
+        with self._lock:
+            if self._arrays is None:
+                n = len(self._points)
+                self._arrays = (
+                    np.fromiter(self._points, dtype=np.int64, count=n),
+                    np.fromiter((p[0] for p in self._points.values()), dtype=np.float64, count=n),
+                    np.fromiter((p[1] for p in self._points.values()), dtype=np.float64, count=n),
+                )
+            ids, lats, lons = self._arrays
+        return _k_nearest(lat, lon, ids, lats, lons, k, radius_km)
+
+
+open_trips = OpenTrips()
+
+
+def _trip_point(t: TaxiTrip) -> tuple[float, float] | None:
+    if t.status == TripStatus.NEW and t.from_lat is not None and t.from_lon is not None:
+        return (t.from_lat, t.from_lon)
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_trips(session: Session, flush_context) -> None:
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if type(obj) is TaxiTrip:
+            point = None if obj in session.deleted else _trip_point(obj)
+            session.info.setdefault("open_trips", {})[obj.id] = point
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_trips(session: Session) -> None:
+    changes = session.info.pop("open_trips", None)
+    if changes:
+        open_trips.apply(changes.items())
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_trips(session: Session) -> None:
+    session.info.pop("open_trips", None)
+
+
+# ---------- право слать координаты ----------
+
+# tg_id -> users.id водителя или 0 (не допущен)
+_drivers = resources.cache("geo:drivers", maxsize=8192, ttl=settings.LOCATION_AUTH_TTL_SEC)
+
+
+def _driver_id(tg_user: dict) -> int:
+    db = SessionLocal()
+    try:
+        return ensure_driver_allowed(db, tg_user, need_active=True).user_id
+    except PermissionError:
+        return 0
+    finally:
+        db.close()
+
+
+def cached_driver_id(tg_id: int) -> int | None:
+    """users.id водителя из кэша допуска (без БД); None — неизвестен или не допущен."""
+    return _drivers.get(int(tg_id)) or None
+
+
+async def authorize_driver(tg_user: dict) -> int:
+    """users.id водителя, которому можно слать координаты; PermissionError — нельзя."""
+    tg_id = int(tg_user["id"])
+    driver_id = _drivers.get(tg_id)
+    if driver_id is None:
+        driver_id = await run_in_threadpool(_driver_id, tg_user)
+        _drivers.set(tg_id, driver_id)
+    if not driver_id:
+        raise PermissionError("Координаты принимаются только от активного одобренного водителя")
+    return driver_id
+
+
+def forget_driver(tg_id: int, driver_id: int | None = None) -> None:
+    """Сменился статус водителя: сбросить кэш допуска и убрать точку с карты."""
+    _drivers.pop(int(tg_id))
+    if driver_id is not None:
+        driver_locations.remove(driver_id)
+
+
+scheduler.every(settings.LOCATION_SNAPSHOT_SEC, driver_locations.flush, name="driver_locations_snapshot")
+scheduler.every(max(settings.LOCATION_TTL_SEC / 2, 5), driver_locations.sweep, name="driver_locations_sweep")
@@ -0,0 +1,206 @@
+# app/services/moderation.py
+"""
+Очереди модерации (объявления, профили водителей, авто, курьеры).
+
+- Массовые действия: один UPDATE ... WHERE key IN (...) RETURNING key и один коммит.
+- Очереди отдаются страницами по курсору (ключ очереди по возрастанию).
+- Счётчики ожидающих держатся в памяти и пересчитываются только для «грязных» очередей.
+  Грязными их помечает хук сессии после коммита — профили создаются неявно во многих местах,
+  поэтому отслеживаем изменения моделей, а не отдельные эндпоинты.
+- Новые/изменённые/ушедшие из очереди записи публикуются в хаб (топик "admin").
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Iterable
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from ..models.classifieds import Listing
+from ..models.courier import CourierProfile
+from ..models.driver import DriverProfile
+from ..models.taxi import TaxiVehicle
+from ..realtime import hub
+from ..serializers import listing_to_owner, driver_profile_to_admin, vehicle_to_admin, courier_profile_to_admin
+
+TOPIC = "admin"
+
+
+class _Queue:
+    def __init__(self, name: str, model, key, status: tuple[str, ...], pending, serialize) -> None:
+        self.name = name
+        self.model = model
+        self.key = key              # колонка-ключ: id записи в действиях и курсор
+        self.status = status        # поля, изменение которых выводит запись из очереди
+        self.pending = pending      # условие "ждёт модерации" для SQL
+        self.serialize = serialize
+
+    def is_pending(self, obj) -> bool:
+        if self.status == ("verified",):
+            return not obj.verified
+        return not obj.approved and not obj.rejected
+
+
+QUEUES: dict[str, _Queue] = {q.name: q for q in (
+    _Queue("board", Listing, Listing.id, ("approved", "rejected"),
+           (Listing.approved.is_(False), Listing.rejected.is_(False)), listing_to_owner),
+    _Queue("drivers", DriverProfile, DriverProfile.user_id, ("approved", "rejected"),
+           (DriverProfile.approved.is_(False), DriverProfile.rejected.is_(False)), driver_profile_to_admin),
+    _Queue("vehicles", TaxiVehicle, TaxiVehicle.driver_id, ("verified",),
+           (TaxiVehicle.verified.is_(False),), vehicle_to_admin),
+    _Queue("couriers", CourierProfile, CourierProfile.user_id, ("approved", "rejected"),
+           (CourierProfile.approved.is_(False), CourierProfile.rejected.is_(False)), courier_profile_to_admin),
+)}
+_BY_MODEL = {q.model: q for q in QUEUES.values()}
+
+
+def queue_page(db: Session, queue: str, cursor: int | None, limit: int) -> tuple[list, int | None]:
+    """Страница очереди по возрастанию ключа; next_cursor — ключ последней записи, если есть ещё."""
+    q = QUEUES[queue]
+    stmt = select(q.model).where(*q.pending).order_by(q.key.asc()).limit(limit + 1)
+    if cursor is not None:
+        stmt = stmt.where(q.key > cursor)
+    rows = db.execute(stmt).scalars().all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = getattr(rows[-1], q.key.key) if more else None
+    return rows, next_cursor
+
+
+# ---------- Счётчики ----------
+
+class PendingCounters:
+    def __init__(self) -> None:
+        self._counts: dict[str, int] = {}
+        self._dirty: set[str] = set(QUEUES)
+        self._lock = threading.Lock()
+
+    def mark_dirty(self, *queues: str) -> None:
+        with self._lock:
+            self._dirty.update(queues)
+
+    def get(self, db: Session) -> dict[str, int]:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        try:
+            for name in dirty:
+                q = QUEUES[name]
+                n = db.execute(select(func.count()).select_from(q.model).where(*q.pending)).scalar_one()
+                with self._lock:
+                    self._counts[name] = n
+        except Exception:
+            self.mark_dirty(*dirty)
+            raise
+        with self._lock:
+            return {name: self._counts.get(name, 0) for name in QUEUES}
+
+
+counters = PendingCounters()
+
+
+# ---------- Хук сессии ----------
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    changes = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        q = _BY_MODEL.get(type(obj))
+        if q is None:
+            continue
+        if changes is None:
+            changes = session.info.setdefault("moderation", {"dirty": set(), "upsert": {}, "removed": {}})
+        key = getattr(obj, q.key.key)
+        if obj in session.deleted:
+            changes["dirty"].add(q.name)
+            changes["upsert"].get(q.name, {}).pop(key, None)
+            changes["removed"].setdefault(q.name, set()).add(key)
+            continue
+        state = inspect(obj)
+        status_changed = obj in session.new or any(state.attrs[a].history.has_changes() for a in q.status)
+        if q.is_pending(obj):
+            if status_changed:
+                changes["dirty"].add(q.name)
+            # правка записи в очереди — тоже обновление карточки у админа
+            changes["upsert"].setdefault(q.name, {})[key] = q.serialize(obj)
+            changes["removed"].get(q.name, set()).discard(key)
+        elif status_changed:
+            changes["dirty"].add(q.name)
+            changes["upsert"].get(q.name, {}).pop(key, None)
+            changes["removed"].setdefault(q.name, set()).add(key)
+
+
+@event.listens_for(Session, "after_commit")
+def _announce_changes(session: Session) -> None:
+    changes = session.info.pop("moderation", None)
+    if not changes:
+        return
+    if changes["dirty"]:
+        counters.mark_dirty(*changes["dirty"])
+    for name, items in changes["upsert"].items():
+        for item in items.values():
+            hub.publish_threadsafe("pending_upsert", {"queue": name, "item": item}, topic=TOPIC)
+    for name, ids in changes["removed"].items():
+        if ids:
+            hub.publish_threadsafe("pending_removed", {"queue": name, "ids": sorted(ids)}, topic=TOPIC)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changes(session: Session) -> None:
+    session.info.pop("moderation", None)
+
+MAX_BULK_IDS = 1000
+
+
+def parse_bulk_payload(payload: dict, actions: Iterable[str]) -> tuple[list[int], str]:
+    """ids + action из тела запроса; ValueError — с текстом для ответа 400."""
+    action = (payload.get("action") or "").strip()
+    if action not in actions:
+        raise ValueError(f"action должен быть одним из: {', '.join(actions)}")
+    raw = payload.get("ids")
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("ids: непустой список")
+    if len(raw) > MAX_BULK_IDS:
+        raise ValueError(f"Не больше {MAX_BULK_IDS} id за раз")
+    try:
+        ids = list(dict.fromkeys(int(x) for x in raw))  # без дублей, порядок сохраняем
+    except (TypeError, ValueError):
+        raise ValueError("ids: только целые числа")
+    return ids, action
+
+
+def bulk_set(db: Session, model, key_col, ids: list[int], values: dict[str, Any]) -> set[int]:
+    """
+    UPDATE model SET values WHERE key_col IN ids RETURNING key_col.
+    Возвращает id, которые реально нашлись. Коммит — на вызывающем.
+    """
+    if not ids:
+        return set()
+    stmt = (
+        update(model)
+        .where(key_col.in_(ids))
+        .values(**values)
+        .returning(key_col)
+        .execution_options(synchronize_session=False)
+    )
+    return set(db.execute(stmt).scalars().all())
+
+
+def bulk_results(ids: list[int], done: set[int], not_found: str = "not_found") -> list[dict]:
+    return [{"id": i, "ok": True} if i in done else {"id": i, "ok": False, "error": not_found} for i in ids]
+
+
+def announce_bulk(kind: str, action: str, done: set[int], queues: Iterable[str]) -> None:
+    """
+    После массового UPDATE (он идёт мимо ORM и хука сессии): пометить счётчики
+    и разослать одно агрегированное событие.
+    """
+    if not done:
+        return
+    queues = list(queues)
+    counters.mark_dirty(*queues)
+    hub.publish_threadsafe(
+        "moderation_bulk",
+        {"kind": kind, "action": action, "ids": sorted(done), "queues": queues},
+        topic=TOPIC,
+    )
@@ -0,0 +1,16 @@
+# app/services/news.py
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models.news import NewsPost
+
+FEED_LIMIT = 100
+
+
+def list_feed(db: Session, limit: int = FEED_LIMIT) -> list[NewsPost]:
+    return db.execute(
+        select(NewsPost).order_by(NewsPost.pinned.desc(), NewsPost.id.desc()).limit(limit)
+    ).scalars().all()
+
@@ -0,0 +1,468 @@
+# app/services/orders.py
+"""
+Общий жизненный цикл заявок такси и доставки.
+
+OrderKind описывает продукт: модели заявки и ставки, их enum-ы, поля владельца
+и исполнителя, топик хаба, имена событий и тексты ошибок. OrderEngine поверх него
+делает для обоих одно и то же: создание, ставки, назначение, отмену и смену статуса,
+события в хаб, кэш ленты, рассылку в Telegram, SSE и long-poll.
+
+Переходы статуса — условным UPDATE (… WHERE status IN (ожидаемые)): два водителя,
+одновременно взявшие заказ, или отмена наперегонки со сменой статуса не перетрут
+друг друга — второй получит ошибку.
+
+Ошибки — как в остальных сервисах: LookupError (404), PermissionError (403),
+ValueError (400); http_errors() переводит их в HTTPException.
+Продуктовые индексы подписываются на хуки: bid, assigned, status, closed.
+"""
+from __future__ import annotations
+
+import enum
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Literal
+
+from fastapi import BackgroundTasks, HTTPException, status as http_status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.courier import CourierProfile
+from ..models.delivery import DeliveryOrder, DeliveryBid, DeliveryStatus, DeliveryPriceMode, DeliveryBidStatus
+from ..models.driver import DriverProfile
+from ..models.taxi import TaxiTrip, TaxiBid, TaxiVehicle, TripStatus, PriceMode, TaxiBidStatus
+from ..models.user import User
+from ..realtime import hub
+from ..resources import resources
+from ..utils.http_cache import make_etag
+from .bids import bid_book
+from .geo import open_trips
+from .pricing import prices
+
+# имена статусов одинаковы в обоих продуктах (значения — нет: "new" / "NEW")
+_TRANSITIONS = {
+    "ASSIGNED": ("ON_WAY", "IN_PROGRESS", "CANCELLED"),
+    "ON_WAY": ("IN_PROGRESS", "CANCELLED"),
+    "IN_PROGRESS": ("COMPLETED", "CANCELLED"),
+}
+_ACTIVE = ("NEW", "ASSIGNED", "ON_WAY", "IN_PROGRESS")
+_DONE = ("COMPLETED", "CANCELLED")
+
+Who = Literal["owner", "assignee", "feed"]
+
+
+@contextmanager
+def http_errors():
+    try:
+        yield
+    except LookupError as e:
+        raise HTTPException(status_code=http_status.HTTP_404_NOT_FOUND, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=http_status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@dataclass
+class OrderKind:
+    name: str                          # продукт и топик хаба: "taxi" / "delivery"
+    model: type
+    bid_model: type
+    bid_fk: str                        # поле ставки со ссылкой на заявку
+    status: type[enum.Enum]
+    bid_status: type[enum.Enum]
+    price_mode: type[enum.Enum]
+    bids_mode: enum.Enum               # режим «цену предлагают исполнители»
+    owner: str                         # префикс полей <owner>_id / <owner>_tg_id
+    assignee: str                      # префикс полей <assignee>_id / <assignee>_tg_id
+    staff_profile: type                # профиль исполнителя (approved / active)
+    id_key: str                        # ключ id заявки в событиях
+    assignee_key: str                  # ключ исполнителя в событии назначения
+    events: dict[str, str]             # created / bid / assigned / updated -> имя события
+    texts: dict[str, str]
+    # доп. поля при назначении (например, машина водителя)
+    assign_values: Callable[[Session, int], dict] | None = None
+    hooks: dict[str, list[Callable]] = field(default_factory=dict)
+
+
+class OrderEngine:
+    def __init__(self, kind: OrderKind) -> None:
+        self.kind = kind
+        self.topic = kind.name
+        self.model = kind.model
+        S = kind.status
+        self.NEW, self.ASSIGNED, self.CANCELLED = S.NEW, S.ASSIGNED, S.CANCELLED
+        self.active = tuple(S[n] for n in _ACTIVE)
+        self.done = tuple(S[n] for n in _DONE)
+        self.transitions = {S[a]: {S[b] for b in bs} for a, bs in _TRANSITIONS.items()}
+        self._modes = {m.name.lower(): m for m in kind.price_mode}
+        self._feed = resources.cache(f"orders:{kind.name}:feed", maxsize=32, ttl=settings.FEED_CACHE_TTL_SEC)
+        self.notify_backlog = 0  # сообщений исполнителям, ещё не отправленных (для /metrics)
+
+    # ---------- хуки ----------
+
+    def on(self, hook: str) -> Callable[[Callable], Callable]:
+        """Декоратор подписки на хук движка."""
+        def register(fn: Callable) -> Callable:
+            self.kind.hooks.setdefault(hook, []).append(fn)
+            return fn
+        return register
+
+    def _fire(self, hook: str, *args) -> None:
+        # изменение уже закоммичено: сбой индекса не должен превращаться в 500
+        for fn in self.kind.hooks.get(hook, ()):
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[WARN] {self.kind.name} hook {hook}: {e}")
+
+    def closed(self, ids: Iterable[int]) -> None:
+        """Заявки ушли из NEW (назначены, отменены, истекли) — в т.ч. массово, мимо движка."""
+        ids = list(ids)
+        if ids:
+            self._fire("closed", ids)
+
+    # ---------- поля ----------
+
+    @staticmethod
+    def status_name(o) -> str:
+        return o.status.value.lower()
+
+    def owner_id(self, o) -> int:
+        return getattr(o, f"{self.kind.owner}_id")
+
+    def assignee_id(self, o) -> int | None:
+        return getattr(o, f"{self.kind.assignee}_id")
+
+    def parse_mode(self, raw: str | None) -> enum.Enum:
+        # неизвестный режим — «ставки», как было в обоих роутерах
+        return self._modes.get((raw or "client_sets").lower(), self.kind.bids_mode)
+
+    @staticmethod
+    def parse_price(value) -> int | None:
+        if value in (None, ""):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError("Укажите корректную цену")
+
+    def get(self, db: Session, order_id: int):
+        o = db.get(self.model, order_id)
+        if not o:
+            raise LookupError(self.kind.texts["not_found"])
+        return o
+
+    # ---------- события ----------
+
+    def publish(self, event: str, payload: dict, background_tasks: BackgroundTasks | None = None) -> None:
+        name = self.kind.events.get(event)
+        if not name:
+            return
+        if background_tasks is not None:
+            background_tasks.add_task(hub.publish, name, payload, topic=self.topic)
+        else:
+            hub.publish_threadsafe(name, payload, topic=self.topic)
+
+    # ---------- жизненный цикл ----------
+
+    def has_active(self, db: Session, owner_id: int) -> bool:
+        owner_col = getattr(self.model, f"{self.kind.owner}_id")
+        return db.execute(
+            select(self.model.id).where(owner_col == owner_id, self.model.status.in_(self.active)).limit(1)
+        ).scalar_one_or_none() is not None
+
+    def create(self, db: Session, o, background_tasks: BackgroundTasks | None = None):
+        o.status = self.NEW
+        db.add(o)
+        db.commit()
+        db.refresh(o)
+        self._fire("created", o)
+        self.publish("created", {self.kind.id_key: o.id}, background_tasks)
+        return o
+
+    def bid(self, db: Session, o, user: User, price, background_tasks: BackgroundTasks | None = None):
+        """Ставка исполнителя (или новая цена его ставки): (ставка, обновлена ли)."""
+        k, B = self.kind, self.kind.bid_model
+        if o.price_mode != k.bids_mode:
+            raise ValueError(k.texts["no_bids"])
+        if o.status != self.NEW:
+            raise ValueError(k.texts["bids_new_only"])
+        price = self.parse_price(price)
+        if not price or price <= 0:
+            raise ValueError("Укажите корректную цену")
+
+        fk = getattr(B, k.bid_fk)
+        existing = db.execute(select(B).where(
+            fk == o.id, B.driver_id == user.id, B.status == k.bid_status.PENDING
+        )).scalar_one_or_none()
+        if existing:
+            existing.offered_price = price
+            db.commit()
+            b = existing
+        else:
+            b = B(driver_id=user.id, driver_tg_id=user.telegram_id,
+                  offered_price=price, status=k.bid_status.PENDING, **{k.bid_fk: o.id})
+            db.add(b)
+            db.commit()
+            db.refresh(b)
+
+        self._fire("bid", db, o, b, user, existing is not None)
+        self.publish("bid", {k.id_key: o.id}, background_tasks)
+        return b, existing is not None
+
+    def _move(self, db: Session, o, expected: Iterable, to, **values) -> bool:
+        """Условный переход: False — статус уже сменил кто-то другой."""
+        res = db.execute(
+            update(self.model)
+            .where(self.model.id == o.id, self.model.status.in_(tuple(expected)))
+            .values(status=to, **values)
+            .execution_options(synchronize_session=False)
+        )
+        return res.rowcount == 1
+
+    def _settle_bids(self, db: Session, o, accepted_id: int | None = None) -> None:
+        k, B = self.kind, self.kind.bid_model
+        fk = getattr(B, k.bid_fk)
+        if accepted_id is not None:
+            db.execute(update(B).where(B.id == accepted_id).values(status=k.bid_status.ACCEPTED)
+                       .execution_options(synchronize_session=False))
+        db.execute(
+            update(B)
+            .where(fk == o.id, B.status == k.bid_status.PENDING)
+            .values(status=k.bid_status.REJECTED)
+            .execution_options(synchronize_session=False)
+        )
+
+    def assign(self, db: Session, o, user_id: int, tg_id: int, price: int | None,
+               bid_id: int | None = None, background_tasks: BackgroundTasks | None = None):
+        k = self.kind
+        values = {f"{k.assignee}_id": user_id, f"{k.assignee}_tg_id": tg_id, "final_price": price}
+        if k.assign_values is not None:
+            values.update(k.assign_values(db, user_id))
+        if not self._move(db, o, (self.NEW,), self.ASSIGNED, **values):
+            db.rollback()
+            raise ValueError(k.texts["taken"])
+        self._settle_bids(db, o, bid_id)
+        db.commit()
+        db.refresh(o)
+        self._fire("assigned", o)
+        self.closed([o.id])
+        self.publish("assigned", {k.id_key: o.id, k.assignee_key: user_id}, background_tasks)
+        return o
+
+    def accept_bid(self, db: Session, bid_id: int, owner_id: int,
+                   background_tasks: BackgroundTasks | None = None):
+        k = self.kind
+        b = db.get(k.bid_model, bid_id)
+        if not b:
+            raise LookupError("Ставка не найдена")
+        o = db.get(self.model, getattr(b, k.bid_fk))
+        if not o or self.owner_id(o) != owner_id:
+            raise PermissionError("Нет доступа")
+        if o.status != self.NEW:
+            raise ValueError(k.texts["bid_not_new"])
+        return self.assign(db, o, b.driver_id, b.driver_tg_id, b.offered_price, b.id, background_tasks)
+
+    def accept_fixed(self, db: Session, o, user: User, background_tasks: BackgroundTasks | None = None):
+        k = self.kind
+        if o.status != self.NEW:
+            raise ValueError(k.texts["taken"])
+        if o.price_mode == k.bids_mode:
+            raise ValueError("Для этого заказа требуется ставка и одобрение клиента")
+        if not o.client_price or o.client_price <= 0:
+            raise ValueError(k.texts["no_fixed_price"])
+        return self.assign(db, o, user.id, user.telegram_id, o.client_price, None, background_tasks)
+
+    def cancel(self, db: Session, o, owner_id: int, background_tasks: BackgroundTasks | None = None):
+        k = self.kind
+        if self.owner_id(o) != owner_id:
+            raise PermissionError(k.texts["cancel_foreign"])
+        if o.status in self.done or not self._move(db, o, self.active, self.CANCELLED):
+            db.rollback()
+            raise ValueError(k.texts["done"])
+        self._settle_bids(db, o)
+        db.commit()
+        db.refresh(o)
+        self._fire("status", o)
+        self.closed([o.id])
+        self.publish("updated", {k.id_key: o.id, "status": self.status_name(o)}, background_tasks)
+        return o
+
+    def move(self, db: Session, o, assignee_id: int, raw: str | None,
+             background_tasks: BackgroundTasks | None = None):
+        """Исполнитель двигает заявку по _TRANSITIONS; raw — "on_way" / "in_progress" / ..."""
+        k = self.kind
+        if self.assignee_id(o) != assignee_id:
+            raise PermissionError(k.texts["status_foreign"])
+        name = (raw or "").strip().upper()
+        if name not in ("ON_WAY", "IN_PROGRESS", "COMPLETED", "CANCELLED"):
+            raise ValueError("Неизвестный статус")
+        to = k.status[name]
+        if to not in self.transitions.get(o.status, ()):
+            raise ValueError(f"Недопустимый переход из {self.status_name(o)} в {to.value.lower()}")
+        if not self._move(db, o, (o.status,), to):
+            db.rollback()
+            raise ValueError("Статус уже изменился, обновите страницу")
+        db.commit()
+        db.refresh(o)
+        self._fire("status", o)
+        self.publish("updated", {k.id_key: o.id, "status": self.status_name(o)}, background_tasks)
+        return o
+
+    # ---------- списки ----------
+
+    def etag(self, *parts) -> str:
+        # любое изменение заявок проходит через hub.publish(topic) — версия топика и есть версия данных
+        return make_etag(hub.boot_id, hub.version(self.topic), *parts)
+
+    def rows(self, db: Session, who: Who, user_id: int | None, limit: int) -> list:
+        q = select(self.model)
+        if who == "owner":
+            q = q.where(getattr(self.model, f"{self.kind.owner}_id") == user_id)
+        elif who == "assignee":
+            q = q.where(getattr(self.model, f"{self.kind.assignee}_id") == user_id)
+        else:
+            q = q.where(self.model.status == self.NEW)
+        return db.execute(q.order_by(self.model.id.desc()).limit(limit)).scalars().all()
+
+    def feed(self, db: Session, limit: int, serialize: Callable) -> list[dict]:
+        """Лента NEW-заявок, общая для всех исполнителей: собирается раз на версию топика."""
+        # версию берём до запроса: изменение во время сборки уйдёт уже под новым ключом
+        key = (hub.boot_id, hub.version(self.topic), limit)
+        items = self._feed.get(key)
+        if items is None:
+            items = [serialize(o) for o in self.rows(db, "feed", None, limit)]
+            self._feed.set(key, items)
+        return items
+
+    # ---------- уведомления ----------
+
+    def staff_tg_ids(self, db: Session, exclude_tg_id: int | None = None) -> list[int]:
+        """Telegram id одобренных и активных исполнителей."""
+        P = self.kind.staff_profile
+        try:
+            ids = db.execute(
+                select(User.telegram_id)
+                .join(P, P.user_id == User.id)
+                .where(P.approved.is_(True))
+                .where(P.active.is_(True))
+            ).scalars().all()
+        except Exception as e:
+            print(f"[WARN] get active {self.kind.name} staff failed: {e}")
+            return []
+        return [int(x) for x in ids if x and int(x) != int(exclude_tg_id or 0)]
+
+    async def notify(self, tg_ids: list[int], text: str) -> None:
+        token = settings.BOT_TOKEN
+        if not token:
+            print(f"[WARN] Не указан BOT_TOKEN — уведомления ({self.kind.name}) не отправлены")
+            return
+        if not tg_ids:
+            return
+        url = f"https://api.telegram.org/bot{token}/sendMessage"
+        client = resources.http
+        pending = len(tg_ids)
+        self.notify_backlog += pending
+        try:
+            for chat_id in tg_ids:
+                try:
+                    await client.post(url, json={"chat_id": chat_id, "text": text})
+                except Exception as e:
+                    print(f"[WARN] sendMessage({self.kind.name}) failed for {chat_id}: {e}")
+                pending -= 1
+                self.notify_backlog -= 1
+        finally:
+            self.notify_backlog -= pending
+
+    # ---------- реалтайм ----------
+
+    def stream(self, *extra_topics: str) -> StreamingResponse:
+        topics = (self.topic, *extra_topics)
+
+        async def gen():
+            # первый «комментарий» держит канал открытым даже за Cloudflare/прокси
+            yield ": ok\n\n"
+            async for msg in hub.subscribe(*topics):
+                yield msg
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    async def poll(self, since: int, boot: str | None, timeout: float, topic: str | None = None) -> dict:
+        # запрос «паркуется» на хабе до первого события топика или до таймаута
+        return await hub.wait(topic or self.topic, since, boot, min(timeout, settings.LONG_POLL_TIMEOUT_SEC))
+
+
+# ---------- такси ----------
+
+def _taxi_vehicle(db: Session, driver_id: int) -> dict:
+    veh = db.execute(select(TaxiVehicle).where(TaxiVehicle.driver_id == driver_id)).scalar_one_or_none()
+    return {"assigned_vehicle_id": veh.id if veh else None}
+
+
+taxi_orders = OrderEngine(OrderKind(
+    name="taxi",
+    model=TaxiTrip, bid_model=TaxiBid, bid_fk="trip_id",
+    status=TripStatus, bid_status=TaxiBidStatus,
+    price_mode=PriceMode, bids_mode=PriceMode.DRIVER_BIDS,
+    owner="passenger", assignee="assigned_driver", staff_profile=DriverProfile,
+    id_key="trip_id", assignee_key="driver_id",
+    # ставки расходятся по личным каналам через книгу ставок, в общий топик — нет
+    events={"created": "trip_created", "assigned": "trip_assigned", "updated": "trip_updated"},
+    texts={
+        "not_found": "Поездка не найдена",
+        "no_bids": "Для этой поездки ставки не принимаются",
+        "bids_new_only": "Ставки принимаются только для новых заявок",
+        "bid_not_new": "Нельзя принять ставку: поездка не новая",
+        "taken": "Заказ уже недоступен",
+        "no_fixed_price": "Фикс-цена не указана. Нельзя взять без цены — только через ставки.",
+        "cancel_foreign": "Можно отменять только свои поездки",
+        "done": "Поездка уже завершена",
+        "status_foreign": "Можно менять статус только назначенной вам поездки",
+    },
+    assign_values=_taxi_vehicle,
+))
+
+
+@taxi_orders.on("closed")
+def _taxi_closed(ids: list[int]) -> None:
+    bid_book.close(*ids)
+    open_trips.remove(ids)
+
+
+@taxi_orders.on("bid")
+def _taxi_bid(db: Session, trip: TaxiTrip, bid: TaxiBid, driver: User, updated: bool) -> None:
+    bid_book.upsert(db, trip, bid, driver, updated)
+
+
+@taxi_orders.on("status")
+def _taxi_status(trip: TaxiTrip) -> None:
+    if trip.status == TripStatus.COMPLETED:
+        prices.record(trip)
+
+
+# ---------- доставка ----------
+
+delivery_orders = OrderEngine(OrderKind(
+    name="delivery",
+    model=DeliveryOrder, bid_model=DeliveryBid, bid_fk="order_id",
+    status=DeliveryStatus, bid_status=DeliveryBidStatus,
+    price_mode=DeliveryPriceMode, bids_mode=DeliveryPriceMode.COURIER_BIDS,
+    owner="customer", assignee="assigned_courier", staff_profile=CourierProfile,
+    id_key="order_id", assignee_key="courier_id",
+    events={
+        "created": "delivery_order_created", "bid": "delivery_bid_created",
+        "assigned": "delivery_order_assigned", "updated": "delivery_order_updated",
+    },
+    texts={
+        "not_found": "Заказ не найден",
+        "no_bids": "Для этого заказа ставки не принимаются",
+        "bids_new_only": "Ставки принимаются только для новых заказов",
+        "bid_not_new": "Нельзя принять ставку: заказ не новый",
+        "taken": "Заказ уже недоступен",
+        "no_fixed_price": "Фикс-цена не указана.",
+        "cancel_foreign": "Можно отменять только свои заказы",
+        "done": "Заказ уже завершён",
+        "status_foreign": "Можно менять статус только назначенного вам заказа",
+    },
+))
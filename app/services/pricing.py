@@ -0,0 +1,120 @@
+# app/services/pricing.py
+"""
+Подсказка цены поездки по истории маршрута.
+
+Индекс в памяти: нормализованная пара (откуда, куда) -> последние PRICE_WINDOW
+финальных цен завершённых поездок (в порядке завершения и отсортированные)
+и готовая статистика (медиана, p25, p75). Статистика пересчитывается при
+добавлении цены, поэтому ответ эндпоинта — один поиск в словаре.
+Индекс прогревается из БД при первом обращении, дальше пополняется при завершении поездки.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+from collections import deque
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.taxi import TaxiTrip, TripStatus
+from ..utils.text import normalize_street
+
+
+def route_key(from_street: str | None, to_street: str | None) -> tuple[str, str]:
+    return normalize_street(from_street), normalize_street(to_street)
+
+
+def _percentile(sorted_prices: list[int], p: float) -> int:
+    # линейная интерполяция между соседними значениями, округляем до рубля
+    pos = (len(sorted_prices) - 1) * p
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_prices) - 1)
+    return round(sorted_prices[lo] + (sorted_prices[hi] - sorted_prices[lo]) * (pos - lo))
+
+
+class _Route:
+    __slots__ = ("recent", "sorted", "stats")
+
+    def __init__(self, window: int) -> None:
+        self.recent: deque[int] = deque(maxlen=window)
+        self.sorted: list[int] = []
+        self.stats: dict | None = None
+
+    def add(self, price: int) -> None:
+        if len(self.recent) == self.recent.maxlen:
+            old = self.recent[0]
+            del self.sorted[bisect.bisect_left(self.sorted, old)]
+        self.recent.append(price)
+        bisect.insort(self.sorted, price)
+        s = self.sorted
+        self.stats = {
+            "median": _percentile(s, 0.5),
+            "p25": _percentile(s, 0.25),
+            "p75": _percentile(s, 0.75),
+            "min": s[0],
+            "max": s[-1],
+            "count": len(s),
+        }
+
+
+class PriceIndex:
+    def __init__(self, window: int, min_samples: int) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self._routes: dict[tuple[str, str], _Route] = {}
+        self._lock = threading.Lock()
+        self._warm = False
+        # завершения, пришедшие во время прогрева: (trip_id, key, price)
+        self._pending: list[tuple[int, tuple[str, str], int]] = []
+
+    def _add(self, key: tuple[str, str], price: int) -> None:
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = _Route(self.window)
+        route.add(price)
+
+    def warm(self, db: Session) -> None:
+        if self._warm:
+            return
+        rows = db.execute(
+            select(TaxiTrip.id, TaxiTrip.from_street, TaxiTrip.to_street, TaxiTrip.final_price)
+            .where(TaxiTrip.status == TripStatus.COMPLETED, TaxiTrip.final_price > 0)
+            .order_by(TaxiTrip.id.asc())
+            .execution_options(yield_per=5000)
+        ).all()
+        with self._lock:
+            if self._warm:
+                return
+            loaded = set()
+            for trip_id, from_street, to_street, price in rows:
+                loaded.add(trip_id)
+                self._add(route_key(from_street, to_street), price)
+            for trip_id, key, price in self._pending:
+                if trip_id not in loaded:
+                    self._add(key, price)
+            self._pending = []
+            self._warm = True
+
+    def record(self, trip: TaxiTrip) -> None:
+        """Вызывать после коммита завершения поездки."""
+        if not trip.final_price or trip.final_price <= 0:
+            return
+        key = route_key(trip.from_street, trip.to_street)
+        with self._lock:
+            if self._warm:
+                self._add(key, trip.final_price)
+            else:
+                self._pending.append((trip.id, key, trip.final_price))
+
+    def suggest(self, db: Session, from_street: str, to_street: str) -> dict | None:
+        self.warm(db)
+        route = self._routes.get(route_key(from_street, to_street))
+        stats = route.stats if route else None
+        if stats is None or stats["count"] < self.min_samples:
+            return None
+        return stats
+
+
+prices = PriceIndex(settings.PRICE_WINDOW, settings.PRICE_MIN_SAMPLES)
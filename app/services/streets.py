@@ -0,0 +1,116 @@
+# app/services/streets.py
+"""
+Автодополнение улиц.
+
+Индекс в памяти — отсортированный список (слово..., ключ улицы): каждую улицу
+кладём по разу на каждое слово названия, чтобы «мира» находило и «проспект Мира».
+Поиск префикса — bisect + проход по соседним элементам.
+Ключ улицы — normalize_street() (регистр, диакритика, ё/е, «ул.»), показываем
+самое частое написание. Источники: улицы из поездок и заказов доставки,
+плюс необязательный файл STREETS_SEED_FILE (по улице в строке).
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+from pathlib import Path
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.delivery import DeliveryOrder
+from ..models.taxi import TaxiTrip
+from ..utils.text import normalize_street
+
+_SCAN_LIMIT = 200  # сколько совпадений префикса просматриваем ради сортировки по частоте
+
+
+class StreetIndex:
+    def __init__(self, seed_file: str | None = None) -> None:
+        self.seed_file = seed_file
+        self._entries: list[tuple[str, str]] = []       # (хвост названия с начала слова, ключ)
+        self._spellings: dict[str, dict[str, int]] = {}  # ключ -> написание -> сколько раз
+        self._labels: dict[str, str] = {}
+        self._hits: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._warm = False
+        self._pending: list[tuple[str, int]] = []
+
+    def _add(self, name: str, n: int = 1) -> None:
+        name = " ".join(name.split())
+        key = normalize_street(name)
+        if not key:
+            return
+        if key not in self._hits:
+            words = key.split(" ")
+            for i in range(len(words)):
+                bisect.insort(self._entries, (" ".join(words[i:]), key))
+            self._hits[key] = 0
+            self._spellings[key] = {}
+        self._hits[key] += n
+        spellings = self._spellings[key]
+        spellings[name] = spellings.get(name, 0) + n
+        if spellings[name] >= spellings.get(self._labels.get(key), 0):
+            self._labels[key] = name
+
+    def _seed(self) -> list[str]:
+        if not self.seed_file:
+            return []
+        try:
+            lines = Path(self.seed_file).read_text(encoding="utf-8").splitlines()
+        except OSError as e:
+            print(f"[WARN] streets seed {self.seed_file}: {e}")
+            return []
+        return [x.strip() for x in lines if x.strip() and not x.lstrip().startswith("#")]
+
+    def warm(self, db: Session) -> None:
+        if self._warm:
+            return
+        counted: list[tuple[str, int]] = []
+        for col in (TaxiTrip.from_street, TaxiTrip.to_street, DeliveryOrder.to_street):
+            counted += db.execute(
+                select(col, func.count()).where(col.is_not(None)).group_by(col)
+            ).all()
+        seed = self._seed()
+        with self._lock:
+            if self._warm:
+                return
+            for name in seed:
+                self._add(name)
+            for name, n in counted:
+                self._add(name, n)
+            for name, n in self._pending:
+                self._add(name, n)
+            self._pending = []
+            self._warm = True
+
+    def add(self, *names: str | None) -> None:
+        """Новые адреса из заявок; вызывать после коммита."""
+        with self._lock:
+            for name in names:
+                if not name:
+                    continue
+                if self._warm:
+                    self._add(name)
+                else:
+                    self._pending.append((name, 1))
+
+    def suggest(self, db: Session, prefix: str, limit: int = 10) -> list[str]:
+        self.warm(db)
+        p = normalize_street(prefix)
+        if not p:
+            return []
+        with self._lock:
+            pos = bisect.bisect_left(self._entries, (p,))
+            keys: dict[str, None] = {}
+            for tail, key in self._entries[pos:pos + _SCAN_LIMIT]:
+                if not tail.startswith(p):
+                    break
+                keys[key] = None
+            # совпадение с начала названия выше совпадения по слову, дальше — по частоте
+            ranked = sorted(keys, key=lambda k: (not k.startswith(p), -self._hits[k], k))
+            return [self._labels[k] for k in ranked[:limit]]
+
+
+streets = StreetIndex(settings.STREETS_SEED_FILE)
@@ -0,0 +1,28 @@
+# app/sessions.py
+"""
+Сессии: cookie для страниц и WebSocket, bearer-токен для API.
+
+Если запрос к /api пришёл с "Authorization: Bearer", cookie-сессия не читается
+и не пишется: scope["session"] собирается из проверенного токена (tg_user),
+поэтому get_current_tg_user, лимиты и Idempotency-Key работают как раньше.
+Токен не прошёл проверку — сессия пустая, дальше решает X-Tg-Init-Data или 401.
+"""
+from __future__ import annotations
+
+from starlette.datastructures import Headers
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.types import Receive, Scope, Send
+
+from .auth.tokens import bearer_token, read_access_token
+
+
+class BearerSessionMiddleware(SessionMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith("/api/"):
+            token = bearer_token(Headers(scope=scope))
+            if token is not None:
+                tg_user = read_access_token(token)
+                scope["session"] = {"tg_user": tg_user} if tg_user else {}
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,39 @@
+# app/utils/http_cache.py
+from __future__ import annotations
+
+import hashlib
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из произвольных частей версии (счётчики, id, лимиты)."""
+    raw = "|".join(str(p) for p in parts).encode("utf-8")
+    return 'W/"' + hashlib.blake2b(raw, digest_size=10).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    # сравнение слабое: W/"x" == "x"
+    want = etag[2:] if etag.startswith("W/") else etag
+    for tag in inm.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == want:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def etag_headers(etag: str) -> dict:
+    # no-cache: клиент хранит тело, но каждый раз переспрашивает с If-None-Match
+    return {"ETag": etag, "Cache-Control": "no-cache"}
@@ -2,8 +2,8 @@ import time
 from jose import jwt, JWTError
 from ..config import settings
 
-def create_jwt(payload: dict) -> str:
-    exp = int(time.time()) + settings.JWT_TTL_SEC
+def create_jwt(payload: dict, ttl: int | None = None) -> str:
+    exp = int(time.time()) + (settings.JWT_TTL_SEC if ttl is None else ttl)
     return jwt.encode({**payload, "exp": exp}, settings.SECRET_KEY, algorithm=settings.JWT_ALG)
 
 def decode_jwt(token: str):
@@ -0,0 +1,29 @@
+# app/utils/text.py
+from __future__ import annotations
+
+import re
+import unicodedata
+
+_SPACES = re.compile(r"\s+")
+# «ул.», «улица» в начале или в конце названия
+_STREET_WORD = re.compile(r"^(?:улица\s+|ул\.\s*|ул\s+)|\s+(?:ул\.?|улица)$")
+
+
+def fold(s: str | None) -> str:
+    """Нижний регистр, без диакритики, ё→е, одиночные пробелы."""
+    if not s:
+        return ""
+    s = s.casefold().replace("ё", "е")
+    # й — тоже «буква с диакритикой», но для нас отдельная буква: раскладываем всё, кроме неё
+    s = "".join(
+        ch if ch == "й" else "".join(c for c in unicodedata.normalize("NFD", ch) if not unicodedata.combining(c))
+        for ch in s
+    )
+    return _SPACES.sub(" ", s).strip()
+
+
+def normalize_street(s: str | None) -> str:
+    """Ключ улицы для сравнения: fold() без «ул.»/«улица» и лишней пунктуации."""
+    s = fold(s).replace(",", " ")
+    s = _STREET_WORD.sub("", _SPACES.sub(" ", s).strip())
+    return s.strip(" .")
@@ -0,0 +1,145 @@
+// Очереди модерации: страницы по курсору, счётчики во вкладках, живые обновления по SSE.
+// После действия карточка убирается локально — без перезагрузки всей очереди.
+window.AdminQueue = (function(){
+  const api = async (url, opts) => {
+    const r = await fetch(url, Object.assign({credentials:'include', headers:{'Content-Type':'application/json'}}, opts||{}));
+    let j=null; try{ j=await r.json(); }catch(_){ throw new Error('bad_json'); }
+    if(!r.ok || j.ok===false) throw new Error(j.detail || j.error || 'error');
+    return j;
+  };
+
+  // ---- счётчики: [data-count="board|drivers|vehicles|couriers"] ----
+  let countsTimer = null;
+  function refreshCounts(){
+    clearTimeout(countsTimer);
+    countsTimer = setTimeout(async ()=>{
+      try{
+        const {counts} = await api('/api/admin/moderation/counts');
+        document.querySelectorAll('[data-count]').forEach(el => {
+          const n = counts[el.getAttribute('data-count')];
+          el.textContent = n ? String(n) : '';
+        });
+      }catch(_){}
+    }, 200);
+  }
+
+  // ---- один SSE-поток на страницу, события раздаются очередям ----
+  const handlers = [];
+  let es = null;
+  function stream(){
+    if (es || !window.EventSource) return;
+    es = new EventSource('/api/admin/moderation/stream');
+    ['pending_upsert', 'pending_removed', 'moderation_bulk'].forEach(name => {
+      es.addEventListener(name, (ev) => {
+        let data; try{ data = JSON.parse(ev.data); }catch(_){ return; }
+        handlers.forEach(h => h(name, data));
+        refreshCounts();
+      });
+    });
+  }
+
+  function create(opts){
+    const {queue, box, more, render, key, empty} = opts;
+    const actions = opts.actions || {};
+    const bulk = opts.bulk || null;
+    let cursor = null, complete = false;
+
+    const find = (k) => box.querySelector(`[data-key="${k}"]`);
+    function wrap(item){
+      const k = item[key];
+      const select = bulk ? `<label class="flex items-center gap-2 text-xs opacity-70 mb-1"><input type="checkbox" data-select="${k}"> выбрать</label>` : '';
+      return `<div data-key="${k}" class="border rounded-xl p-3 sm:p-4 bg-white/70 dark:bg-slate-900/40 break-words">${select}${render(item)}</div>`;
+    }
+    function syncEmpty(){
+      const ph = box.querySelector('[data-empty]');
+      const has = !!box.querySelector('[data-key]');
+      if (!has && !ph) box.insertAdjacentHTML('beforeend', `<div data-empty class="opacity-70">${empty}</div>`);
+      if (has && ph) ph.remove();
+    }
+    function upsert(item){
+      const el = find(item[key]);
+      if (el) el.outerHTML = wrap(item);
+      else box.insertAdjacentHTML('beforeend', wrap(item));
+    }
+    function remove(ids){
+      ids.forEach(k => { const el = find(k); if (el) el.remove(); });
+      syncEmpty();
+    }
+
+    async function load(reset){
+      if (reset){ cursor = null; complete = false; box.innerHTML = 'Загрузка...'; }
+      const p = new URLSearchParams({limit: String(opts.limit || 50)});
+      if (cursor != null) p.set('cursor', cursor);
+      try{
+        const data = await api(`/api/admin/moderation/${queue}?${p}`);
+        if (reset) box.innerHTML = '';
+        (data.items || []).forEach(upsert);
+        cursor = data.next_cursor;
+        complete = cursor == null;
+        if (more) more.classList.toggle('hidden', complete);
+        syncEmpty();
+      }catch(e){
+        if (reset) box.textContent = 'Ошибка: ' + (e.message || e);
+      }
+    }
+
+    box.addEventListener('click', async (e) => {
+      const b = e.target.closest('[data-action]');
+      if (!b || !box.contains(b)) return;
+      const card = b.closest('[data-key]');
+      const act = actions[b.getAttribute('data-action')];
+      if (!card || !act) return;
+      const k = card.getAttribute('data-key');
+      const spec = typeof act === 'function' ? act(k) : act;
+      const req = typeof spec === 'string' ? {url: spec} : spec;
+      if (req.confirm && !confirm(req.confirm)) return;
+      b.disabled = true;
+      try{
+        await api(req.url, {method: req.method || 'POST'});
+        if (req.keep) b.disabled = false;   // действие не выводит запись из очереди
+        else remove([k]);
+        refreshCounts();
+      }catch(err){
+        alert(err.message || err);
+        b.disabled = false;
+      }
+    });
+
+    if (bulk){
+      Object.entries(bulk.buttons).forEach(([sel, action]) => {
+        const btn = document.querySelector(sel);
+        if (!btn) return;
+        btn.onclick = async () => {
+          const ids = Array.from(box.querySelectorAll('[data-select]:checked')).map(x => Number(x.getAttribute('data-select')));
+          if (!ids.length) return;
+          btn.disabled = true;
+          try{
+            const res = await api(bulk.url, {method: 'POST', body: JSON.stringify({ids, action})});
+            remove(res.results.filter(r => r.ok).map(r => r.id));
+            refreshCounts();
+          }catch(err){ alert(err.message || err); }
+          finally{ btn.disabled = false; }
+        };
+      });
+    }
+
+    if (more) more.onclick = () => load(false);
+
+    handlers.push((name, data) => {
+      if (name === 'pending_upsert' && data.queue === queue){
+        // новая запись — в конец, если очередь уже догружена; иначе она придёт со следующей страницей
+        if (find(data.item[key]) || complete){ upsert(data.item); syncEmpty(); }
+      } else if (name === 'pending_removed' && data.queue === queue){
+        remove(data.ids);
+      } else if (name === 'moderation_bulk' && (data.queues || []).includes(queue)){
+        remove(data.ids);
+      }
+    });
+
+    stream();
+    refreshCounts();
+    return {load, remove};
+  }
+
+  return {create, api, refreshCounts};
+})();
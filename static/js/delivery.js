@@ -0,0 +1,256 @@
+// static/js/delivery.js — вынесено из templates/delivery.html
+(function(){
+  const q = s => document.querySelector(s);
+  const qs = s => Array.from(document.querySelectorAll(s));
+  const show = (el, v)=> el.classList.toggle('hidden', !v);
+  const toast = (text, ok=true)=>{
+    const b=q('#toast'), i=q('#toastInner');
+    i.textContent=text; i.classList.toggle('text-emerald-700', ok); i.classList.toggle('text-rose-700', !ok);
+    b.classList.remove('hidden'); clearTimeout(b._t); b._t=setTimeout(()=>b.classList.add('hidden'),1800);
+  };
+  // once:true — запрос создаёт данные: шлём с Idempotency-Key и повторяем при обрыве сети
+  async function api(url, opts){
+    const o = Object.assign({credentials:'include', headers:{'Content-Type':'application/json'}}, opts||{});
+    const r = await (o.once ? Village.sendOnce : fetch)(url, o);
+    let j=null; try{ j=await r.json(); }catch(_){ j={ok:false,error:'bad_json'}; }
+    if(!r.ok || j.ok===false) throw new Error(j.detail||j.error||'error');
+    return j;
+  }
+  const T = {
+    isActive(s){ const v=(s||'').toLowerCase(); return ['new','assigned','on_way','in_progress'].includes(v); },
+    statusLabel(s){
+      switch((s||'').toLowerCase()){
+        case 'new': return 'новый';
+        case 'assigned': return 'назначен курьер';
+        case 'on_way': return 'курьер в пути';
+        case 'in_progress': return 'выполняется';
+        case 'completed': return 'завершён';
+        case 'cancelled': return 'отменён';
+        default: return s||'—';
+      }
+    },
+    priceLabel(o){
+      const v = o.final_price ?? o.client_price ?? o.price; return (v!=null?v:'?')+' ₽';
+    },
+    fmtTo(o){
+      return `${o.to?.street||''} ${o.to?.house||''} ${o.to?.comment?('('+o.to.comment+')'):''}`.trim();
+    }
+  };
+
+  // Роли
+  q('#btnRoleCustomer').onclick = ()=>{ show(q('#customerBlock'),true); show(q('#courierBlock'),false); renderMyCustomer(); };
+  q('#btnRoleCourier').onclick = ()=>{ show(q('#customerBlock'),false); show(q('#courierBlock'),true); loadCourier(); renderFeed(); renderMyCourier(); };
+
+  // Создать заказ
+  q('#btnCreateOrder').onclick = async ()=>{
+    const payload = {
+      title: q('#title').value.trim(),
+      details: q('#details').value.trim() || null,
+      from_place: q('#from_place').value.trim() || null,
+      to_street: q('#to_street').value.trim() || null,
+      to_house: q('#to_house').value.trim() || null,
+      to_comment: q('#to_comment').value.trim() || null,
+      price_mode: q('#price_mode').value,
+      client_price: q('#price_mode').value==='client_sets' && q('#client_price').value ? parseInt(q('#client_price').value,10) : null,
+    };
+    try{
+      await api('/api/delivery/orders', {method:'POST', once:true, body: JSON.stringify(payload)});
+      toast('Заказ создан'); q('#client_price').value=''; q('#title').value='';
+      renderMyCustomer();
+    }catch(e){ toast(e.message||e, false); }
+  };
+
+  // Мои заказы (клиент)
+  async function renderMyCustomer(){
+    const box = q('#myCustomerOrders'); box.innerHTML='Загрузка...';
+    try{
+      const {items} = await api('/api/delivery/orders?role=customer');
+      const active=[], hist=[];
+      for (const o of items){ (T.isActive(o.status) ? active : hist).push(o); }
+
+      box.innerHTML =
+        (active.length ? active.map(o => clientCard(o,false)).join('') : 'Активных заказов нет') +
+        (hist.length   ? `<div class="mt-4 opacity-70 space-y-2">${hist.map(o => clientCard(o,true)).join('')}</div>` : '');
+
+      // ВАЖНО: после вставки HTML привяжем клики
+      bindCustomerActions();
+    }catch(e){
+      box.textContent = 'Ошибка: ' + (e.message||e);
+    }
+  }
+  q('#btnMyCustomer').onclick = renderMyCustomer;
+    function bindCustomerActions(){
+    qs('[data-cancel]').forEach(btn=>{
+      btn.onclick = async ()=>{
+        const id = btn.getAttribute('data-cancel');
+        try{
+          await api(`/api/delivery/orders/${id}/cancel`, {method:'POST', body: JSON.stringify({})});
+          toast('Заказ отменён');
+          renderMyCustomer();
+          if (typeof renderFeed === 'function') renderFeed();   // чтоб обновилась лента у курьеров
+        }catch(e){
+          toast(e.message||e, false);
+        }
+      };
+    });
+  }
+  function clientCard(o, dim){
+    return `
+    <div class="border rounded-2xl p-4 bg-white/80 dark:bg-slate-900/40 ${dim?'opacity-60 grayscale-[30%]':''}">
+      <div class="flex items-center justify-between gap-2 flex-wrap">
+        <div class="font-semibold">#${o.id} • ${T.statusLabel(o.status)} • ${T.priceLabel(o)}</div>
+        ${T.isActive(o.status) ? `<button class="btn btn-ghost text-sm" data-cancel="${o.id}">Отменить</button>` : ``}
+      </div>
+      <div class="mt-2">${o.title || ''}</div>
+      ${o.details ? `<div class="text-xs opacity-80 mt-1">${o.details}</div>` : ``}
+      ${o.to?.street ? `<div class="mt-2 text-sm">Доставить: ${T.fmtTo(o)}</div>` : ``}
+    </div>`;
+  }
+
+  // Курьер: статус/профиль
+  async function loadCourier(){
+    const st=q('#courierStatus');
+    try{
+      const {profile} = await api('/api/delivery/courier/me');
+      const chunks=[];
+      if (profile.approved) chunks.push('одобрен ✅');
+      else if (profile.rejected) chunks.push('отклонён ❌');
+      else chunks.push('на модерации ⏳');
+      chunks.push(profile.active ? 'активен' : 'не активен');
+      st.textContent = chunks.join(' • ');
+      q('#full_name').value = profile.full_name||'';
+      q('#phone').value = profile.phone||'';
+      q('#notes').value = profile.notes||'';
+      const sw=q('#activeSwitch'); sw.checked=!!profile.active; sw.disabled=!profile.approved;
+    }catch(e){ st.textContent = 'Ошибка: '+(e.message||e); }
+  }
+  q('#btnSubmitProfile').onclick = async ()=>{
+    try{
+      await api('/api/delivery/courier/profile', {method:'POST', body: JSON.stringify({
+        full_name:q('#full_name').value, phone:q('#phone').value, notes:q('#notes').value
+      })});
+      await loadCourier(); toast('Профиль отправлен');
+    }catch(e){ toast(e.message||e,false); }
+  };
+  q('#btnToggleActive').onclick = async ()=>{
+    try{
+      await api('/api/delivery/courier/active', {method:'POST', body: JSON.stringify({active: q('#activeSwitch').checked})});
+      await loadCourier(); toast('Статус обновлён');
+    }catch(e){ toast(e.message||e,false); }
+  };
+
+  // Лента и мои (курьер)
+  async function renderFeed(){
+    const box=q('#feed'); if(!box) return; box.innerHTML='Загрузка...';
+    try{
+      const {items} = await api('/api/delivery/orders?role=feed');
+      if(!items.length){ box.textContent='Нет новых заказов'; return; }
+      box.innerHTML = items.map(o=>{
+        const isFixed = (o.price_mode||'')==='client_sets';
+        return `
+          <div class="border rounded-2xl p-4 bg-white/70 dark:bg-slate-900/40">
+            <div class="font-semibold">#${o.id} • ${isFixed ? ((o.client_price||'?')+' ₽') : 'ставки курьеров'}</div>
+            <div class="mt-1">${o.title||''}</div>
+            ${o.details ? `<div class="text-xs opacity-80">${o.details}</div>` : ``}
+            ${o.to?.street ? `<div class="mt-1 text-sm">Доставить: ${T.fmtTo(o)}</div>` : ``}
+            <div class="mt-3 flex flex-wrap gap-2 items-center">
+              <input class="border rounded-xl p-2 w-28" data-bid-price placeholder="Моя цена" inputmode="numeric">
+              <button class="btn btn-accent" data-bid="${o.id}">Ставка</button>
+              ${isFixed ? `<button class="btn btn-secondary" data-accept="${o.id}">Взять</button>` : ``}
+            </div>
+          </div>`;
+      }).join('');
+      qs('[data-bid]').forEach(b=>b.onclick=async ()=>{
+        const id=b.getAttribute('data-bid');
+        const price = parseInt(b.parentElement.querySelector('[data-bid-price]').value||'0',10);
+        if(!price) return toast('Укажите цену', false);
+        try{ await api(`/api/delivery/orders/${id}/bids`, {method:'POST', once:true, body: JSON.stringify({offered_price: price})}); toast('Ставка отправлена'); }
+        catch(e){ toast(e.message||e,false); }
+      });
+      qs('[data-accept]').forEach(b=>b.onclick=async ()=>{
+        const id=b.getAttribute('data-accept');
+        try{ await api(`/api/delivery/orders/${id}/accept`, {method:'POST', body: '{}'}); toast('Заказ принят'); renderFeed(); renderMyCourier(); }
+        catch(e){ toast(e.message||e,false); }
+      });
+    }catch(e){ box.textContent='Ошибка: '+(e.message||e); }
+  }
+  q('#btnRefreshFeed').onclick = renderFeed;
+
+  async function renderMyCourier(){
+    const box=q('#myCourierOrders'); if(!box) return; box.innerHTML='Загрузка...';
+    try{
+      const {items} = await api('/api/delivery/orders?role=courier');
+      box.innerHTML = items.length ? items.map(o=>courierCard(o)).join('') : 'Активных заказов нет';
+      bindCourierActions();
+    }catch(e){ box.textContent='Ошибка: '+(e.message||e); }
+  }
+  q('#btnMyCourier').onclick = renderMyCourier;
+
+  function courierCard(o){
+    const st=(o.status||'').toLowerCase();
+    const canOnWay      = ['assigned'].includes(st);
+    const canInProgress = ['assigned','on_way'].includes(st);
+    const canComplete   = ['in_progress','on_way'].includes(st);
+    return `
+      <div class="border rounded-2xl p-4 bg-white/70 dark:bg-slate-900/40">
+        <div class="font-semibold">#${o.id} • ${T.statusLabel(o.status)} • ${T.priceLabel(o)}</div>
+        <div class="mt-1">${o.title||''}</div>
+        ${o.details ? `<div class="text-xs opacity-80">${o.details}</div>` : ``}
+        ${o.to?.street ? `<div class="mt-1 text-sm">Доставить: ${T.fmtTo(o)}</div>` : ``}
+        <div class="mt-3 flex flex-wrap gap-2">
+          <button class="btn btn-info text-sm" data-status="${o.id}" data-to="on_way" ${!canOnWay?'disabled':''}>Еду к клиенту</button>
+          <button class="btn btn-info text-sm" data-status="${o.id}" data-to="in_progress" ${!canInProgress?'disabled':''}>Выполняю</button>
+          <button class="btn btn-secondary text-sm" data-status="${o.id}" data-to="completed" ${!canComplete?'disabled':''}>Завершить</button>
+        </div>
+      </div>`;
+  }
+  function bindCourierActions(){
+    qs('[data-status]').forEach(btn=>{
+      btn.onclick = async ()=>{
+        const id=btn.getAttribute('data-status');
+        const status=btn.getAttribute('data-to');
+        try{ await api(`/api/delivery/orders/${id}/status`, {method:'POST', body: JSON.stringify({status})}); renderMyCourier(); toast('Статус обновлён'); }
+        catch(e){ toast(e.message||e,false); }
+      };
+    });
+  }
+
+  // автообновление через SSE
+  const STREAM_EVENTS = ['delivery_order_created', 'delivery_bid_created', 'delivery_order_assigned', 'delivery_order_updated', 'delivery_orders_expired'];
+  // long-poll: один «припаркованный» запрос вместо полного перечитывания каждые 4 с
+  async function longPoll(url, events, refresh){
+    let since = 0, boot = '';
+    for (;;) {
+      try {
+        const r = await fetch(`${url}?since=${since}&boot=${boot}`, {cache: 'no-store'});
+        if (!r.ok) throw new Error(String(r.status));
+        const d = await r.json();
+        if (boot && (d.reset || d.events.some(e => events.includes(e.event)))) refresh();
+        since = d.version; boot = d.boot;
+      } catch (e) {
+        await new Promise(res => setTimeout(res, 4000));
+      }
+    }
+  }
+  function startStream(){
+    const refresh = debounce(()=>{ renderFeed(); renderMyCustomer(); renderMyCourier(); }, 250);
+    if (!window.EventSource) { longPoll('/api/delivery/poll', STREAM_EVENTS, refresh); return; }
+    const es = new EventSource('/api/delivery/stream');
+    STREAM_EVENTS.forEach(ev => es.addEventListener(ev, refresh));
+    let opened = false, errors = 0;
+    es.onopen = () => { opened = true; };
+    es.onerror = () => {
+      // прокси/WebView рвут text/event-stream — переходим на long-poll
+      if (!opened || ++errors >= 3 || es.readyState === EventSource.CLOSED) {
+        es.close();
+        longPoll('/api/delivery/poll', STREAM_EVENTS, refresh);
+      }
+    };
+  }
+  function debounce(fn,ms){ let t; return (...a)=>{ clearTimeout(t); t=setTimeout(()=>fn(...a),ms); }; }
+  document.addEventListener('DOMContentLoaded', ()=>{
+    show(q('#customerBlock'), true);
+    renderMyCustomer();
+    startStream();
+  });
+})();
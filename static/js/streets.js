@@ -0,0 +1,35 @@
+// static/js/streets.js — подсказки улиц для полей с атрибутом data-streets (через <datalist>)
+(function(){
+  const cache = new Map();
+  async function fetchStreets(q){
+    const key = q.toLowerCase();
+    if (cache.has(key)) return cache.get(key);
+    const r = await fetch('/api/streets/suggest?' + new URLSearchParams({q, limit: '8'}), {credentials:'include'});
+    const items = r.ok ? ((await r.json()).items || []) : [];
+    cache.set(key, items);
+    return items;
+  }
+
+  document.querySelectorAll('input[data-streets]').forEach((input, i) => {
+    const list = document.createElement('datalist');
+    list.id = 'streets-' + i;
+    input.after(list);
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    let timer = null, seq = 0;
+    input.addEventListener('input', () => {
+      clearTimeout(timer);
+      const q = input.value.trim();
+      if (!q) { list.innerHTML = ''; return; }
+      timer = setTimeout(async () => {
+        const my = ++seq;
+        try{
+          const items = await fetchStreets(q);
+          if (my !== seq) return;
+          list.innerHTML = '';
+          items.forEach(s => { const o = document.createElement('option'); o.value = s; list.appendChild(o); });
+        }catch(_){}
+      }, 120);
+    });
+  });
+})();
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# настройки читаются при импорте app.config — задаём окружение до импорта приложения
+_DB = Path(tempfile.mkdtemp()) / "test.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("BOT_TOKEN", "123:test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+import hashlib  # noqa: E402
+import hmac  # noqa: E402
+import json  # noqa: E402
+import time  # noqa: E402
+import urllib.parse  # noqa: E402
+
+import pytest  # noqa: E402
+
+
+def init_data(uid: int, name: str = "U", auth_date: int | None = None) -> str:
+    """Подписанная Telegram WebApp initData для тестового пользователя."""
+    params = {
+        "auth_date": str(int(time.time()) if auth_date is None else auth_date),
+        "query_id": "q",
+        "user": json.dumps({"id": uid, "first_name": name, "username": f"u{uid}"}),
+    }
+    check = "\n".join(f"{k}={params[k]}" for k in sorted(params))
+    secret = hmac.new(b"WebAppData", os.environ["BOT_TOKEN"].encode(), hashlib.sha256).digest()
+    params["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(params)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app, base_url="https://testserver") as c:
+        yield c
+
+
+@pytest.fixture
+def as_user(client):
+    """Заголовки запроса от имени пользователя; cookie прошлого пользователя сбрасываются."""
+    def headers(uid: int) -> dict:
+        client.cookies.clear()
+        return {"X-Tg-Init-Data": init_data(uid)}
+    return headers
@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import text
+
+from app.db import engine
+
+
+@pytest.mark.parametrize("path", ["/api/admin/moderation/counts", "/api/admin/moderation/drivers",
+                                  "/api/admin/moderation/stream"])
+def test_moderation_requires_admin(client, as_user, path):
+    client.cookies.clear()
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=as_user(3001)).status_code == 403
+
+
+def test_moderation_counts_for_admin(client, as_user):
+    h = as_user(3002)
+    client.get("/api/is_admin", headers=h)  # создаёт пользователя
+    with engine.begin() as conn:
+        conn.execute(text("update users set role='admin' where telegram_id=3002"))
+    r = client.get("/api/admin/moderation/counts", headers=as_user(3002))
+    assert r.status_code == 200 and r.json()["ok"]
@@ -0,0 +1,49 @@
+from app.utils.security import create_jwt
+
+from conftest import init_data
+
+
+def _token(client, uid: int) -> str:
+    r = client.post("/api/tg/session", data={"init_data": init_data(uid)})
+    assert r.status_code == 200
+    assert r.json()["token_type"] == "bearer"
+    return r.json()["token"]
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_bearer_token_authenticates_without_cookie(client):
+    token = _token(client, 6001)
+    client.cookies.clear()
+
+    r = client.get("/api/me", headers=_bearer(token))
+    assert r.json()["user"]["id"] == 6001
+    assert "set-cookie" not in r.headers
+
+    r = client.get("/api/is_admin", headers=_bearer(token))
+    assert r.status_code == 200
+    assert "set-cookie" not in r.headers
+
+
+def test_bad_bearer_token_gives_empty_session(client):
+    good = _token(client, 6002)
+    expired = create_jwt({"sub": "6002", "role": "user"}, ttl=-10)
+    head, payload, sig = good.split(".")
+    tampered = ".".join((head, payload, sig[:-4] + ("AAAA" if sig[-4:] != "AAAA" else "BBBB")))
+
+    for token in (expired, tampered, "garbage"):
+        # cookie-сессия от /api/tg/session ещё в клиенте — с bearer она не читается
+        r = client.get("/api/me", headers=_bearer(token))
+        assert r.json()["user"] is None
+        assert "set-cookie" not in r.headers
+        assert client.get("/api/is_admin", headers=_bearer(token)).status_code == 401
+
+
+def test_bad_bearer_falls_back_to_init_data(client):
+    client.cookies.clear()
+    headers = {**_bearer("garbage"), "X-Tg-Init-Data": init_data(6003)}
+    r = client.get("/api/is_admin", headers=headers)
+    assert r.status_code == 200
+    assert "set-cookie" not in r.headers
@@ -0,0 +1,35 @@
+import datetime as dt
+
+from sqlalchemy import delete, func, select
+
+from app.db import SessionLocal
+from app.models.chat import ChatMessage, ChatMessageArchive
+from app.services.chat import archive_old_messages
+
+
+def _add(db, created_at) -> int:
+    m = ChatMessage(author_id=1, author_tg_id=1, author_name="U", text="x", created_at=created_at)
+    db.add(m)
+    db.commit()
+    return m.id
+
+
+def test_archive_keeps_ids_growing(client):
+    old = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=3650)
+    db = SessionLocal()
+    try:
+        db.execute(delete(ChatMessage))
+        db.commit()
+        ids = [_add(db, old) for _ in range(3)]
+
+        assert archive_old_messages() == 2
+        # самое новое остаётся в горячей таблице, даже если оно старое
+        assert db.execute(select(ChatMessage.id)).scalars().all() == [ids[-1]]
+
+        new_id = _add(db, dt.datetime.now(dt.timezone.utc))
+        assert new_id > ids[-1]
+        archive_old_messages()
+        assert db.execute(select(func.count()).select_from(ChatMessageArchive)
+                          .where(ChatMessageArchive.id.in_(ids))).scalar() == 3
+    finally:
+        db.close()
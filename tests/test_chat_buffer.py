@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+from app.services.chat import RecentMessages
+
+
+def _msg(mid: int) -> SimpleNamespace:
+    return SimpleNamespace(id=mid, author_name="U", text=f"m{mid}", created_at=None)
+
+
+def _item(mid: int) -> dict:
+    return {"id": mid, "name": "U", "text": f"m{mid}", "created_at": None}
+
+
+class _Db:
+    """SELECT видит rows; during() — то, что писатель успел закоммитить, пока SELECT шёл."""
+
+    def __init__(self, rows, during):
+        self.rows = rows
+        self.during = during
+
+    def execute(self, _stmt):
+        self.during()
+        rows = self.rows
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: list(reversed(rows))))
+
+
+def test_append_during_warm_is_not_lost():
+    buf = RecentMessages(size=10)
+    # сообщение 3 закоммичено после снимка SELECT (видит 1 и 2), но до конца warm
+    buf.warm(_Db([_msg(1), _msg(2)], lambda: buf.append(_item(3))))
+
+    assert [m["id"] for m in buf.after(0, 10)] == [1, 2, 3]
+    assert [m["id"] for m in buf.after(2, 10)] == [3]
+    assert [m["id"] for m in buf.latest(3)] == [1, 2, 3]
+
+
+def test_append_seen_by_select_is_not_duplicated():
+    buf = RecentMessages(size=10)
+    buf.append(_item(2))  # закоммичено до SELECT — SELECT его тоже вернёт
+    buf.warm(_Db([_msg(1), _msg(2)], lambda: None))
+
+    assert [m["id"] for m in buf.after(0, 10)] == [1, 2]
@@ -0,0 +1,25 @@
+from sqlalchemy import delete
+
+from app.db import SessionLocal
+from app.models.chat import ChatMessage, ChatMessageArchive
+from app.services.chat import recent
+
+
+def test_poll_without_cursor_returns_latest_page(client, as_user):
+    db = SessionLocal()
+    try:
+        db.execute(delete(ChatMessage))
+        db.execute(delete(ChatMessageArchive))
+        db.commit()
+    finally:
+        db.close()
+    recent.__init__(recent.size)  # буфер под новую таблицу
+
+    h = as_user(4001)
+    for i in range(5):
+        assert client.post("/api/chat/messages", headers=h, json={"text": f"m{i}"}).status_code == 200
+
+    page = client.get("/api/chat/messages?limit=3").json()["items"]
+    polled = client.get("/api/chat/poll?after_id=0&limit=3&timeout=0.1").json()["items"]
+    assert [m["text"] for m in page] == ["m2", "m3", "m4"]
+    assert [m["id"] for m in polled] == [m["id"] for m in page]
@@ -0,0 +1,13 @@
+from app.services.geo import DriverLocations
+
+
+def test_nearest_pairs_ids_with_their_own_coordinates():
+    locs = DriverLocations(cell_deg=0.05, ttl=60)
+    locs.update(1, 101, 55.80, 37.60)   # ~5.5 км
+    locs.update(2, 102, 55.751, 37.601)  # рядом
+    locs.update(3, 103, 55.78, 37.60)   # ~3.3 км
+    # та же точка водителя 1 ещё раз — дубликат в выдаче nearby() не должен сдвигать массивы
+    orig = locs.nearby
+    locs.nearby = lambda *a: orig(*a) + [locs.get(1)]
+    found = locs.nearest(55.75, 37.60, k=3, radius_km=10)
+    assert [(p.driver_id, round(d)) for p, d in found] == [(2, 0), (3, 3), (1, 6)]
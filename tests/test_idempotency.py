@@ -0,0 +1,81 @@
+import uuid
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.idempotency import IdempotencyMiddleware
+
+
+def _client():
+    calls = []
+
+    async def create(request):
+        body = await request.json()
+        calls.append(body)
+        return JSONResponse({"id": len(calls), "echo": body})
+
+    async def forbidden(request):
+        calls.append(None)
+        return JSONResponse({"detail": "nope"}, status_code=403)
+
+    app = Starlette(routes=[
+        Route("/api/chat/messages", create, methods=["POST"]),
+        Route("/api/taxi/trips", forbidden, methods=["POST"]),
+    ])
+    app.add_middleware(IdempotencyMiddleware, ttl=60, maxsize=100)
+    return TestClient(app), calls
+
+
+def _h(key, owner="a"):
+    # хранилище ответов — общий именованный кэш процесса: ключи уникальны на тест
+    return {"Idempotency-Key": key, "X-Tg-Init-Data": f"user={owner}"}
+
+
+def _key():
+    return uuid.uuid4().hex
+
+
+def test_retry_with_same_key_replays_first_response():
+    c, calls = _client()
+    key = _key()
+    r1 = c.post("/api/chat/messages", headers=_h(key), json={"text": "hi"})
+    r2 = c.post("/api/chat/messages", headers=_h(key), json={"text": "hi"})
+    assert r1.json() == r2.json() == {"id": 1, "echo": {"text": "hi"}}
+    assert r2.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in r1.headers
+    assert len(calls) == 1
+
+
+def test_same_key_with_other_body_is_conflict():
+    c, calls = _client()
+    key = _key()
+    c.post("/api/chat/messages", headers=_h(key), json={"text": "hi"})
+    r = c.post("/api/chat/messages", headers=_h(key), json={"text": "other"})
+    assert r.status_code == 409
+    assert len(calls) == 1
+
+
+def test_keys_are_isolated_per_owner():
+    c, calls = _client()
+    key = _key()
+    r1 = c.post("/api/chat/messages", headers=_h(key, owner="a"), json={"text": "hi"})
+    r2 = c.post("/api/chat/messages", headers=_h(key, owner="b"), json={"text": "hi"})
+    assert r1.json()["id"] == 1 and r2.json()["id"] == 2
+    assert "idempotent-replayed" not in r2.headers
+
+
+def test_state_dependent_errors_are_not_replayed():
+    c, calls = _client()
+    key = _key()
+    assert c.post("/api/taxi/trips", headers=_h(key), json={}).status_code == 403
+    assert c.post("/api/taxi/trips", headers=_h(key), json={}).status_code == 403
+    assert len(calls) == 2
+
+
+def test_requests_without_key_pass_through():
+    c, calls = _client()
+    c.post("/api/chat/messages", json={"text": "hi"})
+    c.post("/api/chat/messages", json={"text": "hi"})
+    assert len(calls) == 2
@@ -0,0 +1,36 @@
+import pytest
+
+from app.config import settings
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    return "scrape-secret"
+
+
+def test_metrics_hidden_without_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+
+
+def test_metrics_hidden_when_disabled(client, metrics_token, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    r = client.get("/metrics", headers={"Authorization": f"Bearer {metrics_token}"})
+    assert r.status_code == 404
+
+
+def test_metrics_requires_matching_bearer(client, metrics_token):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": metrics_token}).status_code == 401
+
+
+def test_metrics_served_with_token(client, metrics_token):
+    client.get("/api/me")
+    r = client.get("/metrics", headers={"Authorization": f"Bearer {metrics_token}"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert 'village_http_requests_total{method="GET",route="/api/me"' in r.text
+    assert "village_http_request_duration_seconds_bucket" in r.text
@@ -0,0 +1,62 @@
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.ratelimit import RateLimitMiddleware, route_group
+
+
+def _client(per_min=60, burst=2):
+    async def ok(request):
+        return JSONResponse({"ok": True})
+
+    app = Starlette(routes=[Route("/api/x", ok), Route("/page", ok)])
+    app.add_middleware(RateLimitMiddleware, limits={"read": (per_min, burst)})
+    limited = app.build_middleware_stack()
+
+    async def asgi(scope, receive, send):
+        # вместо SessionMiddleware и реального адреса — из заголовков теста
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            tg = headers.get(b"x-test-tg")
+            scope["session"] = {"tg_user": {"id": int(tg)}} if tg else {}
+            scope["client"] = (headers.get(b"x-test-ip", b"1.1.1.1").decode(), 1234)
+        await limited(scope, receive, send)
+
+    return TestClient(asgi)
+
+
+def test_route_groups():
+    assert route_group("GET", "/api/taxi/trips") == "read"
+    assert route_group("POST", "/api/taxi/trips") == "write"
+    assert route_group("GET", "/api/taxi/poll") == "poll"
+    assert route_group("POST", "/api/taxi/driver/location") == "location"
+    assert route_group("GET", "/taxi") is None
+
+
+def test_over_limit_gets_429_with_retry_after():
+    c = _client(per_min=60, burst=2)
+    h = {"x-test-tg": "1"}
+    assert [c.get("/api/x", headers=h).status_code for _ in range(2)] == [200, 200]
+    r = c.get("/api/x", headers=h)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    # не-/api не ограничивается
+    assert c.get("/page", headers=h).status_code == 200
+
+
+def test_buckets_per_tg_id_not_per_ip():
+    c = _client(burst=1)
+    same_ip = {"x-test-ip": "9.9.9.9"}
+    assert c.get("/api/x", headers={**same_ip, "x-test-tg": "1"}).status_code == 200
+    # другой пользователь за тем же NAT — своя корзина
+    assert c.get("/api/x", headers={**same_ip, "x-test-tg": "2"}).status_code == 200
+    # тот же пользователь с другого адреса — та же корзина
+    assert c.get("/api/x", headers={"x-test-ip": "8.8.8.8", "x-test-tg": "1"}).status_code == 429
+
+
+def test_buckets_per_ip_without_session():
+    c = _client(burst=1)
+    assert c.get("/api/x", headers={"x-test-ip": "2.2.2.2"}).status_code == 200
+    assert c.get("/api/x", headers={"x-test-ip": "2.2.2.2"}).status_code == 429
+    assert c.get("/api/x", headers={"x-test-ip": "3.3.3.3"}).status_code == 200
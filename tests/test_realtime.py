@@ -0,0 +1,53 @@
+import asyncio
+
+from app.realtime import _Hub
+
+
+def test_idle_topics_are_forgotten():
+    hub = _Hub(idle_ttl=0.0)
+    hub._publish("bid_added", {"n": 1}, "user:1")
+    hub._publish("bid_added", {"n": 2}, "user:2")
+    assert hub.version("user:2") == 2
+    assert "user:1" not in hub._log and "user:1" not in hub._versions
+
+
+def test_recreated_topic_resets_stale_clients():
+    hub = _Hub(idle_ttl=0.0)
+    hub._publish("e", {"n": 1}, "user:1")
+    old = hub.version("user:1")
+    hub._publish("e", {}, "other")          # user:1 забыт
+    hub._publish("e", {"n": 2}, "user:1")   # создан заново
+    assert hub.version("user:1") > old
+    # клиент со старой версией пропустил неизвестно что — только полный reset
+    assert hub.events_since("user:1", old) is None
+    # клиент, видевший топик пустым (версия 0), получает всё новое
+    assert [e["data"] for e in hub.events_since("user:1", 0)] == [{"n": 2}]
+
+
+def test_topics_with_pollers_are_kept():
+    async def run():
+        hub = _Hub(idle_ttl=0.0)
+        hub._publish("e", {}, "user:1")
+        boot, since = hub.boot_id, hub.version("user:1")
+        poll = asyncio.create_task(hub.wait("user:1", since, boot, timeout=1))
+        await asyncio.sleep(0)
+        hub._publish("e", {}, "other")
+        assert "user:1" in hub._versions
+        hub._publish("e", {"n": 2}, "user:1")
+        out = await poll
+        assert [e["data"] for e in out["events"]] == [{"n": 2}]
+
+    asyncio.run(run())
+
+
+def test_shared_topic_version_never_goes_back():
+    hub = _Hub(idle_ttl=0.0)
+    hub._publish("trip_created", {"id": 1}, "taxi")
+    v = hub.version("taxi")
+    assert v > 0
+    # taxi простаивает дольше idle_ttl, а события идут в другие топики
+    hub._publish("e", {}, "user:1")
+    hub._publish("e", {}, "user:2")
+    assert hub.version("taxi") == v
+    assert [e["data"] for e in hub.events_since("taxi", 0)] == [{"id": 1}]
+    assert "user:1" not in hub._versions
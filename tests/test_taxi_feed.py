@@ -0,0 +1,38 @@
+from sqlalchemy import text
+
+from app.db import engine
+from app.services.geo import forget_driver
+
+
+def _trip(client, headers, point=None) -> int:
+    body = {"from_street": "A", "to_street": "B", "price_mode": "driver_bids"}
+    if point:
+        body.update(from_lat=point[0], from_lon=point[1])
+    r = client.post("/api/taxi/trips", headers=headers, json=body)
+    assert r.status_code == 200, r.text
+    return r.json()["trip"]["id"]
+
+
+def test_feed_keeps_trips_beyond_radius_after_near_ones(client, as_user):
+    near = _trip(client, as_user(2001), (55.751, 37.602))
+    no_pickup = _trip(client, as_user(2002))
+    far = _trip(client, as_user(2003), (56.5, 38.0))       # ~90 км — дальше FEED_RADIUS_KM
+    farther = _trip(client, as_user(2004), (57.5, 39.0))
+
+    h = as_user(2099)
+    client.get("/api/taxi/driver/me", headers=h)
+    client.post("/api/taxi/driver/vehicle", headers=h, json={"make": "Lada"})
+    with engine.begin() as conn:
+        conn.execute(text("update driver_profiles set approved=1, active=1"))
+        conn.execute(text("update taxi_vehicles set verified=1"))
+    forget_driver(2099)
+    assert client.post("/api/taxi/driver/location", headers=h, json={"lat": 55.75, "lon": 37.6}).status_code == 200
+
+    items = client.get("/api/taxi/trips?role=feed", headers=h).json()["items"]
+    ids = [t["id"] for t in items]
+    assert ids == [near, no_pickup, far, farther]
+    assert items[2]["distance_km"] < items[3]["distance_km"]
+
+    # limit режет с конца: дальние уходят первыми
+    items = client.get("/api/taxi/trips?role=feed&limit=2", headers=h).json()["items"]
+    assert [t["id"] for t in items] == [near, no_pickup]
@@ -0,0 +1,30 @@
+import os
+import time
+
+from app.auth.telegram import _verified, verify_webapp_init_data
+
+from conftest import init_data
+
+TOKEN = os.environ["BOT_TOKEN"]
+
+
+def test_cached_init_data_is_returned_as_copy():
+    data = init_data(5001)
+    first = verify_webapp_init_data(data, TOKEN)
+    assert first["user"]["id"] == 5001
+    first["user"] = "changed"  # правка результата не должна попасть в кэш
+    assert verify_webapp_init_data(data, TOKEN)["user"]["id"] == 5001
+
+
+def test_bad_signature_is_rejected_and_not_cached():
+    before = len(_verified)
+    assert verify_webapp_init_data(init_data(5002).replace("5002", "5003"), TOKEN) is None
+    assert verify_webapp_init_data(init_data(5002), "999:other") is None
+    assert len(_verified) == before
+
+
+def test_old_auth_date_is_rejected():
+    old = init_data(5004, auth_date=int(time.time()) - 3600)
+    assert verify_webapp_init_data(old, TOKEN, max_age=60) is None
+    assert verify_webapp_init_data(old, TOKEN, max_age=7200)["user"]["id"] == 5004
+    assert verify_webapp_init_data(old, TOKEN, max_age=0)["user"]["id"] == 5004